@@ -4,6 +4,9 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from meteor.metrics import provider as metrics_provider
+from meteor.observation.views import router as observation_router
+
 
 class ErrorMessage(BaseModel):
     msg: str
@@ -28,3 +31,12 @@ api_router = APIRouter(
 @api_router.get("/healthcheck", include_in_schema=True)
 def healthcheck():
     return {"status": "ok"}
+
+
+@api_router.get("/metrics", include_in_schema=True)
+def metrics():
+    """Counters and gauges of this server process."""
+    return metrics_provider.snapshot()
+
+
+api_router.include_router(observation_router, prefix="/{organization}", tags=["observation"])
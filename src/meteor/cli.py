@@ -240,6 +240,57 @@ def drop_database(yes):
         click.secho(f"'{config.DATABASE_HOSTNAME}:{config.DATABASE_NAME}' does not exist!!!", fg="red")
 
 
+@meteor_database.command("partitions")
+@click.option(
+    "--organization",
+    "-o",
+    multiple=True,
+    help="Organization slug to maintain partitions for. Defaults to all organizations.",
+)
+@click.option(
+    "--months-ahead",
+    type=int,
+    default=config.METEOR_OBSERVATION_PARTITION_MONTHS_AHEAD,
+    help="Number of upcoming months to create partitions for.",
+)
+@click.option(
+    "--retention-months",
+    type=int,
+    default=config.METEOR_OBSERVATION_RETENTION_MONTHS,
+    help="Detach partitions older than this many months. 0 keeps everything.",
+)
+@click.option("--drop", is_flag=True, help="Drop detached partitions instead of keeping them as standalone tables.")
+def maintain_partitions(organization, months_ahead, retention_months, drop):
+    """Creates upcoming observation partitions and detaches expired ones."""
+    import asyncio
+
+    from .database.core import engine
+    from .database.manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+    from .database.partition import get_tenant_schemas, maintain_partitions
+
+    async def _maintain():
+        async with engine.begin() as connection:
+            if organization:
+                schemas = [f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_{slug}" for slug in organization]
+            else:
+                schemas = await get_tenant_schemas(connection)
+
+            for schema in schemas:
+                created, detached = await maintain_partitions(
+                    connection,
+                    schema=schema,
+                    months_ahead=months_ahead,
+                    retention_months=retention_months,
+                    drop=drop,
+                )
+                click.secho(f"{schema}: ensured {len(created)} partition(s), detached {len(detached)}.")
+                for name in detached:
+                    click.secho(f"  detached {name}", fg="yellow")
+
+    asyncio.run(_maintain())
+    click.secho("Success.", fg="green")
+
+
 @meteor_database.command("upgrade")
 @click.option("--tag", default=None, help="Arbitrary 'tag' name - can be used by custom env.py scripts.")
 @click.option(
@@ -471,6 +522,115 @@ def revision_database(message, autogenerate, revision_type, sql, head, splice, b
             )
 
 
+@meteor_cli.group("observation")
+def meteor_observation():
+    """Container for all observation commands."""
+    pass
+
+
+@meteor_observation.command("ingest")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--organization", "-o", required=True, help="Organization slug to ingest the frames for.")
+@click.option("--element", "-e", required=True, help="Exact name of the observation element, e.g. reflectivity.")
+@click.option(
+    "--geometry",
+    nargs=4,
+    type=float,
+    required=True,
+    help="North and west edges and the latitude/longitude steps of the grids.",
+)
+@click.option(
+    "--time-format",
+    default="%Y%m%d%H%M",
+    show_default=True,
+    help="strptime format of the capture time (UTC), read from the last '_' separated part of each file name.",
+)
+@click.option(
+    "--site",
+    nargs=2,
+    type=float,
+    default=None,
+    help="Latitude and longitude of the radar. The files are then (azimuth, gate) sweeps reprojected onto the grid.",
+)
+@click.option("--elevation", type=float, default=0.5, show_default=True, help="Elevation angle of the sweeps.")
+@click.option("--first-gate", type=float, default=0, show_default=True, help="Range of the first gate in meters.")
+@click.option("--gate-length", type=float, default=250, show_default=True, help="Length of a gate in meters.")
+@click.option(
+    "--shape", nargs=2, type=int, default=None, help="Rows and columns of the grid sweeps are reprojected on."
+)
+@click.option("--workers", type=int, default=None, help="Number of encode processes. Defaults to the CPU count.")
+def ingest_observations(
+    paths, organization, element, geometry, time_format, site, elevation, first_gate, gate_length, shape, workers
+):
+    """Bulk loads radar frames stored as .npy files."""
+    import asyncio
+    import os
+    from datetime import datetime
+
+    import numpy as np
+
+    from .database.core import create_raw_connection
+    from .database.manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+    from .observation.ingest import IngestFrame, ingest_frames
+    from .observation.reprojection import Projection, RadarSite, SweepGeometry
+
+    if site and not shape:
+        raise click.BadParameter("The grid shape is required to reproject sweeps.", param_hint="--shape")
+
+    frames = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            captured_at = datetime.strptime(stem.rsplit("_", 1)[-1], time_format)
+        except ValueError:
+            raise click.BadParameter(f"No capture time matching '{time_format}' in {path}.", param_hint="paths")
+
+        projection = None
+        if site:
+            # only reads the header, the sweep itself is loaded by the worker encoding it
+            azimuths, gates = np.load(path, mmap_mode="r").shape
+            projection = Projection(
+                site=RadarSite(*site),
+                sweep=SweepGeometry(elevation, azimuths, gates, first_gate, gate_length),
+                geometry=geometry,
+                shape=shape,
+            )
+        frames.append(
+            IngestFrame(captured_at=captured_at, frame=os.path.abspath(path), geometry=geometry, projection=projection)
+        )
+    frames.sort(key=lambda frame: frame.captured_at)
+
+    async def _ingest():
+        connection = await create_raw_connection()
+        try:
+            organization_id = await connection.fetchval(
+                "SELECT id FROM meteor_core.organization WHERE slug = $1", organization
+            )
+            if organization_id is None:
+                raise click.ClickException(f"Organization {organization} does not exist.")
+            row = await connection.fetchrow(
+                "SELECT id, scale FROM meteor_core.observation_element WHERE name = $1", element
+            )
+            if row is None:
+                raise click.ClickException(f"Observation element {element} does not exist.")
+
+            return await ingest_frames(
+                connection,
+                schema=f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_{organization}",
+                element_id=row["id"],
+                element_name=element,
+                organization_id=organization_id,
+                frames=frames,
+                scale=row["scale"] or 1,
+                workers=workers,
+            )
+        finally:
+            await connection.close()
+
+    count = asyncio.run(_ingest())
+    click.secho(f"Ingested {count} frame(s).", fg="green")
+
+
 @meteor_cli.group("server")
 def meteor_server():
     """Container for all meteor server commands."""
@@ -4,6 +4,7 @@ import os
 from urllib import parse
 
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
 
 log = logging.getLogger(__name__)
 
@@ -74,7 +75,14 @@ DATABASE_ENGINE_MAX_OVERFLOW = config("DATABASE_ENGINE_MAX_OVERFLOW", cast=int,
 # Deal with DB disconnects
 # https://docs.sqlalchemy.org/en/20/core/pooling.html#pool-disconnects
 DATABASE_ENGINE_POOL_PING = config("DATABASE_ENGINE_POOL_PING", default=False)
+# sessionmakers bound to organization schemas kept by each process, least recently used first out
+DATABASE_TENANT_SESSION_CACHE_SIZE = config("DATABASE_TENANT_SESSION_CACHE_SIZE", cast=int, default=256)
 SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg2://{_DATABASE_CREDENTIAL_USER}:{_QUOTED_DATABASE_PASSWORD}@{DATABASE_HOSTNAME}:{DATABASE_PORT}/{DATABASE_NAME}"
+# driver of the async engine of the server, asyncpg or psycopg. Migrations and the CLI keep the URI above
+DATABASE_ASYNC_DRIVER = config("DATABASE_ASYNC_DRIVER", default="asyncpg")
+# prepared statements kept per asyncpg connection, set it to 0 behind a pgbouncer in transaction mode
+DATABASE_PREPARED_STATEMENT_CACHE_SIZE = config("DATABASE_PREPARED_STATEMENT_CACHE_SIZE", cast=int, default=500)
+SQLALCHEMY_ASYNC_DATABASE_URI = f"postgresql+{DATABASE_ASYNC_DRIVER}://{_DATABASE_CREDENTIAL_USER}:{_QUOTED_DATABASE_PASSWORD}@{DATABASE_HOSTNAME}:{DATABASE_PORT}/{DATABASE_NAME}"
 
 ALEMBIC_CORE_REVISION_PATH = config(
     "ALEMBIC_CORE_REVISION_PATH",
@@ -93,6 +101,9 @@ ALEMBIC_MULTI_TENANT_MIGRATION_PATH = config(
     default=f"{os.path.dirname(os.path.realpath(__file__))}/database/revisions/multi-tenant-migration.sql",
 )
 
+# key of the plugin configurations encrypted at rest
+METEOR_ENCRYPTION_KEY = config("METEOR_ENCRYPTION_KEY", cast=Secret)
+
 # jwt
 METEOR_JWT_SECRET = config("METEOR_JWT_SECRET", default=None)
 METEOR_JWT_ALG = config("METEOR_JWT_ALG", default="HS256")
@@ -126,3 +137,54 @@ METEOR_AUTHENTICATION_PROVIDER_PKCE_JWKS = config(
 METEOR_PKCE_DONT_VERIFY_AT_HASH = config("METEOR_PKCE_DONT_VERIFY_AT_HASH", default=False)
 
 METEOR_AUTHENTICATION_DEFAULT_USER = config("METEOR_AUTHENTICATION_DEFAULT_USER", default="meteor@example.com")
+
+# observation storage
+METEOR_OBSERVATION_CHUNK_SIZE = config("METEOR_OBSERVATION_CHUNK_SIZE", cast=int, default=256)
+# one of "zstd", "zlib" or "none", defaults to zstd when the zstandard package is installed
+METEOR_OBSERVATION_CODEC = config("METEOR_OBSERVATION_CODEC", default=None)
+METEOR_OBSERVATION_COMPRESSION_LEVEL = config("METEOR_OBSERVATION_COMPRESSION_LEVEL", cast=int, default=3)
+# pyramid levels are built down to this many cells along the shortest axis
+METEOR_OBSERVATION_PYRAMID_MIN_SIZE = config("METEOR_OBSERVATION_PYRAMID_MIN_SIZE", cast=int, default=128)
+# observation values are partitioned by capture month
+METEOR_OBSERVATION_PARTITION_MONTHS_AHEAD = config("METEOR_OBSERVATION_PARTITION_MONTHS_AHEAD", cast=int, default=3)
+# partitions older than this many months are detached, 0 keeps everything
+METEOR_OBSERVATION_RETENTION_MONTHS = config("METEOR_OBSERVATION_RETENTION_MONTHS", cast=int, default=0)
+# store a keyframe every this many frames of an element and quantized deltas in between, 0 disables delta coding
+METEOR_OBSERVATION_KEYFRAME_INTERVAL = config("METEOR_OBSERVATION_KEYFRAME_INTERVAL", cast=int, default=0)
+# reconstructions of the latest frame of open delta chains kept per server process, each of them as large as
+# a decoded frame and its pyramid, so that appending a frame does not decode its whole chain again
+METEOR_OBSERVATION_OPEN_CHAIN_CACHE_SIZE = config("METEOR_OBSERVATION_OPEN_CHAIN_CACHE_SIZE", cast=int, default=16)
+# polar to lat/long lookup tables, kept in memory and memory-mapped from this directory
+METEOR_OBSERVATION_REPROJECTION_CACHE_DIR = config(
+    "METEOR_OBSERVATION_REPROJECTION_CACHE_DIR", default=os.path.expanduser("~/.cache/meteor/reprojection")
+)
+METEOR_OBSERVATION_REPROJECTION_CACHE_SIZE = config("METEOR_OBSERVATION_REPROJECTION_CACHE_SIZE", cast=int, default=32)
+# server processes of the host, WEB_CONCURRENCY is also how many workers uvicorn starts when not told otherwise
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", cast=int, default=1)
+# processes decoding and resampling fetched frames per server process, 0 decodes on the event loop. Defaults to
+# the CPUs of the host shared between its server processes, each of them has a pool of its own
+METEOR_OBSERVATION_DECODE_WORKERS = config(
+    "METEOR_OBSERVATION_DECODE_WORKERS", cast=int, default=max((os.cpu_count() or 1) // max(WEB_CONCURRENCY, 1), 1)
+)
+# encoded map tiles kept in memory per server process
+METEOR_OBSERVATION_TILE_CACHE_SIZE = config("METEOR_OBSERVATION_TILE_CACHE_SIZE", cast=int, default=4096)
+# decoded frames shared by the server processes of a host, preferably on a shared memory file system
+METEOR_OBSERVATION_FRAME_CACHE_DIR = config("METEOR_OBSERVATION_FRAME_CACHE_DIR", default="/dev/shm/meteor/frames")
+# bytes of decoded frames cached per organization, 0 disables the cache
+METEOR_OBSERVATION_FRAME_CACHE_BUDGET = config("METEOR_OBSERVATION_FRAME_CACHE_BUDGET", cast=int, default=256 << 20)
+# per organization overrides of the budget, as comma separated slug=bytes pairs
+METEOR_OBSERVATION_FRAME_CACHE_BUDGETS = config(
+    "METEOR_OBSERVATION_FRAME_CACHE_BUDGETS", cast=CommaSeparatedStrings, default=""
+)
+
+# encoded frames cached on local disk, up to this many bytes, 0 disables the cache
+METEOR_OBSERVATION_DISK_CACHE_DIR = config(
+    "METEOR_OBSERVATION_DISK_CACHE_DIR", default=os.path.expanduser("~/.cache/meteor/frames")
+)
+METEOR_OBSERVATION_DISK_CACHE_SIZE = config("METEOR_OBSERVATION_DISK_CACHE_SIZE", cast=int, default=2 << 30)
+
+# slugs of the metric plugins the metrics of meteor.metrics are sent to
+METEOR_METRIC_PROVIDERS = config("METEOR_METRIC_PROVIDERS", cast=CommaSeparatedStrings, default="")
+
+# response compression, bodies smaller than this many bytes are sent as is
+METEOR_COMPRESSION_MINIMUM_SIZE = config("METEOR_COMPRESSION_MINIMUM_SIZE", cast=int, default=1024)
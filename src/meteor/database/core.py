@@ -1,31 +1,64 @@
 import functools
+import json
 import logging
 import re
-from typing import Annotated, Any, AsyncIterator
+from collections import OrderedDict
+from typing import Annotated, Any, AsyncIterator, Optional
 
+import asyncpg
 from fastapi import Depends
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy import MetaData, create_engine, inspect
 from sqlalchemy.sql.expression import true
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from sqlalchemy.orm import Session, sessionmaker, object_session
 from sqlalchemy_utils import get_mapper
-from pydantic.errors import PydanticErrorMixin
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from meteor import config
 from meteor.exceptions import NotFoundError
+from meteor.metrics import provider as metrics_provider
 from meteor.search.fulltext import make_searchable
 
 logger = logging.getLogger(__name__)
 
-engine = create_async_engine(
-    config.SQLALCHEMY_DATABASE_URI,
-    pool_size=config.DATABASE_ENGINE_POOL_SIZE,
-    max_overflow=config.DATABASE_ENGINE_MAX_OVERFLOW,
-    pool_pre_ping=config.DATABASE_ENGINE_POOL_PING,
-)
+
+def json_serializer(value: Any) -> str:
+    """Serializes JSON columns, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+
+def engine_options() -> dict:
+    """
+    Options of the async engine for the configured driver.
+
+    JSON columns are (de)serialized by the codecs the asyncpg dialect registers once per connection,
+    and UUIDs are decoded by the binary codec of asyncpg. Prepared statements are cached per connection
+    and keyed by their SQL, in which schema_translate_map has already rendered the schema of the tenant,
+    so tenants never share a statement.
+    """
+    options = dict(
+        pool_size=config.DATABASE_ENGINE_POOL_SIZE,
+        max_overflow=config.DATABASE_ENGINE_MAX_OVERFLOW,
+        pool_pre_ping=config.DATABASE_ENGINE_POOL_PING,
+        json_serializer=json_serializer,
+        json_deserializer=orjson.loads if orjson is not None else json.loads,
+    )
+    if config.DATABASE_ASYNC_DRIVER == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": config.DATABASE_PREPARED_STATEMENT_CACHE_SIZE}
+    return options
+
+
+engine = create_async_engine(config.SQLALCHEMY_ASYNC_DATABASE_URI, **engine_options())
 
 SessionLocal = async_sessionmaker(
     bind=engine,
@@ -34,11 +67,13 @@ SessionLocal = async_sessionmaker(
 )
 
 
-async def get_session() -> AsyncIterator[async_sessionmaker]:
-    try:
-        yield SessionLocal
-    except SQLAlchemyError as e:
-        logger.exception(e)
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with SessionLocal() as db_session:
+        try:
+            yield db_session
+        except SQLAlchemyError as e:
+            logger.exception(e)
+            raise
 
 
 DbSession = Annotated[AsyncSession, Depends(get_session)]
@@ -126,7 +161,7 @@ def get_class_by_tablename(table_fullname: str) -> Any:
     """Return class reference mapped to table."""
 
     def _find_class(name):
-        for c in Base._decl_class_registry.values():
+        for c in Base.registry._class_registry.values():
             if hasattr(c, "__table__"):
                 if c.__table__.fullname.lower() == name.lower():
                     return c
@@ -139,9 +174,8 @@ def get_class_by_tablename(table_fullname: str) -> Any:
         mapped_class = _find_class(f"meteor_core.{mapped_name}")
 
     if not mapped_class:
-        raise PydanticErrorMixin(
-            NotFoundError(msg="Model not found. Check the name of your model."),
-            loc="filter",
+        raise RequestValidationError(
+            [{"loc": ("filter",), "msg": "Model not found. Check the name of your model.", "type": NotFoundError.code}]
         )
 
     return mapped_class
@@ -174,11 +208,95 @@ def ensure_unique_default_per_project(target, value, oldvalue, initiator):
                 session.commit()
 
 
-def refetch_db_session(organization_slug: str) -> AsyncSession:
-    schema_engine = engine.execution_options(
-        schema_translate_map={
-            None: f"meteor_organization_{organization_slug}",
+class TenantSessions:
+    """
+    Sessionmakers bound to the schema of an organization, for the ``size`` most recently used organizations.
+
+    Every sessionmaker is bound to an engine view translating the default schema to the schema of its
+    organization. Views share the pool and the compiled statement cache of ``engine``, schema names
+    being rendered at execution time, so the statements of one tenant are reused by all the others.
+    """
+
+    def __init__(self, engine, size: int = 256):
+        self.engine = engine
+        self.size = size
+        self._sessionmakers = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, organization_slug: str) -> async_sessionmaker:
+        """Returns the sessionmaker of an organization, created on first use."""
+        maker = self._sessionmakers.get(organization_slug)
+        if maker is not None:
+            self._sessionmakers.move_to_end(organization_slug)
+            self.hits += 1
+            metrics_provider.counter("database.tenant_sessions.hits")
+            return maker
+
+        self.misses += 1
+        metrics_provider.counter("database.tenant_sessions.misses")
+        schema_engine = self.engine.execution_options(
+            schema_translate_map={
+                None: f"meteor_organization_{organization_slug}",
+            }
+        )
+        maker = self._sessionmakers[organization_slug] = async_sessionmaker(bind=schema_engine)
+        while len(self._sessionmakers) > self.size:
+            self._sessionmakers.popitem(last=False)
+            self.evictions += 1
+        metrics_provider.gauge("database.tenant_sessions.size", len(self._sessionmakers))
+        return maker
+
+    def invalidate(self, organization_slug: Optional[str] = None):
+        """Forgets the sessionmaker of an organization, of all organizations by default."""
+        if organization_slug is None:
+            self._sessionmakers.clear()
+        else:
+            self._sessionmakers.pop(organization_slug, None)
+        metrics_provider.gauge("database.tenant_sessions.size", len(self._sessionmakers))
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._sessionmakers),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
         }
+
+
+tenant_sessions = TenantSessions(engine, config.DATABASE_TENANT_SESSION_CACHE_SIZE)
+
+
+def refetch_db_session(organization_slug: str) -> AsyncSession:
+    """Opens a session bound to the schema of an organization."""
+    return tenant_sessions.get(organization_slug)()
+
+
+async def get_organization_session(organization: str) -> AsyncIterator[AsyncSession]:
+    """Yields a session bound to the schema of the organization in the request path."""
+    db_session = refetch_db_session(organization)
+    try:
+        yield db_session
+    finally:
+        await db_session.close()
+
+
+OrganizationDbSession = Annotated[AsyncSession, Depends(get_organization_session)]
+
+
+async def create_raw_connection():
+    """
+    Opens a dedicated asyncpg connection outside of the pool, for work that bypasses
+    the ORM such as bulk COPY.
+    """
+    username, password = str(config.DATABASE_CREDENTIALS).split(":")
+    return await asyncpg.connect(
+        host=config.DATABASE_HOSTNAME,
+        port=int(config.DATABASE_PORT),
+        user=username,
+        password=password,
+        database=config.DATABASE_NAME,
+        statement_cache_size=config.DATABASE_PREPARED_STATEMENT_CACHE_SIZE,
     )
-    db_session = async_sessionmaker(bind=schema_engine)()
-    return db_session
@@ -0,0 +1,177 @@
+"""
+.. module: meteor.database.partition
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Monthly range partitions of tenant time series tables.
+
+Partitions are named ``<table>_y<year>m<month>`` and cover a calendar month
+of the partition key. Upcoming months are created ahead of time by the
+``meteor database partitions`` command and on demand by ingest, expired
+months are detached (and optionally dropped) for retention.
+"""
+import logging
+import re
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import Session
+
+from .manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+
+log = logging.getLogger(__name__)
+
+PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+# months known to have a partition, so that ingest only issues DDL once per month and process
+_known_partitions = set()
+
+PENDING_PARTITIONS = "pending_partitions"
+
+
+def month_start(at: datetime) -> datetime:
+    return datetime(at.year, at.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.month - 1 + months
+    return datetime(month.year + index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def get_connection_schema(connection: AsyncConnection) -> str:
+    """Returns the tenant schema a connection translates unqualified tables to."""
+    options = connection.sync_connection.get_execution_options()
+    return options.get("schema_translate_map", {}).get(None) or "public"
+
+
+async def get_tenant_schemas(connection: AsyncConnection) -> list[str]:
+    """Returns the schemas of all organizations."""
+    result = await connection.execute(
+        text("SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE :prefix"),
+        {"prefix": f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_%"},
+    )
+    return list(result.scalars())
+
+
+def create_partition_statement(*, schema: str, table: str, month: datetime) -> str:
+    """Returns the DDL creating the partition holding a month, if it does not exist yet."""
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{schema}"."{partition_name(table, month)}" PARTITION OF "{schema}"."{table}" '
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    )
+
+
+async def create_partition(connection: AsyncConnection, *, schema: str, table: str, month: datetime) -> str:
+    """Creates the partition holding a month, if it does not exist yet."""
+    await connection.execute(text(create_partition_statement(schema=schema, table=table, month=month)))
+    return partition_name(table, month)
+
+
+def _remember_partitions(session: Session) -> None:
+    _known_partitions.update(session.info[PENDING_PARTITIONS])
+    session.info[PENDING_PARTITIONS].clear()
+
+
+def _forget_partitions(session: Session) -> None:
+    session.info[PENDING_PARTITIONS].clear()
+
+
+def _pending_partitions(session: Session) -> set:
+    """
+    Partitions created in the transaction of a session. They are known once it commits, a rollback
+    dropping them along with the rest of the transaction.
+    """
+    pending = session.info.get(PENDING_PARTITIONS)
+    if pending is None:
+        pending = session.info[PENDING_PARTITIONS] = set()
+        event.listen(session, "after_commit", _remember_partitions)
+        event.listen(session, "after_rollback", _forget_partitions)
+    return pending
+
+
+async def ensure_partition(db_session: AsyncSession, at: datetime, table: str = "observation_value"):
+    """Makes sure the partition for a timestamp exists before writing to it in the transaction of a session."""
+    connection = await db_session.connection()
+    schema = get_connection_schema(connection)
+    month = month_start(at)
+    pending = _pending_partitions(db_session.sync_session)
+    if (schema, table, month) in _known_partitions or (schema, table, month) in pending:
+        return
+
+    await create_partition(connection, schema=schema, table=table, month=month)
+    pending.add((schema, table, month))
+
+
+async def list_partitions(connection: AsyncConnection, *, schema: str, table: str) -> list[tuple[str, datetime]]:
+    """Returns the (name, month) of the partitions attached to a table, oldest first."""
+    result = await connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "JOIN pg_namespace ns ON parent.relnamespace = ns.oid "
+            "WHERE ns.nspname = :schema AND parent.relname = :table"
+        ),
+        {"schema": schema, "table": table},
+    )
+
+    partitions = []
+    for name in result.scalars():
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def detach_partitions(
+    connection: AsyncConnection, *, schema: str, table: str, before: datetime, drop: bool = False
+) -> list[str]:
+    """Detaches the partitions whose whole month is before the given date, dropping them if asked to."""
+    detached = []
+    for name, month in await list_partitions(connection, schema=schema, table=table):
+        if add_months(month, 1) > before:
+            continue
+
+        await connection.execute(text(f'ALTER TABLE "{schema}"."{table}" DETACH PARTITION "{schema}"."{name}"'))
+        if drop:
+            await connection.execute(text(f'DROP TABLE "{schema}"."{name}"'))
+        _known_partitions.discard((schema, table, month))
+        detached.append(name)
+    return detached
+
+
+async def maintain_partitions(
+    connection: AsyncConnection,
+    *,
+    schema: str,
+    table: str = "observation_value",
+    months_ahead: int = 3,
+    retention_months: int = 0,
+    drop: bool = False,
+    now: datetime = None,
+) -> tuple[list[str], list[str]]:
+    """
+    Creates the partitions of the current and the next ``months_ahead`` months and detaches
+    the ones older than ``retention_months`` (0 keeps everything).
+    """
+    current = month_start(now or datetime.utcnow())
+
+    created = []
+    for months in range(months_ahead + 1):
+        created.append(
+            await create_partition(connection, schema=schema, table=table, month=add_months(current, months))
+        )
+
+    detached = []
+    if retention_months:
+        detached = await detach_partitions(
+            connection, schema=schema, table=table, before=add_months(current, -retention_months), drop=drop
+        )
+
+    return created, detached
@@ -0,0 +1,45 @@
+"""Add observation element scale and offset
+
+Revision ID: 7f2c4e9a1b60
+Revises: c27282e4bb80
+Create Date: 2026-10-18 18:03:27.415092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2c4e9a1b60'
+down_revision: Union[str, None] = 'c27282e4bb80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# physical value = step * scale + offset, so that uint8 grids hold -32 to 95 dBZ and -63.5 to 63.5 m/s.
+# The scale is also the step of the deltas of delta coded frames
+ELEMENTS = [
+    ("reflectivity", 0.5, -32),
+    ("velocity", 0.5, -63.5),
+    ("spectrum-width", 0.5, 0),
+]
+
+
+def upgrade() -> None:
+    # scale was added to the model without a revision, databases created from the metadata already have it
+    op.execute("ALTER TABLE meteor_core.observation_element ADD COLUMN IF NOT EXISTS scale FLOAT")
+    op.add_column('observation_element', sa.Column('offset', sa.Float(), nullable=True), schema='meteor_core')
+    for name, scale, offset in ELEMENTS:
+        # 1 is the default of the model, a scale set by hand is kept. Stored deltas hold their own step
+        op.execute(
+            sa.text(
+                "UPDATE meteor_core.observation_element SET scale = :scale, \"offset\" = :offset "
+                "WHERE name = :name AND (scale IS NULL OR scale = 1)"
+            ).bindparams(name=name, scale=scale, offset=offset)
+        )
+
+
+def downgrade() -> None:
+    # scale is part of the model, it is kept
+    op.drop_column('observation_element', 'offset', schema='meteor_core')
@@ -0,0 +1,43 @@
+"""Add precipitation accumulation elements
+
+Revision ID: b5e2a9d4c7f1
+Revises: 7f2c4e9a1b60
+Create Date: 2026-10-18 21:14:52.308716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2a9d4c7f1'
+down_revision: Union[str, None] = '7f2c4e9a1b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# maintained from reflectivity by meteor.observation.accumulation, stored in steps of 0.1 mm
+ELEMENTS = [
+    ("precipitation-1h", "RR1H", "Rainfall accumulated over the last hour"),
+    ("precipitation-3h", "RR3H", "Rainfall accumulated over the last 3 hours"),
+    ("precipitation-24h", "RR24H", "Rainfall accumulated over the last 24 hours"),
+]
+
+
+def upgrade() -> None:
+    for name, abbreviation, description in ELEMENTS:
+        op.execute(
+            sa.text(
+                "INSERT INTO meteor_core.observation_element (name, abbreviation, description, unit, scale, \"offset\") "
+                "VALUES (:name, :abbreviation, :description, 'mm', 0.1, 0) ON CONFLICT (name) DO NOTHING"
+            ).bindparams(name=name, abbreviation=abbreviation, description=description)
+        )
+
+
+def downgrade() -> None:
+    op.execute(
+        sa.text("DELETE FROM meteor_core.observation_element WHERE name IN :names").bindparams(
+            sa.bindparam("names", value=[name for name, _, _ in ELEMENTS], expanding=True)
+        )
+    )
@@ -0,0 +1,28 @@
+"""Add observation value delta chain
+
+Revision ID: 3d9a6f2b8e15
+Revises: e41d7b9a0c53
+Create Date: 2026-10-18 17:12:45.203817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a6f2b8e15'
+down_revision: Union[str, None] = 'e41d7b9a0c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('observation_value', sa.Column('keyframe_at', sa.DateTime(), nullable=True))
+    op.add_column('observation_value', sa.Column('delta_scale', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('observation_value', 'delta_scale')
+    op.drop_column('observation_value', 'keyframe_at')
@@ -0,0 +1,75 @@
+"""Store observation values uncompressed out of line
+
+Revision ID: 5b0e7c2d91a4
+Revises: 1a4019cadd38
+Create Date: 2026-10-18 09:12:31.204518
+
+"""
+import io
+from typing import Sequence, Union
+
+from alembic import context, op
+import numpy as np
+import sqlalchemy as sa
+
+from meteor.observation import codec
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e7c2d91a4'
+down_revision: Union[str, None] = '1a4019cadd38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# values stored before meteor.observation.codec are .npy arrays without any geo-reference, the
+# geometry they are re-encoded with is passed as -x legacy_geometry=north,west,lat_step,lon_step
+LEGACY_GEOMETRY = "legacy_geometry"
+
+
+def legacy_geometry() -> codec.GridGeometry:
+    geometry = context.get_x_argument(as_dictionary=True).get(LEGACY_GEOMETRY)
+    if not geometry:
+        raise RuntimeError(
+            "Observation values stored before the chunked grid format have no geo-reference, "
+            f"rerun the migration with -x {LEGACY_GEOMETRY}=north,west,lat_step,lon_step."
+        )
+    return codec.GridGeometry(*(float(part) for part in geometry.split(",")))
+
+
+def convert_values(condition: str, convert) -> None:
+    # one value at a time, scans can be large
+    connection = op.get_bind()
+    row = "id = :id AND organization_id = :organization_id"
+    ids = connection.execute(sa.text(f"SELECT id, organization_id FROM observation_value WHERE {condition}")).all()
+    for id, organization_id in ids:
+        keys = {"id": id, "organization_id": organization_id}
+        value = connection.execute(sa.text(f"SELECT value FROM observation_value WHERE {row}"), keys).scalar_one()
+        update = sa.text(f"UPDATE observation_value SET value = :value WHERE {row}")
+        connection.execute(update, {"value": convert(bytes(value)), **keys})
+
+
+def to_grid(value: bytes, geometry: codec.GridGeometry) -> bytes:
+    return codec.encode_grid(np.load(io.BytesIO(value), allow_pickle=False), geometry)
+
+
+def upgrade() -> None:
+    # values are chunked and compressed by meteor.observation.codec, EXTERNAL skips the
+    # redundant TOAST compression and lets substring() read single chunks without detoasting
+    # the whole blob
+    op.execute("ALTER TABLE observation_value ALTER COLUMN value SET STORAGE EXTERNAL")
+
+    legacy = f"substring(value from 1 for {len(codec.MAGIC)}) <> '\\x{codec.MAGIC.hex()}'::bytea"
+    if op.get_bind().execute(sa.text(f"SELECT EXISTS (SELECT FROM observation_value WHERE {legacy})")).scalar():
+        geometry = legacy_geometry()
+        convert_values(legacy, lambda value: to_grid(value, geometry))
+
+
+def to_npy(value: bytes) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, codec.decode_grid(value), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def downgrade() -> None:
+    convert_values(f"substring(value from 1 for {len(codec.MAGIC)}) = '\\x{codec.MAGIC.hex()}'::bytea", to_npy)
+    op.execute("ALTER TABLE observation_value ALTER COLUMN value SET STORAGE EXTENDED")
@@ -0,0 +1,27 @@
+"""Add observation value pyramid
+
+Revision ID: 8c3f1a6e4d27
+Revises: 5b0e7c2d91a4
+Create Date: 2026-10-18 14:40:02.718342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3f1a6e4d27'
+down_revision: Union[str, None] = '5b0e7c2d91a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('observation_value', sa.Column('pyramid', sa.LargeBinary(), nullable=True))
+    op.execute("ALTER TABLE observation_value ALTER COLUMN pyramid SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    op.drop_column('observation_value', 'pyramid')
@@ -0,0 +1,28 @@
+"""Add observation value content hash
+
+Revision ID: a6e8d3c1f947
+Revises: 3d9a6f2b8e15
+Create Date: 2026-10-18 19:26:11.580734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e8d3c1f947'
+down_revision: Union[str, None] = '3d9a6f2b8e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('observation_value', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    # same digest as meteor.observation.service.content_hash
+    op.execute("UPDATE observation_value SET content_hash = md5(value || coalesce(pyramid, ''::bytea))")
+
+
+def downgrade() -> None:
+    op.drop_column('observation_value', 'content_hash')
@@ -0,0 +1,111 @@
+"""Partition observation values by capture month
+
+Revision ID: e41d7b9a0c53
+Revises: 8c3f1a6e4d27
+Create Date: 2026-10-18 17:05:44.391027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41d7b9a0c53'
+down_revision: Union[str, None] = '8c3f1a6e4d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, observation_element_id, captured_at, value, pyramid, organization_id, updated_at, created_at"
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE observation_value RENAME TO observation_value_heap")
+    op.execute("ALTER TABLE observation_value_heap RENAME CONSTRAINT observation_value_pkey TO observation_value_heap_pkey")
+
+    op.create_table('observation_value',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('observation_value_id_seq'::regclass)"), nullable=False),
+    sa.Column('observation_element_id', sa.Integer(), nullable=True),
+    sa.Column('captured_at', sa.DateTime(), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('pyramid', sa.LargeBinary(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['observation_element_id'], ['meteor_core.observation_element.id'], ),
+    sa.ForeignKeyConstraint(['organization_id'], ['meteor_core.organization.id'], ),
+    sa.PrimaryKeyConstraint('id', 'organization_id', 'captured_at'),
+    postgresql_partition_by='RANGE (captured_at)',
+    )
+    op.execute("ALTER TABLE observation_value ALTER COLUMN value SET STORAGE EXTERNAL")
+    op.execute("ALTER TABLE observation_value ALTER COLUMN pyramid SET STORAGE EXTERNAL")
+    # created on the parent, so every partition gets its own BRIN index, including future ones
+    op.create_index(
+        'observation_value_captured_at_idx',
+        'observation_value',
+        ['captured_at'],
+        unique=False,
+        postgresql_using='brin',
+        postgresql_with={'pages_per_range': 32},
+    )
+
+    # monthly partitions from the oldest existing row up to three months ahead,
+    # later months are created by `meteor database partitions` and on ingest
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN SELECT generate_series(
+                date_trunc('month', (SELECT coalesce(min(created_at), timezone('utc', now())) FROM observation_value_heap)),
+                date_trunc('month', timezone('utc', now())) + interval '3 months',
+                interval '1 month'
+            ) LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF observation_value FOR VALUES FROM (%L) TO (%L)',
+                    'observation_value_' || to_char(month, '"y"YYYY"m"MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END $$;
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO observation_value ({COLUMNS}) "
+        "SELECT id, observation_element_id, coalesce(created_at, timezone('utc', now())), value, pyramid, "
+        "organization_id, updated_at, created_at FROM observation_value_heap"
+    )
+    op.execute("ALTER SEQUENCE observation_value_id_seq OWNED BY observation_value.id")
+    op.drop_table('observation_value_heap')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE observation_value RENAME TO observation_value_partitioned")
+
+    op.create_table('observation_value',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('observation_value_id_seq'::regclass)"), nullable=False),
+    sa.Column('observation_element_id', sa.Integer(), nullable=True),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('pyramid', sa.LargeBinary(), nullable=True),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['observation_element_id'], ['meteor_core.observation_element.id'], ),
+    sa.ForeignKeyConstraint(['organization_id'], ['meteor_core.organization.id'], ),
+    sa.PrimaryKeyConstraint('id', 'organization_id', name='observation_value_heap_pkey'),
+    )
+    op.execute("ALTER TABLE observation_value ALTER COLUMN value SET STORAGE EXTERNAL")
+    op.execute("ALTER TABLE observation_value ALTER COLUMN pyramid SET STORAGE EXTERNAL")
+
+    op.execute(
+        "INSERT INTO observation_value (id, observation_element_id, value, pyramid, organization_id, updated_at, created_at) "
+        "SELECT id, observation_element_id, value, pyramid, organization_id, updated_at, created_at "
+        "FROM observation_value_partitioned"
+    )
+    op.execute("ALTER SEQUENCE observation_value_id_seq OWNED BY observation_value.id")
+    op.execute("DROP TABLE observation_value_partitioned CASCADE")
+    op.execute("ALTER TABLE observation_value RENAME CONSTRAINT observation_value_heap_pkey TO observation_value_pkey")
@@ -1,23 +1,27 @@
+import asyncio
+import base64
+import binascii
 import json
 import logging
 from collections import namedtuple
 from collections.abc import Iterable
+from datetime import date, datetime
 from inspect import signature
 from itertools import chain
-from typing import Annotated, List
+from typing import Annotated, Any, Awaitable, List, Optional
 
 from fastapi import Depends, Query
-from pydantic import BaseModel
-from pydantic.error_wrappers import ErrorWrapper, ValidationError
+from fastapi.exceptions import RequestValidationError
 from pydantic.types import Json, constr
 from six import string_types
 from sortedcontainers import SortedSet
-from sqlalchemy import and_, desc, func, not_, or_, orm
-from sqlalchemy.exc import InvalidRequestError, ProgrammingError
-from sqlalchemy.orm.mapper import Mapper
-from sqlalchemy_filters import apply_pagination, apply_sort
-from sqlalchemy_filters.exceptions import BadFilterFormat, FieldNotFound
-from sqlalchemy_filters.models import Field, get_model_from_spec
+from sqlalchemy import Select, and_, desc, false, func, inspect, not_, or_, orm, select, tuple_
+from sqlalchemy.exc import ArgumentError, InvalidRequestError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy_filters.exceptions import BadFilterFormat, BadSortFormat, BadSpec, FieldNotFound
+from sqlalchemy_filters.models import Field
 
 from meteor.auth.models import MeteorUser
 from meteor.auth.service import CurrentUser, get_current_role
@@ -25,8 +29,8 @@ from meteor.auth.service import CurrentUser, get_current_role
 # from meteor.data.query.models import Query as QueryModel
 # from meteor.data.source.models import Source
 from meteor.database.core import DbSession
-from meteor.enums import UserRoles, Visibility
-from meteor.exceptions import FieldNotFoundError, InvalidFilterError
+from meteor.enums import CountMode, UserRoles, Visibility
+from meteor.exceptions import FieldNotFoundError, InvalidCursorError, InvalidFilterError
 # from meteor.feedback.incident.models import Feedback
 # from meteor.incident.models import Incident
 # from meteor.incident.type.models import IncidentType
@@ -43,7 +47,7 @@ from .core import Base, get_class_by_tablename, get_model_name_by_tablename
 log = logging.getLogger(__file__)
 
 # allows only printable characters
-QueryStr = constr(regex=r"^[ -~]+$", min_length=1)
+QueryStr = constr(pattern=r"^[ -~]+$", min_length=1)
 
 BooleanFunction = namedtuple("BooleanFunction", ("key", "sqlalchemy_fn", "only_one_arg"))
 BOOLEAN_FUNCTIONS = [
@@ -116,7 +120,7 @@ class Filter(object):
                 return {self.filter_spec["model"]}
         return set()
 
-    def format_for_sqlalchemy(self, query, default_model):
+    def format_for_sqlalchemy(self, models, default_model):
         filter_spec = self.filter_spec
         if filter_spec.get("model") in ["Participant", "Commander"]:
             filter_spec["model"] = "IndividualContact"
@@ -124,7 +128,7 @@ class Filter(object):
         operator = self.operator
         value = self.value
 
-        model = get_model_from_spec(filter_spec, query, default_model)
+        model = get_model_from_spec(filter_spec, models, default_model)
 
         function = operator.function
         arity = operator.arity
@@ -153,8 +157,13 @@ class BooleanFilter(object):
                 models.add(*named_models)
         return models
 
-    def format_for_sqlalchemy(self, query, default_model):
-        return self.function(*[filter.format_for_sqlalchemy(query, default_model) for filter in self.filters])
+    def format_for_sqlalchemy(self, models, default_model):
+        return self.function(*[filter.format_for_sqlalchemy(models, default_model) for filter in self.filters])
+
+
+def invalid_parameter(loc: str, msg: str, error: type) -> RequestValidationError:
+    """Returns the 422 error of an invalid query parameter, in the shape FastAPI reports validation errors."""
+    return RequestValidationError([{"loc": (loc,), "msg": msg, "type": error.code}])
 
 
 def _is_iterable_filter(filter_spec):
@@ -188,29 +197,24 @@ def build_filters(filter_spec):
     return [Filter(filter_spec)]
 
 
-def get_query_models(query):
-    """Get models from query.
+def get_model_from_spec(spec: dict, models: dict, default_model=None):
+    """Returns the model a filter or sort spec applies to, the default model when it names none.
 
-    :param query:
-                    A :class:`sqlalchemy.orm.Query` instance.
+    :param models:
+                    The models of the statement being built, by name.
 
-    :returns:
-                    A dictionary with all the models included in the query.
+    :raise BadSpec:
+                    If the spec is ambiguous or refers to a model not in the statement.
     """
-    models = [col_desc["entity"] for col_desc in query.column_descriptions]
-    models.extend(mapper.class_ for mapper in query._join_entities)
-
-    # account also query.select_from entities
-    if hasattr(query, "_select_from_entity") and (query._select_from_entity is not None):
-        model_class = (
-            query._select_from_entity.class_
-            if isinstance(query._select_from_entity, Mapper)  # sqlalchemy>=1.1
-            else query._select_from_entity  # sqlalchemy==1.0
-        )
-        if model_class not in models:
-            models.append(model_class)
+    model_name = spec.get("model")
+    if model_name is None:
+        if default_model is None:
+            raise BadSpec("Ambiguous spec. Please specify a model.")
+        return default_model
 
-    return {model.__name__: model for model in models}
+    if model_name not in models:
+        raise BadSpec(f"The query does not contain model `{model_name}`.")
+    return models[model_name]
 
 
 def get_model_class_by_name(registry, name):
@@ -227,56 +231,47 @@ def get_named_models(filters):
     return models
 
 
-def get_default_model(query):
-    """Return the singular model from `query`, or `None` if `query` contains
-    multiple models.
-    """
-    query_models = get_query_models(query).values()
-    if len(query_models) == 1:
-        (default_model,) = iter(query_models)
-    else:
-        default_model = None
-    return default_model
-
-
-def auto_join(query, model_names):
-    """Automatically join models to `query` if they're not already present
+def auto_join(statement: Select, models: dict, model_names) -> Select:
+    """Automatically join models to `statement` if they're not already present
     and the join can be done implicitly.
     """
-    # every model has access to the registry, so we can use any from the query
-    query_models = get_query_models(query).values()
-    model_registry = list(query_models)[-1]._decl_class_registry
-
+    root = next(iter(models.values()))
     for name in model_names:
-        model = get_model_class_by_name(model_registry, name)
-        if model not in get_query_models(query).values():
-            try:
-                query = query.join(model)
-            except InvalidRequestError:
-                pass  # can't be autojoined
-    return query
+        model = get_model_class_by_name(Base.registry._class_registry, name)
+        if model is None or name in models:
+            continue
+
+        # the joins of a select are only resolved when it is compiled, try it up front
+        try:
+            orm.join(root, model)
+        except (ArgumentError, InvalidRequestError):
+            continue  # can't be autojoined
 
+        statement = statement.join(model)
+        models[name] = model
+    return statement
 
-def apply_model_specific_filters(model: Base, query: orm.Query, current_user: MeteorUser, role: UserRoles):
+
+def apply_model_specific_filters(model: Base, statement: Select, current_user: MeteorUser, role: UserRoles):
     """Applies any model specific filter as it pertains to the given user."""
     model_map = {
-        Incident: [restricted_incident_filter],
+        # Incident: [restricted_incident_filter],
         # IncidentType: [restricted_incident_type_filter],
     }
 
     filters = model_map.get(model, [])
 
     for f in filters:
-        query = f(query, current_user, role)
+        statement = f(statement, current_user, role)
 
-    return query
+    return statement
 
 
-def apply_filters(query, filter_spec, model_cls=None, do_auto_join=True):
-    """Apply filters to a SQLAlchemy query.
+def apply_filters(statement: Select, filter_spec, models: dict, default_model=None, do_auto_join=True):
+    """Apply filters to a SQLAlchemy select.
 
-    :param query:
-                    A :class:`sqlalchemy.orm.Query` instance.
+    :param statement:
+                    A :class:`sqlalchemy.sql.Select` instance.
 
     :param filter_spec:
                     A dict or an iterable of dicts, where each one includes
@@ -289,8 +284,7 @@ def apply_filters(query, filter_spec, model_cls=None, do_auto_join=True):
                                                     {'model': 'Foo', 'field': 'name', 'op': '==', 'value': 'foo'},
                                     ]
 
-                    If the query being modified refers to a single model, the `model` key
-                    may be omitted from the filter spec.
+                    The `model` key may be omitted from the filter specs of the default model.
 
                     Filters may be combined using boolean functions.
 
@@ -303,29 +297,29 @@ def apply_filters(query, filter_spec, model_cls=None, do_auto_join=True):
                                                     ]
                                     }
 
+    :param models:
+                    The models of the statement by name, models joined to apply the
+                    filters are added to it.
+
     :returns:
-                    The :class:`sqlalchemy.orm.Query` instance after all the filters
+                    The :class:`sqlalchemy.sql.Select` instance after all the filters
                     have been applied.
     """
-    default_model = get_default_model(query)
-    if not default_model:
-        default_model = model_cls
-
     filters = build_filters(filter_spec)
     filter_models = get_named_models(filters)
 
     if do_auto_join:
-        query = auto_join(query, filter_models)
+        statement = auto_join(statement, models, filter_models)
 
-    sqlalchemy_filters = [filter.format_for_sqlalchemy(query, default_model) for filter in filters]
+    sqlalchemy_filters = [filter.format_for_sqlalchemy(models, default_model) for filter in filters]
 
     if sqlalchemy_filters:
-        query = query.filter(*sqlalchemy_filters)
+        statement = statement.where(*sqlalchemy_filters)
 
-    return query
+    return statement
 
 
-def apply_filter_specific_joins(model: Base, filter_spec: dict, query: orm.query):
+def apply_filter_specific_joins(model: Base, filter_spec: dict, statement: Select, models: dict) -> Select:
     """Applies any model specific implicitly joins."""
     # this is required because by default sqlalchemy-filter's auto-join
     # knows nothing about how to join many-many relationships.
@@ -357,19 +351,23 @@ def apply_filter_specific_joins(model: Base, filter_spec: dict, query: orm.query
     filters = build_filters(filter_spec)
 
     # Replace mapping if looking for commander
-    if "Commander" in str(filter_spec):
-        model_map.update({(Incident, "IndividualContact"): (Incident.commander, True)})
+    # if "Commander" in str(filter_spec):
+    #     model_map.update({(Incident, "IndividualContact"): (Incident.commander, True)})
 
     filter_models = get_named_models(filters)
     for filter_model in filter_models:
         if model_map.get((model, filter_model)):
             joined_model, is_outer = model_map[(model, filter_model)]
             try:
-                query = query.join(joined_model, isouter=is_outer)
+                statement = statement.join(joined_model, isouter=is_outer)
             except Exception as e:
                 log.debug(str(e))
+                continue
+            # either a model or a relationship to one
+            joined_class = joined_model.property.mapper.class_ if hasattr(joined_model, "property") else joined_model
+            models[joined_class.__name__] = joined_class
 
-    return query
+    return statement
 
 
 def composite_search(*, db_session, query_str: str, models: List[Base], current_user: MeteorUser):
@@ -384,7 +382,7 @@ def composite_search(*, db_session, query_str: str, models: List[Base], current_
     return s.search(query=query)
 
 
-def search(*, query_str: str, query: Query, model: str, sort=False):
+def search(*, query_str: str, query: Select, model: str, sort=False):
     """Perform a search based on the query."""
     search_model = get_class_by_tablename(model)
 
@@ -405,9 +403,9 @@ def search(*, query_str: str, query: Query, model: str, sort=False):
     if not search:
         raise Exception(f"Search not supported for model: {model}")
 
-    query = query.filter(or_(*search))
+    query = query.where(or_(*search))
 
-    if sort:
+    if sort and hasattr(search_model, "search_vector"):
         query = query.order_by(desc(func.ts_rank_cd(vector, func.tsq_parse(query_str))))
 
     return query.params(term=query_str)
@@ -437,9 +435,269 @@ def create_sort_spec(model, sort_by, descending):
     return sort_spec
 
 
+def sort_columns(sort_spec: List[dict], models: dict, default_model=None) -> List[tuple[Any, str]]:
+    """Resolves the (field, direction) pairs of a sort spec, the models it refers to have to be joined."""
+    columns = []
+    for spec in sort_spec:
+        direction = spec.get("direction")
+        if direction not in ("asc", "desc"):
+            raise BadSortFormat(f"Direction `{direction}` not valid.")
+
+        model = get_model_from_spec(spec, models, default_model)
+        columns.append((Field(model, spec["field"]).get_sqlalchemy_field(), direction))
+    return columns
+
+
+def join_sort_models(statement: Select, sort_spec: List[dict], models: dict) -> Select:
+    """Joins the models a sort spec refers to."""
+    return auto_join(statement, models, [spec["model"] for spec in sort_spec if "model" in spec])
+
+
+def order_by_columns(statement: Select, columns: List[tuple[Any, str]]) -> Select:
+    return statement.order_by(*(field.desc() if direction == "desc" else field.asc() for field, direction in columns))
+
+
+def apply_sort(statement: Select, sort_spec: List[dict], models: dict, default_model=None) -> Select:
+    """Orders a SQLAlchemy select by a sort spec, joining the models it refers to."""
+    statement = join_sort_models(statement, sort_spec, models)
+    return order_by_columns(statement, sort_columns(sort_spec, models, default_model))
+
+
+def keyset_columns(model_cls, sort_spec: List[dict], models: dict) -> List[tuple[Any, str]]:
+    """
+    The (field, direction) pairs keyset pagination orders by: the fields of the sort spec followed
+    by the primary key, which makes the order total.
+    """
+    mapper = inspect(model_cls)
+    return sort_columns(sort_spec, models, model_cls) + [
+        (getattr(model_cls, mapper.get_property_by_column(column).key), "asc") for column in mapper.primary_key
+    ]
+
+
+def _column_key(field, direction: str) -> str:
+    return f"{field.class_.__name__}.{field.key}:{direction}"
+
+
+def encode_cursor(columns: List[tuple[Any, str]], values: List[Any]) -> str:
+    """Encodes the sort key of the last row of a page, and the order it is a key of, into an opaque cursor."""
+    payload = {"k": [_column_key(*column) for column in columns], "v": values}
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode().rstrip("=")
+
+
+def _decode_value(field, value):
+    # values of the types JSON holds come back as they were encoded, the others as strings
+    if value is None:
+        return None
+    try:
+        python_type = field.type.python_type
+    except NotImplementedError:
+        return value
+
+    if isinstance(value, python_type) and (python_type is bool or not isinstance(value, bool)):
+        return value
+    if python_type in (bool, int, str) or isinstance(value, bool):
+        raise ValueError(f"`{value}` is not a value of {field.key}.")
+    try:
+        if python_type in (datetime, date):
+            return python_type.fromisoformat(value)
+        return python_type(value)
+    except (ArithmeticError, AttributeError, TypeError, ValueError):
+        raise ValueError(f"`{value}` is not a value of {field.key}.") from None
+
+
+def decode_cursor(cursor: str, columns: List[tuple[Any, str]]) -> List[Any]:
+    """Returns the sort key values of a cursor, checking that it was issued for the same order."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["k"] != [_column_key(*column) for column in columns]:
+            raise ValueError("The cursor was issued for another sort order.")
+        if len(payload["v"]) != len(columns):
+            raise ValueError("The cursor does not hold a value per sort key.")
+        return [_decode_value(field, value) for (field, _), value in zip(columns, payload["v"])]
+    except (binascii.Error, KeyError, TypeError, ValueError) as e:
+        raise invalid_parameter("cursor", f"Invalid cursor: {e}", InvalidCursorError) from None
+
+
+def _nullable(field) -> bool:
+    columns = getattr(getattr(field, "property", None), "columns", None)
+    return not columns or bool(columns[0].nullable)
+
+
+def _after(field, direction: str, value):
+    # rows strictly after the value in the order of Postgres, where NULLs sort as the largest values
+    if direction == "asc":
+        if value is None:
+            return false()
+        return or_(field > value, field.is_(None)) if _nullable(field) else field > value
+    return field.isnot(None) if value is None else field < value
+
+
+def seek_predicate(columns: List[tuple[Any, str]], values: List[Any]):
+    """
+    The condition selecting the rows that follow a sort key. A single row value comparison when every
+    field is not nullable and sorted the same way, so that an index on the fields can seek to the key.
+    """
+    directions = {direction for _, direction in columns}
+    if len(directions) == 1 and not any(_nullable(field) for field, _ in columns) and None not in values:
+        fields, keys = tuple_(*(field for field, _ in columns)), tuple_(*values)
+        return fields > keys if directions == {"asc"} else fields < keys
+
+    # (a > x) or (a = x and b > y) or ...
+    equal = [field.is_(None) if value is None else field == value for (field, _), value in zip(columns, values)]
+    return or_(
+        *(
+            and_(*equal[:index], _after(field, direction, value))
+            for index, ((field, direction), value) in enumerate(zip(columns, values))
+        )
+    )
+
+
 def get_all(*, db_session, model):
-    """Fetches a query object based on the model class name."""
-    return db_session.query(get_class_by_tablename(model))
+    """Fetches a select of all the rows of a model, by its class name."""
+    return select(get_class_by_tablename(model))
+
+
+class Explain(Executable, ClauseElement):
+    """The JSON plan of a select, ``EXPLAIN`` without running it."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+async def count_results(db_session: AsyncSession, statement: Select) -> int:
+    """Counts the rows a select returns."""
+    return await db_session.scalar(select(func.count()).select_from(statement.order_by(None).subquery()))
+
+
+async def estimate_results(db_session: AsyncSession, statement: Select) -> int:
+    """Returns the estimate of the planner of the rows a select returns, from its statistics."""
+    plan = await db_session.scalar(Explain(statement.order_by(None)))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# how the total of the rows of a select is counted, besides reading its page
+COUNTS = {
+    CountMode.exact: count_results,
+    CountMode.estimate: estimate_results,
+}
+
+
+async def fetch_page(db_session: AsyncSession, statement: Select, page: int, items_per_page: int = None) -> list:
+    """Fetches a page of the entities a select returns, all of them without a page size."""
+    if items_per_page is not None:
+        statement = statement.limit(items_per_page).offset((page - 1) * items_per_page)
+    return (await db_session.execute(statement)).scalars().all()
+
+
+async def fetch_windowed_page(
+    db_session: AsyncSession, statement: Select, page: int, items_per_page: int = None
+) -> tuple[list, Optional[int]]:
+    """
+    Fetches a page of the entities a select returns, all of them being counted by the same query with
+    ``count(*) OVER ()``. The count is None when there is no row to read it from, past the last page.
+    """
+    statement = statement.add_columns(func.count().over())
+    if items_per_page is not None:
+        statement = statement.limit(items_per_page).offset((page - 1) * items_per_page)
+
+    rows = (await db_session.execute(statement)).all()
+    if rows:
+        return [row[0] for row in rows], rows[0][1]
+    return [], 0 if items_per_page is None or page == 1 else None
+
+
+async def fetch_keyset_page(
+    db_session: AsyncSession,
+    statement: Select,
+    columns: List[tuple[Any, str]],
+    after: Optional[List[Any]],
+    items_per_page: int = None,
+) -> tuple[list, Optional[List[Any]]]:
+    """
+    Fetches the page of the entities a select returns that follows the sort key ``after``, the first page
+    without one. Returns them with the sort key of the last one when more rows follow.
+    """
+    if after is not None:
+        statement = statement.where(seek_predicate(columns, after))
+    statement = order_by_columns(statement, columns).add_columns(*(field for field, _ in columns))
+    if items_per_page is not None:
+        # one more row tells whether there is a next page
+        statement = statement.limit(items_per_page + 1)
+
+    rows = (await db_session.execute(statement)).all()
+    if items_per_page is None or len(rows) <= items_per_page:
+        return [row[0] for row in rows], None
+    rows = rows[:items_per_page]
+    return [row[0] for row in rows], list(rows[-1][1:])
+
+
+async def paginate(
+    db_session: AsyncSession,
+    statement: Select,
+    fetch: Awaitable,
+    count_mode: CountMode = CountMode.exact,
+    concurrent: bool = False,
+) -> tuple[Any, Optional[int]]:
+    """
+    Awaits ``fetch``, reading a page of a select through ``db_session``, and counts all the rows of the
+    select the way ``count_mode`` tells, not at all with ``CountMode.none``. With ``concurrent``, the
+    count runs at the same time on a second connection of the pool.
+    """
+    count = COUNTS.get(count_mode)
+    if count is None:
+        return await fetch, None
+
+    if not concurrent:
+        page = await fetch
+        return page, await count(db_session, statement)
+
+    async with AsyncSession(bind=db_session.bind) as count_session:
+        try:
+            async with asyncio.TaskGroup() as group:
+                page = group.create_task(fetch)
+                total = group.create_task(count(count_session, statement))
+        except ExceptionGroup as e:
+            # the first failure cancels the other query, raise it as the sequential path would
+            raise e.exceptions[0] from None
+    return page.result(), total.result()
+
+
+async def fetch_and_count(
+    db_session: AsyncSession,
+    statement: Select,
+    page: int,
+    items_per_page: int = None,
+    columns: Optional[List[tuple[Any, str]]] = None,
+    after: Optional[List[Any]] = None,
+    count_mode: CountMode = CountMode.exact,
+    concurrent: bool = False,
+) -> tuple[list, Optional[List[Any]], Optional[int], CountMode]:
+    """
+    Fetches a page of a select as ``fetch_results`` does and counts the rows of the select. Returns the
+    items, the sort key of the next page, the total and the count mode it was counted with: a windowed
+    count falls back to an exact one by keyset, where the window would only count the rows from the
+    page on, and past the last page, where there is no row to read it from.
+    """
+    if count_mode == CountMode.window and columns is None:
+        items, total = await fetch_windowed_page(db_session, statement, page, items_per_page)
+        if total is not None:
+            return items, None, total, count_mode
+        return items, None, await count_results(db_session, statement), CountMode.exact
+
+    if count_mode == CountMode.window:
+        count_mode = CountMode.exact
+    fetch = fetch_results(db_session, statement, page, items_per_page, columns, after)
+    (items, last), total = await paginate(db_session, statement, fetch, count_mode, concurrent)
+    return items, last, total, count_mode
 
 
 def common_parameters(
@@ -451,6 +709,8 @@ def common_parameters(
     filter_spec: Json = Query([], alias="filter"),
     sort_by: List[str] = Query([], alias="sortBy[]"),
     descending: List[bool] = Query([], alias="descending[]"),
+    cursor: Optional[str] = Query(None),
+    count_mode: CountMode = Query(CountMode.exact, alias="countMode"),
     role: UserRoles = Depends(get_current_role),
 ):
     return {
@@ -461,19 +721,56 @@ def common_parameters(
         "filter_spec": filter_spec,
         "sort_by": sort_by,
         "descending": descending,
+        "cursor": cursor,
+        "count_mode": count_mode,
         "current_user": current_user,
         "role": role,
     }
 
 
 CommonParameters = Annotated[
-    dict[str, int | CurrentUser | DbSession | QueryStr | Json | List[str] | List[bool] | UserRoles],
+    dict[str, int | CurrentUser | DbSession | QueryStr | Json | List[str] | List[bool] | CountMode | UserRoles],
     Depends(common_parameters),
 ]
 
 
-def search_filter_sort_paginate(
-    db_session,
+def apply_order(
+    statement: Select, model: str, sort_by, descending, models: dict, keyset: bool = False
+) -> tuple[Select, Optional[List[tuple[Any, str]]]]:
+    """
+    Orders a select by the fields of ``sort_by``. With ``keyset``, only joins the models they refer to
+    and returns the (field, direction) pairs the keyset pages of the select follow, the primary key
+    alone without a sort.
+    """
+    model_cls = get_class_by_tablename(model)
+    sort_spec = create_sort_spec(model, sort_by, descending) if sort_by else []
+    if keyset:
+        statement = join_sort_models(statement, sort_spec, models)
+        return statement, keyset_columns(model_cls, sort_spec, models)
+    if sort_spec:
+        statement = apply_sort(statement, sort_spec, models, model_cls)
+    return statement, None
+
+
+async def fetch_results(
+    db_session: AsyncSession,
+    statement: Select,
+    page: int,
+    items_per_page: int = None,
+    columns: Optional[List[tuple[Any, str]]] = None,
+    after: Optional[List[Any]] = None,
+) -> tuple[list, Optional[List[Any]]]:
+    """
+    Fetches a page of a select by offset, or by keyset following the sort key ``after`` when the keyset
+    ``columns`` are given. Returns its items and, by keyset, the sort key of its last one if more follow.
+    """
+    if columns is None:
+        return await fetch_page(db_session, statement, page, items_per_page), None
+    return await fetch_keyset_page(db_session, statement, columns, after, items_per_page)
+
+
+async def search_filter_sort_paginate(
+    db_session: AsyncSession,
     model,
     query_str: str = None,
     filter_spec: List[dict] = None,
@@ -483,74 +780,89 @@ def search_filter_sort_paginate(
     descending: List[bool] = None,
     current_user: MeteorUser = None,
     role: UserRoles = UserRoles.member,
+    cursor: str = None,
+    count_mode: CountMode = CountMode.exact,
+    concurrent: bool = False,
 ):
-    """Common functionality for searching, filtering, sorting, and pagination."""
+    """
+    Common functionality for searching, filtering, sorting, and pagination.
+    Pass ``concurrent`` to count the results on a second connection while the page is fetched.
+
+    With a ``cursor``, empty for the first page, pages are read by keyset instead of by offset: the
+    page follows the sort key the cursor holds, and ``nextCursor`` holds the key of its last item.
+    ``page`` is then ignored, and search results are not ordered by rank.
+
+    ``count_mode`` tells how ``total`` is counted: exactly, by a window over the page query, from the
+    estimate of the planner or not at all. ``countMode`` holds the mode it was counted with.
+    """
     model_cls = get_class_by_tablename(model)
+    # the models of the statement by name, filters and sorts may join more of them
+    models = {model_cls.__name__: model_cls}
 
     try:
-        query = db_session.query(model_cls)
+        query = select(model_cls)
 
         if query_str:
-            sort = False if sort_by else True
+            sort = False if sort_by or cursor is not None else True
             query = search(query_str=query_str, query=query, model=model, sort=sort)
 
-        query_restricted = apply_model_specific_filters(model_cls, query, current_user, role)
-
         if filter_spec:
-            query = apply_filter_specific_joins(model_cls, filter_spec, query)
-            query = apply_filters(query, filter_spec, model_cls)
+            query = apply_filter_specific_joins(model_cls, filter_spec, query, models)
+            query = apply_filters(query, filter_spec, models, model_cls)
 
-        if model == "Incident":
-            query = query.intersect(query_restricted)
+        query = apply_model_specific_filters(model_cls, query, current_user, role)
 
-        if sort_by:
-            sort_spec = create_sort_spec(model, sort_by, descending)
-            query = apply_sort(query, sort_spec)
+        query, columns = apply_order(query, model, sort_by, descending, models, keyset=cursor is not None)
 
     except FieldNotFound as e:
-        raise ValidationError(
-            [
-                ErrorWrapper(FieldNotFoundError(msg=str(e)), loc="filter"),
-            ],
-            model=BaseModel,
-        ) from None
-    except BadFilterFormat as e:
-        raise ValidationError([ErrorWrapper(InvalidFilterError(msg=str(e)), loc="filter")], model=BaseModel) from None
+        raise invalid_parameter("filter", str(e), FieldNotFoundError) from None
+    except (BadFilterFormat, BadSortFormat, BadSpec) as e:
+        raise invalid_parameter("filter", str(e), InvalidFilterError) from None
 
     if items_per_page == -1:
         items_per_page = None
 
+    after = decode_cursor(cursor, columns) if cursor else None
+
     # sometimes we get bad input for the search function
     # TODO investigate moving to a different way to parsing queries that won't through errors
     # e.g. websearch_to_tsquery
     # https://www.postgresql.org/docs/current/textsearch-controls.html
+
     try:
-        query, pagination = apply_pagination(query, page_number=page, page_size=items_per_page)
+        items, last, total, count_mode = await fetch_and_count(
+            db_session, query, page, items_per_page, columns, after, count_mode, concurrent
+        )
     except ProgrammingError as e:
         log.debug(e)
+        await db_session.rollback()
         return {
             "items": [],
             "itemsPerPage": items_per_page,
             "page": page,
             "total": 0,
+            "countMode": count_mode,
+            "nextCursor": None,
         }
 
     return {
-        "items": query.all(),
-        "itemsPerPage": pagination.page_size,
-        "page": pagination.page_number,
-        "total": pagination.total_results,
+        "items": items,
+        "itemsPerPage": items_per_page,
+        "page": page,
+        "total": total,
+        "countMode": count_mode,
+        "nextCursor": encode_cursor(columns, last) if last is not None else None,
     }
 
 
-def restricted_incident_filter(query: orm.Query, current_user: MeteorUser, role: UserRoles):
+def restricted_incident_filter(query: Select, current_user: MeteorUser, role: UserRoles):
     """Adds additional incident filters to query (usually for permissions)."""
     if role == UserRoles.member:
         # We filter out restricted incidents for users with a member role if the user is not an incident participant
         query = (
             query.join(Participant, Incident.id == Participant.incident_id)
             .join(IndividualContact)
-            .filter(
+            .where(
                 or_(
                     Incident.visibility == Visibility.open,
                     IndividualContact.email == current_user.email,
@@ -560,8 +872,8 @@ def restricted_incident_filter(query: orm.Query, current_user: MeteorUser, role:
     return query.distinct()
 
 
-def restricted_incident_type_filter(query: orm.Query, current_user: MeteorUser):
+def restricted_incident_type_filter(query: Select, current_user: MeteorUser):
     """Adds additional incident type filters to query (usually for permissions)."""
     if current_user:
-        query = query.filter(IncidentType.visibility == Visibility.open)
+        query = query.where(IncidentType.visibility == Visibility.open)
     return query
@@ -35,3 +35,10 @@ class UserRoles(MeteorEnum):
     manager = "Manager"
     admin = "Admin"
     member = "Member"
+
+
+class CountMode(MeteorEnum):
+    exact = "exact"
+    window = "window"
+    estimate = "estimate"
+    none = "none"
@@ -9,6 +9,10 @@ class MeteorPluginException(MeteorException):
     pass
 
 
+class GridFormatError(MeteorException):
+    pass
+
+
 class NotFoundError(PydanticUserError):
     code = "not_found"
     msg_template = "{msg}"
@@ -39,6 +43,11 @@ class InvalidFilterError(PydanticUserError):
     msg_template = "{msg}"
 
 
+class InvalidCursorError(PydanticUserError):
+    code = "invalid.cursor"
+    msg_template = "{msg}"
+
+
 class InvalidUsernameError(PydanticUserError):
     code = "invalid.username"
     msg_template = "{msg}"
@@ -9,6 +9,7 @@ from starlette.routing import compile_path
 
 from .api import api_router
 from .logging import configure_logging
+from .middleware import CompressionMiddleware
 
 # from os import path
 # from uuid import uuid1
@@ -31,6 +32,7 @@ exception_handlers = {404: not_found}
 app = FastAPI(exception_handlers=exception_handlers, openapi_url="")
 app.state.limiter = Limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_middleware(CompressionMiddleware)
 
 
 def get_path_params_from_request(request: Request) -> str:
@@ -0,0 +1,53 @@
+"""
+.. module: meteor.metrics
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Metrics of the server process. Values are kept in memory, to be read from the
+``/metrics`` route, and forwarded to the metric plugins of METEOR_METRIC_PROVIDERS.
+"""
+import logging
+from collections import defaultdict
+from typing import Optional
+
+from meteor.config import METEOR_METRIC_PROVIDERS
+from meteor.plugins.base import plugins
+
+log = logging.getLogger(__name__)
+
+
+def _key(name: str, tags: Optional[dict]) -> tuple:
+    return name, tuple(sorted((tags or {}).items()))
+
+
+class Metrics(object):
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._providers = list(METEOR_METRIC_PROVIDERS)
+
+    def _forward(self, method: str, name: str, value, tags: Optional[dict]):
+        for provider in self._providers:
+            try:
+                getattr(plugins.get(provider), method)(name, value, tags=tags)
+            except Exception as e:
+                log.warning(f"Unable to send metric {name} to {provider}: {e}")
+
+    def counter(self, name: str, value: float = 1, tags: Optional[dict] = None):
+        self._counters[_key(name, tags)] += value
+        self._forward("counter", name, value, tags)
+
+    def gauge(self, name: str, value: float, tags: Optional[dict] = None):
+        self._gauges[_key(name, tags)] = value
+        self._forward("gauge", name, value, tags)
+
+    def snapshot(self) -> dict:
+        """The current values, as lists of name, tags and value."""
+        return {
+            kind: [{"name": name, "tags": dict(tags), "value": value} for (name, tags), value in sorted(values.items())]
+            for kind, values in (("counters", self._counters), ("gauges", self._gauges))
+        }
+
+
+provider = Metrics()
@@ -1,9 +1,26 @@
 import logging
+import zlib
+from typing import Optional
 
+import anyio
 from fastapi import Request, status
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic.error_wrappers import ValidationError
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from meteor import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 log = logging.getLogger(__name__)
 
@@ -29,3 +46,215 @@ class ExceptionMiddleware(BaseHTTPMiddleware):
             )
 
         return response
+
+
+class GzipEncoder:
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = 4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data) -> bytes:
+        return self._compressor.process(bytes(data))
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+ENCODERS = {"gzip": GzipEncoder}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+
+# preferred content codings, binary frames favor zstd, text keeps to what every client speaks
+BINARY_ENCODINGS = ("zstd", "br", "gzip")
+TEXT_ENCODINGS = ("gzip", "br", "zstd")
+
+BINARY_MEDIA_TYPES = {
+    "application/octet-stream",
+    "application/vnd.apache.arrow.stream",
+    "application/x-npy",
+    "application/x-meteor-frames",
+}
+
+# compressing these again only costs time
+COMPRESSED_MEDIA_TYPES = {
+    "application/gzip",
+    "application/zip",
+    "application/zstd",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-xz",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "video/mp4",
+}
+
+# chunks larger than this are compressed in a worker thread to keep the event loop responsive
+THREAD_THRESHOLD = 1 << 20
+
+
+def parse_accept_encoding(header: Optional[str]) -> dict[str, float]:
+    """Returns the quality of each content coding listed in an Accept-Encoding header."""
+    qualities = {}
+    for part in (header or "").split(","):
+        coding, *params = [token.strip() for token in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def select_encoding(qualities: dict[str, float], preferences: tuple[str, ...]) -> Optional[str]:
+    """Picks the available coding of highest quality, ties go to the order of ``preferences``."""
+    wildcard = qualities.get("*", 0.0)
+    candidates = [
+        (qualities.get(coding, wildcard), -rank, coding)
+        for rank, coding in enumerate(preferences)
+        if coding in ENCODERS
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the content coding negotiated from Accept-Encoding, zstd first for
+    binary frames and gzip first for JSON. Bodies are compressed message by message and flushed,
+    so streamed responses are never buffered. Small bodies, already compressed content and partial
+    responses are sent as is.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = config.METEOR_COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        qualities = parse_accept_encoding(headers.get("accept-encoding"))
+        # byte ranges address the identity representation
+        if not qualities or "range" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(send, qualities, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send: Send, qualities: dict[str, float], minimum_size: int):
+        self._send = send
+        self.qualities = qualities
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+
+    def select(self, headers: MutableHeaders, status_code: int, body, more_body: bool) -> Optional[str]:
+        if status_code < 200 or status_code in (204, 206, 304, 416) or "content-encoding" in headers:
+            return None
+
+        media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        if media_type in COMPRESSED_MEDIA_TYPES:
+            return None
+
+        length = headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) < self.minimum_size:
+            return None
+        if not more_body and len(body) < self.minimum_size:
+            return None
+
+        if media_type in BINARY_MEDIA_TYPES:
+            return select_encoding(self.qualities, BINARY_ENCODINGS)
+        return select_encoding(self.qualities, TEXT_ENCODINGS)
+
+    async def start_response(self, body, more_body: bool) -> None:
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers.add_vary_header("Accept-Encoding")
+
+        encoding = self.select(headers, start["status"], body, more_body)
+        if encoding:
+            self.encoder = ENCODERS[encoding]()
+            headers["Content-Encoding"] = encoding
+            for name in ("content-length", "accept-ranges"):
+                if name in headers:
+                    del headers[name]
+            # the encoded bytes differ from the identity representation the tag was computed on
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+
+        start["headers"] = headers.raw
+        await self._send(start)
+
+    def encode(self, body, more_body: bool) -> bytes:
+        data = self.encoder.compress(body) if body else b""
+        return data + (self.encoder.flush() if more_body else self.encoder.finish())
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # held back until the first body message tells whether the body is worth compressing
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            await self.start_response(body, more_body)
+        if self.encoder is None:
+            await self._send(message)
+            return
+
+        if len(body) > THREAD_THRESHOLD:
+            data = await anyio.to_thread.run_sync(self.encode, body, more_body)
+        else:
+            data = self.encode(body, more_body)
+        if data or not more_body:
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -1,17 +1,19 @@
 import re
-from typing import Type
 from datetime import datetime
-from typing import Any
+from typing import Annotated, Any, Optional
 from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from sqlalchemy import Column, DateTime, Integer, event
 from sqlalchemy.dialects.postgresql import UUID
 
-NameStr = Type[re.compile(r"^(?!\s*$).+", flags=re.DOTALL)]
-OrganizationSlug = Type[re.compile(r"^\w+(?:_\w+)*$", flags=re.DOTALL)]
+from meteor.enums import CountMode
+
+NameStr = Annotated[str, StringConstraints(pattern=re.compile(r"^(?!\s*$).+", flags=re.DOTALL))]
+OrganizationSlug = Annotated[str, StringConstraints(pattern=re.compile(r"^\w+(?:_\w+)*$", flags=re.DOTALL))]
+PrimaryKey = Annotated[int, Field(gt=0, lt=2147483647)]
 
 
 def convert_datetime_to_gmt(dt: datetime) -> str:
@@ -45,7 +47,10 @@ class MeteorBase(BaseModel):
 class Pagination(MeteorBase):
     itemsPerPage: int
     page: int
-    total: int
+    # estimated with CountMode.estimate, None with CountMode.none
+    total: Optional[int] = None
+    countMode: CountMode = CountMode.exact
+    nextCursor: Optional[str] = None
 
 
 class UUIDMixin(object):
@@ -0,0 +1,304 @@
+"""
+.. module: meteor.observation.accumulation
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Rolling rainfall accumulations derived from reflectivity, stored as elements of their own.
+
+Rain rates follow the Marshall-Palmer Z-R relationship, and the rate of a reflectivity
+frame applies over the interval since the previous frame. Instead of summing every frame
+of a window on each ingest, the accumulation of a new frame is the accumulation of the
+previous frame, plus the rainfall of the new frame, minus the rainfall of the frames that
+left the window in between. It is rebuilt from the frames of the window when there is no
+previous accumulation to start from, the grid geometry changed, or it starts a delta chain:
+stored deltas are rounded to the scale of the element, and accumulations read back from
+them would otherwise drift further from one ingest to the next. Reflectivity frames
+ingested out of order invalidate the accumulations stored after them, which are computed again.
+
+Stored grids hold physical values, dBZ for reflectivity and mm for accumulations, the
+scale of an element only being the step of its deltas and of its integer transport.
+"""
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from meteor import config
+
+from . import codec, delta
+from .enums import RadarProduct
+from .models import FrameKey, ObservationElement, ObservationValue
+from .service import (
+    create_observation_value,
+    delete_frames,
+    get_chain,
+    get_element_by_exact_name,
+    get_frame,
+    get_frame_at,
+    get_frames,
+    get_open_chain,
+)
+
+log = logging.getLogger(__name__)
+
+# Marshall-Palmer, Z = 200 R^1.6 with Z in mm^6/m^3 and R in mm/h
+ZR_A = 200.0
+ZR_B = 1.6
+
+# weaker echoes are mostly clutter and clear air returns
+MIN_RAIN_DBZ = 10.0
+# stronger echoes are hail, their rate is capped at the rate of this reflectivity
+MAX_RAIN_DBZ = 53.0
+
+# a frame does not stand for more than this after a gap in the reflectivity frames
+MAX_FRAME_INTERVAL = timedelta(minutes=15)
+
+PERIODS = {
+    RadarProduct.precipitation_1h: timedelta(hours=1),
+    RadarProduct.precipitation_3h: timedelta(hours=3),
+    RadarProduct.precipitation_24h: timedelta(hours=24),
+}
+
+# frames are timestamped to the microsecond, the latest frame strictly before t is the latest at or before t - 1us
+EPSILON = timedelta(microseconds=1)
+
+
+def rain_rate(dbz: np.ndarray) -> np.ndarray:
+    """Returns the rain rate in mm/h of reflectivities in dBZ, 0 where there is no echo."""
+    dbz = np.asarray(dbz, dtype=np.float32)
+    with np.errstate(invalid="ignore"):
+        rate = (np.power(10, np.minimum(dbz, MAX_RAIN_DBZ) / 10) / ZR_A) ** (1 / ZR_B)
+        rate[~(dbz >= MIN_RAIN_DBZ)] = 0
+    return rate.astype(np.float32, copy=False)
+
+
+def frame_hours(captured_at: datetime, previous_at: Optional[datetime]) -> float:
+    """Hours of rain a frame stands for, the time since the previous frame up to MAX_FRAME_INTERVAL."""
+    interval = MAX_FRAME_INTERVAL if previous_at is None else min(captured_at - previous_at, MAX_FRAME_INTERVAL)
+    return interval / timedelta(hours=1)
+
+
+class FrameReader:
+    """
+    Decodes whole stored frames. The latest frame read of the last ``chains`` delta chains is kept,
+    so that reading the frames of a chain in order decodes each of them once.
+    """
+
+    def __init__(self, db_session: Session, chains: int = 8):
+        self.db_session = db_session
+        self.chains = chains
+        self._latest = OrderedDict()
+
+    async def _decode(self, frame: FrameKey) -> tuple[codec.GridGeometry, np.ndarray]:
+        value = await self.db_session.scalar(
+            select(ObservationValue.value).where(
+                ObservationValue.id == frame.id, ObservationValue.captured_at == frame.captured_at
+            )
+        )
+        return codec.read_header(value).geometry, codec.decode_grid(value)
+
+    async def read(self, frame: FrameKey) -> tuple[codec.GridGeometry, np.ndarray]:
+        """Returns the geometry and the grid of a frame, reconstructed from its keyframe if it is a delta."""
+        if frame.delta_scale is None:
+            geometry, array = await self._decode(frame)
+        else:
+            key = (frame.observation_element_id, frame.keyframe_at)
+            members = await get_chain(db_session=self.db_session, frame=frame)
+            geometry, array = None, None
+            latest = self._latest.get(key)
+            if latest and latest[0] <= frame.captured_at:
+                at, geometry, array = latest
+                members = [member for member in members if member.captured_at > at]
+
+            for member in members:
+                geometry, decoded = await self._decode(member)
+                array = decoded if member.delta_scale is None else delta.reconstruct(array, decoded, member.delta_scale)
+
+        if frame.keyframe_at is not None:
+            key = (frame.observation_element_id, frame.keyframe_at)
+            self._latest[key] = (frame.captured_at, geometry, array)
+            self._latest.move_to_end(key)
+            while len(self._latest) > self.chains:
+                self._latest.popitem(last=False)
+        return geometry, array
+
+
+async def rainfall(
+    reader: FrameReader,
+    *,
+    element: ObservationElement,
+    geometry: codec.GridGeometry,
+    start: datetime,
+    end: datetime,
+) -> Optional[np.ndarray]:
+    """
+    Returns the rainfall in mm of the reflectivity frames captured in (start, end] on a grid geometry,
+    None when there is none. Frames of another geometry are left out.
+    """
+    frames = await get_frames(db_session=reader.db_session, element_id=element.id, start=start, end=end)
+
+    total, previous_at = None, None
+    if frames:
+        previous = await get_frame(
+            db_session=reader.db_session, element_id=element.id, at=frames[0].captured_at - EPSILON
+        )
+        previous_at = previous.captured_at if previous else None
+
+    for frame in frames:
+        frame_geometry, array = await reader.read(frame)
+        hours = frame_hours(frame.captured_at, previous_at)
+        previous_at = frame.captured_at
+        if frame_geometry != geometry:
+            log.debug(f"Left the frame captured at {frame.captured_at} out of the rainfall of another geometry.")
+            continue
+        amount = rain_rate(array) * hours
+        total = amount if total is None else total + amount
+    return total
+
+
+async def read_accumulation(
+    reader: FrameReader, *, element: ObservationElement, geometry: codec.GridGeometry, captured_at: datetime
+) -> Optional[np.ndarray]:
+    """Returns the stored accumulation of a period at a time in mm, None when missing or of another geometry."""
+    frame = await get_frame_at(db_session=reader.db_session, element_id=element.id, captured_at=captured_at)
+    if not frame:
+        return None
+    frame_geometry, array = await reader.read(frame)
+    if frame_geometry != geometry:
+        return None
+    return array.astype(np.float32)
+
+
+async def accumulate(
+    reader: FrameReader,
+    *,
+    reflectivity: ObservationElement,
+    element: ObservationElement,
+    period: timedelta,
+    frame: FrameKey,
+    geometry: codec.GridGeometry,
+    previous: Optional[FrameKey],
+    added: np.ndarray,
+    base: Optional[np.ndarray],
+) -> np.ndarray:
+    """
+    Returns the accumulation of a period at a reflectivity frame: the accumulation ``base`` at the
+    ``previous`` frame, plus the rainfall ``added`` by the frame, minus the rainfall of the frames
+    that left the window since. Rebuilt from the frames of the window without either. Left unclamped,
+    so that carrying it over to the next frame does not bias it upward.
+    """
+    end = frame.captured_at
+    if previous is not None and base is None:
+        base = await read_accumulation(reader, element=element, geometry=geometry, captured_at=previous.captured_at)
+
+    if previous is None or base is None:
+        total = await rainfall(reader, element=reflectivity, geometry=geometry, start=end - period, end=end)
+    else:
+        total = base + added
+        dropped = await rainfall(
+            reader, element=reflectivity, geometry=geometry, start=previous.captured_at - period, end=end - period
+        )
+        if dropped is not None:
+            total = total - dropped
+    return total
+
+
+async def delete_stale_accumulations(
+    *, db_session: Session, elements: Dict[RadarProduct, ObservationElement], captured_at: List[datetime]
+) -> List[datetime]:
+    """
+    Deletes the accumulations stored after newly stored reflectivity frames whose window they fall in,
+    with the rest of their delta chains, and returns the times to store accumulations at: those of the
+    new frames and of the deleted accumulations.
+    """
+    # the rainfall of the frame following a new one also depends on the time since the new one
+    start, end = min(captured_at), max(captured_at) + MAX_FRAME_INTERVAL
+    times = set(captured_at)
+    for product, element in elements.items():
+        stale = await delete_frames(
+            db_session=db_session, element_id=element.id, start=start, end=end + PERIODS[product]
+        )
+        if stale:
+            log.info(f"Computing {len(stale)} {product.value} accumulations again after frames ingested out of order.")
+            times.update(stale)
+    return sorted(times)
+
+
+async def update_accumulations(
+    *, db_session: Session, organization_id: int, reflectivity: ObservationElement, captured_at: List[datetime]
+) -> int:
+    """
+    Stores the accumulations of every period at newly stored reflectivity frames, in capture order,
+    carrying them over from one frame to the next. Accumulations stored after the new frames whose
+    window they fall in are replaced, other stored ones are kept, and periods without an element are
+    skipped. Returns the number of stored grids.
+    """
+    elements = {}
+    for product in PERIODS:
+        element = await get_element_by_exact_name(db_session=db_session, element_name=product.value)
+        if element:
+            elements[product] = element
+    if not elements:
+        log.debug("No precipitation accumulation element, accumulations are not maintained.")
+        return 0
+
+    captured_at = await delete_stale_accumulations(db_session=db_session, elements=elements, captured_at=captured_at)
+    interval = config.METEOR_OBSERVATION_KEYFRAME_INTERVAL
+    reader = FrameReader(db_session)
+    # accumulations stored by this call, the next frame starts from them instead of reading them back
+    carried: Dict[RadarProduct, tuple[datetime, codec.GridGeometry, np.ndarray]] = {}
+    stored = 0
+    for at in captured_at:
+        frame = await get_frame_at(db_session=db_session, element_id=reflectivity.id, captured_at=at)
+        if not frame:
+            continue
+        previous = await get_frame(db_session=db_session, element_id=reflectivity.id, at=at - EPSILON)
+        geometry, _ = await reader.read(frame)
+        added = await rainfall(
+            reader,
+            element=reflectivity,
+            geometry=geometry,
+            start=previous.captured_at if previous else at - EPSILON,
+            end=at,
+        )
+
+        for product, element in elements.items():
+            if await get_frame_at(db_session=db_session, element_id=element.id, captured_at=at):
+                carried.pop(product, None)
+                continue
+
+            latest, base = carried.get(product), None
+            if previous is not None and latest and latest[:2] == (previous.captured_at, geometry):
+                base = latest[2]
+            # keyframes are rebuilt from the window, so the rounding of the deltas only adds up within a chain
+            keyframe = interval > 1 and not await get_open_chain(
+                db_session=db_session, element_id=element.id, captured_at=at, geometry=geometry, interval=interval
+            )
+            total = await accumulate(
+                reader,
+                reflectivity=reflectivity,
+                element=element,
+                period=PERIODS[product],
+                frame=frame,
+                geometry=geometry,
+                previous=None if keyframe else previous,
+                added=added,
+                base=base,
+            )
+            await create_observation_value(
+                db_session=db_session,
+                element=element,
+                organization_id=organization_id,
+                # rounding of the stored grids would otherwise leave small negative amounts once the rain is over
+                frame=np.maximum(total, 0, dtype=np.float32),
+                geometry=geometry,
+                captured_at=at,
+            )
+            carried[product] = (at, geometry, total)
+            stored += 1
+    return stored
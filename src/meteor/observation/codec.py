@@ -0,0 +1,360 @@
+"""
+.. module: meteor.observation.codec
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Chunked, compressed storage format for radar grids.
+
+A stored grid is laid out as::
+
+    | header | chunk offset table | chunk 0 | chunk 1 | ... | chunk n-1 |
+
+The header describes the array (dtype, shape, chunk shape, codec) and its
+geo-reference, the offset table holds ``n + 1`` little-endian uint64 offsets
+relative to the end of the table, and every chunk is compressed on its own.
+Readers only need the header and the table to know which byte ranges hold
+the chunks overlapping a bounding box.
+"""
+import math
+import struct
+import zlib
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+
+from meteor.exceptions import GridFormatError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b"MTRG"
+VERSION = 1
+
+# magic, version, dtype, codec, flags, rows, cols, chunk rows, chunk cols, north, west, lat step, lon step
+HEADER = struct.Struct("<4sBBBBIIIIdddd")
+HEADER_SIZE = HEADER.size
+
+OFFSET_DTYPE = np.dtype("<u8")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# byte-plane shuffle of each chunk before compression
+FLAG_SHUFFLE = 0x01
+
+DTYPES = {
+    1: np.dtype("<f4"),
+    2: np.dtype("<f2"),
+    3: np.dtype("<i2"),
+    4: np.dtype("<u2"),
+    5: np.dtype("u1"),
+    6: np.dtype("<f8"),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+PYRAMID_MAGIC = b"MTRP"
+PYRAMID_VERSION = 1
+
+# magic, version, level count, followed by level count + 1 uint64 offsets relative to the end of the directory
+PYRAMID_HEADER = struct.Struct("<4sBB")
+
+GridGeometry = namedtuple("GridGeometry", ("north", "west", "lat_step", "lon_step"))
+
+
+class GridHeader(
+    namedtuple(
+        "GridHeader",
+        ("version", "dtype", "codec", "flags", "rows", "cols", "chunk_rows", "chunk_cols", "geometry"),
+    )
+):
+    __slots__ = ()
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    @property
+    def chunk_grid(self):
+        """Number of chunks along each axis."""
+        return (math.ceil(self.rows / self.chunk_rows), math.ceil(self.cols / self.chunk_cols))
+
+    @property
+    def chunk_count(self):
+        chunk_rows, chunk_cols = self.chunk_grid
+        return chunk_rows * chunk_cols
+
+    @property
+    def table_size(self):
+        return (self.chunk_count + 1) * OFFSET_DTYPE.itemsize
+
+    @property
+    def data_offset(self):
+        """Absolute offset of the first chunk."""
+        return HEADER_SIZE + self.table_size
+
+    def window(self, north: float, west: float, south: float, east: float):
+        """Maps a lat/long bounding box to the row and column slices of the grid covering it."""
+        geometry = self.geometry
+        row_start = math.floor((geometry.north - north) / geometry.lat_step)
+        row_stop = math.ceil((geometry.north - south) / geometry.lat_step)
+        col_start = math.floor((west - geometry.west) / geometry.lon_step)
+        col_stop = math.ceil((east - geometry.west) / geometry.lon_step)
+
+        row_start, row_stop = max(row_start, 0), min(row_stop, self.rows)
+        col_start, col_stop = max(col_start, 0), min(col_stop, self.cols)
+
+        return slice(row_start, max(row_start, row_stop)), slice(col_start, max(col_start, col_stop))
+
+    def cell(self, lat: float, long: float) -> Optional[tuple[int, int]]:
+        """Returns the row and column of the cell holding a point, None outside of the grid."""
+        geometry = self.geometry
+        row = math.floor((geometry.north - lat) / geometry.lat_step)
+        col = math.floor((long - geometry.west) / geometry.lon_step)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def chunk_index(self, row: int, col: int) -> int:
+        """Returns the index of the chunk holding a cell."""
+        _, chunk_cols = self.chunk_grid
+        return (row // self.chunk_rows) * chunk_cols + col // self.chunk_cols
+
+    def chunk_bounds(self, index: int):
+        """Returns the row and column slices covered by a chunk."""
+        _, chunk_cols = self.chunk_grid
+        row = (index // chunk_cols) * self.chunk_rows
+        col = (index % chunk_cols) * self.chunk_cols
+        return (
+            slice(row, min(row + self.chunk_rows, self.rows)),
+            slice(col, min(col + self.chunk_cols, self.cols)),
+        )
+
+
+def _compress(data, codec: int, level: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise GridFormatError("The zstandard package is required for the zstd codec.")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return bytes(data)
+
+
+def _decompress(data, codec: int, size: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise GridFormatError("The zstandard package is required for the zstd codec.")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    return data
+
+
+def default_codec() -> int:
+    """Returns the best codec available in this environment."""
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def encode_grid(
+    array: np.ndarray,
+    geometry: GridGeometry,
+    *,
+    chunk_shape=(256, 256),
+    codec: int = None,
+    level: int = 3,
+    shuffle: bool = True,
+) -> bytes:
+    """Encodes a 2D grid into the chunked storage format."""
+    array = np.asarray(array)
+    if array.ndim != 2:
+        raise GridFormatError(f"Only 2D grids can be encoded, got shape {array.shape}.")
+
+    dtype = array.dtype.newbyteorder("<")
+    if dtype not in DTYPE_CODES:
+        raise GridFormatError(f"Unsupported grid dtype: {array.dtype}.")
+    array = array.astype(dtype, copy=False)
+
+    if codec is None:
+        codec = default_codec()
+
+    flags = FLAG_SHUFFLE if shuffle and dtype.itemsize > 1 else 0
+    chunk_rows, chunk_cols = chunk_shape
+    header = GridHeader(VERSION, dtype, codec, flags, *array.shape, chunk_rows, chunk_cols, GridGeometry(*geometry))
+
+    chunks = []
+    offsets = np.zeros(header.chunk_count + 1, dtype=OFFSET_DTYPE)
+    for index in range(header.chunk_count):
+        rows, cols = header.chunk_bounds(index)
+        chunk = np.ascontiguousarray(array[rows, cols])
+        if flags & FLAG_SHUFFLE:
+            chunk = np.ascontiguousarray(chunk.view(np.uint8).reshape(-1, dtype.itemsize).T)
+        data = _compress(chunk.data, codec, level)
+        chunks.append(data)
+        offsets[index + 1] = offsets[index] + len(data)
+
+    return b"".join(
+        [
+            HEADER.pack(
+                MAGIC,
+                header.version,
+                DTYPE_CODES[dtype],
+                codec,
+                flags,
+                header.rows,
+                header.cols,
+                header.chunk_rows,
+                header.chunk_cols,
+                *header.geometry,
+            ),
+            offsets.tobytes(),
+            *chunks,
+        ]
+    )
+
+
+def read_header(buffer) -> GridHeader:
+    """Parses the header at the start of an encoded grid."""
+    if len(buffer) < HEADER_SIZE:
+        raise GridFormatError("Truncated grid header.")
+
+    magic, version, dtype_code, codec, flags, rows, cols, chunk_rows, chunk_cols, *geometry = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise GridFormatError("Not an encoded radar grid.")
+    if version > VERSION:
+        raise GridFormatError(f"Unsupported grid format version: {version}.")
+    if dtype_code not in DTYPES:
+        raise GridFormatError(f"Unknown grid dtype code: {dtype_code}.")
+
+    return GridHeader(
+        version, DTYPES[dtype_code], codec, flags, rows, cols, chunk_rows, chunk_cols, GridGeometry(*geometry)
+    )
+
+
+def read_chunk_table(buffer, header: GridHeader) -> np.ndarray:
+    """Returns the chunk offset table, relative to ``header.data_offset``."""
+    if len(buffer) < header.data_offset:
+        raise GridFormatError("Truncated chunk offset table.")
+    return np.frombuffer(buffer, dtype=OFFSET_DTYPE, count=header.chunk_count + 1, offset=HEADER_SIZE)
+
+
+def window_chunks(header: GridHeader, rows: slice, cols: slice) -> list[int]:
+    """Returns the indices of the chunks overlapping a window, in storage order."""
+    if rows.start >= rows.stop or cols.start >= cols.stop:
+        return []
+
+    _, chunk_cols = header.chunk_grid
+    chunk_row_range = range(rows.start // header.chunk_rows, (rows.stop - 1) // header.chunk_rows + 1)
+    chunk_col_range = range(cols.start // header.chunk_cols, (cols.stop - 1) // header.chunk_cols + 1)
+    return [r * chunk_cols + c for r in chunk_row_range for c in chunk_col_range]
+
+
+def plan_reads(header: GridHeader, table: np.ndarray, chunks: list[int]) -> list[tuple[int, int, list[int]]]:
+    """Groups chunks into absolute (start, stop, chunk indices) byte ranges, merging adjacent chunks."""
+    plan = []
+    for index in chunks:
+        start = header.data_offset + int(table[index])
+        stop = header.data_offset + int(table[index + 1])
+        if plan and plan[-1][1] == start:
+            plan[-1] = (plan[-1][0], stop, plan[-1][2] + [index])
+        else:
+            plan.append((start, stop, [index]))
+    return plan
+
+
+def decode_chunk(header: GridHeader, index: int, data) -> np.ndarray:
+    """Decompresses a single chunk into an array of its own shape."""
+    rows, cols = header.chunk_bounds(index)
+    shape = (rows.stop - rows.start, cols.stop - cols.start)
+    size = shape[0] * shape[1] * header.dtype.itemsize
+
+    raw = _decompress(data, header.codec, size)
+    if len(raw) != size:
+        raise GridFormatError(f"Chunk {index} decoded to {len(raw)} bytes, expected {size}.")
+
+    if header.flags & FLAG_SHUFFLE:
+        planes = np.frombuffer(raw, dtype=np.uint8).reshape(header.dtype.itemsize, -1)
+        return np.ascontiguousarray(planes.T).view(header.dtype).reshape(shape)
+    return np.frombuffer(raw, dtype=header.dtype).reshape(shape)
+
+
+def decode_window(
+    header: GridHeader,
+    table: np.ndarray,
+    rows: slice,
+    cols: slice,
+    plan: list[tuple[int, int, list[int]]],
+    payloads: list[bytes],
+) -> np.ndarray:
+    """Assembles a window of the grid from the byte ranges returned for ``plan``."""
+    out = np.empty((rows.stop - rows.start, cols.stop - cols.start), dtype=header.dtype)
+
+    for (start, _, indices), payload in zip(plan, payloads, strict=True):
+        payload = memoryview(payload)
+        for index in indices:
+            chunk_start = header.data_offset + int(table[index]) - start
+            chunk_stop = header.data_offset + int(table[index + 1]) - start
+            chunk = decode_chunk(header, index, payload[chunk_start:chunk_stop])
+
+            chunk_rows, chunk_cols = header.chunk_bounds(index)
+            r0, r1 = max(rows.start, chunk_rows.start), min(rows.stop, chunk_rows.stop)
+            c0, c1 = max(cols.start, chunk_cols.start), min(cols.stop, chunk_cols.stop)
+            out[r0 - rows.start : r1 - rows.start, c0 - cols.start : c1 - cols.start] = chunk[
+                r0 - chunk_rows.start : r1 - chunk_rows.start, c0 - chunk_cols.start : c1 - chunk_cols.start
+            ]
+
+    return out
+
+
+def decode_grid(buffer, rows: slice = None, cols: slice = None) -> np.ndarray:
+    """Decodes a window (the whole grid by default) from an in-memory encoded grid."""
+    header = read_header(buffer)
+    table = read_chunk_table(buffer, header)
+    rows = rows or slice(0, header.rows)
+    cols = cols or slice(0, header.cols)
+
+    plan = plan_reads(header, table, window_chunks(header, rows, cols))
+    buffer = memoryview(buffer)
+    return decode_window(header, table, rows, cols, plan, [buffer[start:stop] for start, stop, _ in plan])
+
+
+def scale_geometry(geometry: GridGeometry, factor: int) -> GridGeometry:
+    """Returns the geometry of a grid downsampled by ``factor`` along both axes."""
+    return GridGeometry(geometry.north, geometry.west, geometry.lat_step * factor, geometry.lon_step * factor)
+
+
+def encode_pyramid(levels: list[bytes]) -> bytes:
+    """Packs encoded pyramid levels, finest first, behind a directory of their offsets."""
+    offsets = np.zeros(len(levels) + 1, dtype=OFFSET_DTYPE)
+    offsets[1:] = np.cumsum([len(level) for level in levels])
+    return b"".join([PYRAMID_HEADER.pack(PYRAMID_MAGIC, PYRAMID_VERSION, len(levels)), offsets.tobytes(), *levels])
+
+
+def read_pyramid_directory(buffer) -> np.ndarray:
+    """
+    Returns the absolute (start, stop) offsets of each level of an encoded pyramid,
+    as an array of shape (levels, 2).
+    """
+    if len(buffer) < PYRAMID_HEADER.size:
+        raise GridFormatError("Truncated pyramid directory.")
+
+    magic, version, count = PYRAMID_HEADER.unpack_from(buffer)
+    if magic != PYRAMID_MAGIC:
+        raise GridFormatError("Not an encoded grid pyramid.")
+    if version > PYRAMID_VERSION:
+        raise GridFormatError(f"Unsupported pyramid format version: {version}.")
+
+    directory_size = PYRAMID_HEADER.size + (count + 1) * OFFSET_DTYPE.itemsize
+    if len(buffer) < directory_size:
+        raise GridFormatError("Truncated pyramid directory.")
+
+    offsets = np.frombuffer(buffer, dtype=OFFSET_DTYPE, count=count + 1, offset=PYRAMID_HEADER.size)
+    offsets = offsets.astype(np.int64) + directory_size
+    return np.stack([offsets[:-1], offsets[1:]], axis=1)
@@ -0,0 +1,43 @@
+"""
+.. module: meteor.observation.delta
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Delta coding of consecutive frames of an element. In between keyframes, a frame is
+stored as the difference to the previous reconstructed frame, quantized to int16 in
+steps of the element scale. Encoding against the reconstruction rather than the
+original keeps the quantization error at half a step whatever the chain length.
+"""
+from typing import Optional
+
+import numpy as np
+
+DELTA_DTYPE = np.dtype("<i2")
+
+# marks cells without data, the remaining range holds the quantized deltas
+NODATA = np.iinfo(DELTA_DTYPE).min
+LIMIT = np.iinfo(DELTA_DTYPE).max
+
+
+def quantize(frame: np.ndarray, reference: np.ndarray, scale: float) -> Optional[np.ndarray]:
+    """
+    Returns the difference between a frame and its reference in steps of ``scale``,
+    or None when it does not fit the delta range and the frame has to become a keyframe.
+    Cells without data in the reference are taken as zero.
+    """
+    steps = np.rint((frame - np.nan_to_num(reference)) / scale)
+    nodata = np.isnan(steps)
+    if not nodata.all() and np.nanmax(np.abs(steps)) > LIMIT:
+        return None
+
+    steps[nodata] = NODATA
+    return steps.astype(DELTA_DTYPE)
+
+
+def reconstruct(reference: np.ndarray, delta: np.ndarray, scale: float) -> np.ndarray:
+    """Applies a quantized delta to its reference frame."""
+    frame = np.nan_to_num(reference, copy=True).astype(np.float32, copy=False)
+    frame += delta * np.float32(scale)
+    frame[delta == NODATA] = np.nan
+    return frame
@@ -0,0 +1,179 @@
+"""
+.. module: meteor.observation.diskcache
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Local disk tier of encoded frames, in between the fetch path and the database.
+
+Each frame is a file named after its content hash, holding its value and its pyramid
+as stored, behind a small header. Reads of byte ranges of a cached frame are served
+from a memory map instead of the database. Files are written aside and renamed, so
+the server processes of a host share the directory safely, and the least recently
+used ones are removed once the directory outgrows its byte limit. The cache turns
+itself off when its directory cannot be written to, and frames that could not be
+cached are remembered, so that their reads go straight to the database.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from .framecache import evict
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"MTRF"
+VERSION = 1
+
+# magic, version, value length, pyramid length
+HEADER = struct.Struct("<4sBxxxQQ")
+
+SUFFIX = ".frame"
+
+# seconds between two touches of the file of a frame served from its open memory map
+TOUCH_INTERVAL = 60
+
+
+class CachedFrame:
+    """The value and the pyramid of a frame, memory-mapped from its file."""
+
+    def __init__(self, buffer: mmap.mmap):
+        magic, version, value_size, pyramid_size = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a cached frame.")
+        self.touched_at = time.monotonic()
+        self._buffer = buffer
+        self._columns = {
+            "value": (HEADER.size, value_size),
+            "pyramid": (HEADER.size + value_size, pyramid_size),
+        }
+
+    def read_ranges(self, column: str, ranges: List[tuple[int, int]]) -> List[bytes]:
+        """Reads byte ranges of a column, clipped to its end like ``substring`` in SQL."""
+        offset, size = self._columns[column]
+        return [self._buffer[offset + min(start, size) : offset + min(stop, size)] for start, stop in ranges]
+
+
+class DiskCache:
+    """
+    Encoded frames cached in ``directory`` up to ``size`` bytes, 0 disabling the cache.
+    The memory maps of the ``open_frames`` most recently used frames are kept open, and
+    the last ``rejected_frames`` frames that could not be cached are remembered.
+    """
+
+    def __init__(self, directory: str, size: int, open_frames: int = 64, rejected_frames: int = 4096):
+        self.directory = directory
+        self.size = size
+        self.open_frames = open_frames
+        self.rejected_frames = rejected_frames
+        self._frames = OrderedDict()
+        self._rejected = OrderedDict()
+        self._writable = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache has a size and a writable directory, checked once on first use."""
+        if self._writable is None:
+            self._writable = bool(self.size)
+            if self._writable:
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._writable = os.access(self.directory, os.W_OK | os.X_OK)
+                except OSError:
+                    self._writable = False
+                if not self._writable:
+                    log.warning(f"The frame cache directory {self.directory} is not writable, the cache is disabled.")
+        return self._writable
+
+    def fits(self, size: int) -> bool:
+        """Whether a frame whose value and pyramid take ``size`` bytes can be cached."""
+        return HEADER.size + size <= self.size
+
+    def rejected(self, content_hash: str) -> bool:
+        """Whether a frame could not be cached lately."""
+        return content_hash in self._rejected
+
+    def reject(self, content_hash: str) -> None:
+        """Remembers that a frame could not be cached, its reads then bypass the cache."""
+        self._rejected[content_hash] = None
+        self._rejected.move_to_end(content_hash)
+        while len(self._rejected) > self.rejected_frames:
+            self._rejected.popitem(last=False)
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}{SUFFIX}")
+
+    def _open(self, content_hash: str, path: str) -> CachedFrame:
+        with open(path, "rb") as f:
+            frame = CachedFrame(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        self._frames[content_hash] = frame
+        while len(self._frames) > self.open_frames:
+            self._frames.popitem(last=False)
+        return frame
+
+    def get(self, content_hash: str) -> Optional[CachedFrame]:
+        """Returns a cached frame, None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(content_hash)
+        frame = self._frames.get(content_hash)
+        if frame is not None:
+            # eviction goes by modification time, hot frames must not look like the oldest ones
+            if time.monotonic() - frame.touched_at >= TOUCH_INTERVAL:
+                try:
+                    os.utime(path)
+                except OSError:
+                    # evicted by another process, cached again on the next miss
+                    del self._frames[content_hash]
+                    return None
+                frame.touched_at = time.monotonic()
+            self._frames.move_to_end(content_hash)
+            return frame
+
+        try:
+            frame = self._open(content_hash, path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return frame
+
+    def write(self, content_hash: str, value: bytes, pyramid: Optional[bytes]) -> bool:
+        """
+        Writes the file of a frame and evicts the oldest ones over the byte limit, False when
+        it cannot be written. Leaves the open memory maps alone, so it may run in a thread.
+        """
+        pyramid = pyramid or b""
+        if not self.enabled or not self.fits(len(value) + len(pyramid)):
+            return False
+
+        path = self._path(content_hash)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=f"{SUFFIX}.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(HEADER.pack(MAGIC, VERSION, len(value), len(pyramid)))
+                    f.write(value)
+                    f.write(pyramid)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            log.warning(f"Unable to cache frame {path}: {e}")
+            return False
+
+        evict(self.directory, self.size, SUFFIX)
+        return True
+
+    def put(self, content_hash: str, value: bytes, pyramid: Optional[bytes]) -> Optional[CachedFrame]:
+        """Caches the value and the pyramid of a frame, None when it cannot be written."""
+        if not self.write(content_hash, value, pyramid):
+            return None
+        return self.get(content_hash)
@@ -0,0 +1,30 @@
+from meteor.enums import MeteorEnum
+
+
+class RadarProduct(MeteorEnum):
+    reflectivity = "reflectivity"
+    velocity = "velocity"
+    spectrum_width = "spectrum-width"
+    # rainfall accumulated over a rolling window, see meteor.observation.accumulation
+    precipitation_1h = "precipitation-1h"
+    precipitation_3h = "precipitation-3h"
+    precipitation_24h = "precipitation-24h"
+
+
+class AccumulationPeriod(MeteorEnum):
+    one_hour = "1h"
+    three_hours = "3h"
+    one_day = "24h"
+
+
+class ResampleMethod(MeteorEnum):
+    nearest = "nearest"
+    mean = "mean"
+    max = "max"
+
+
+class TransportDtype(MeteorEnum):
+    float32 = "float32"
+    float16 = "float16"
+    uint16 = "uint16"
+    uint8 = "uint8"
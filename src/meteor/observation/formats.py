@@ -0,0 +1,149 @@
+"""
+.. module: meteor.observation.formats
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Response formats of radar fetches and their negotiation.
+
+Besides the raw grid bytes and the framed format of meteor.observation.stream,
+frames can be sent as an Apache Arrow IPC stream, one record batch per frame with
+``captured_at``, ``element``, ``rows``, ``cols`` and ``frame`` columns, or as a
+single ``.npy`` array. Both are built on the decoded array buffers.
+"""
+import io
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+
+import numpy as np
+
+from .grid import Quantization
+from .stream import frame_chunks, to_timestamp
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+OCTET_STREAM = "application/octet-stream"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NPY = "application/x-npy"
+
+# end of stream marker of the Arrow IPC stream format
+ARROW_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def available(media_types: Iterable[str]) -> list[str]:
+    """Filters out the media types whose optional dependency is not installed."""
+    return [media_type for media_type in media_types if media_type != ARROW_STREAM or pyarrow is not None]
+
+
+def _matches(media_range: str, media_type: str) -> bool:
+    kind, _, subtype = media_range.partition("/")
+    return media_range in ("*/*", media_type) or (subtype == "*" and media_type.startswith(f"{kind}/"))
+
+
+def _quality(params: list[str]) -> float:
+    for param in params:
+        key, _, value = param.partition("=")
+        if key.strip() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate(accept: Optional[str], offered: list[str]) -> Optional[str]:
+    """
+    Returns the offered media type preferred by an Accept header, the first offered one when the
+    header is missing, or None when none is acceptable.
+    """
+    if not accept:
+        return offered[0]
+
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [token.strip() for token in part.split(";")]
+        quality = _quality(params)
+        if media_range and quality > 0:
+            ranges.append((quality, media_range.lower()))
+
+    # sorting is stable, ranges of equal quality keep the order of the header
+    for _, media_range in sorted(ranges, key=lambda item: -item[0]):
+        for media_type in offered:
+            if _matches(media_range, media_type):
+                return media_type
+    return None
+
+
+def npy_header(array: np.ndarray) -> bytes:
+    """The ``.npy`` header describing a C-contiguous array."""
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, np.lib.format.header_data_from_array_1_0(array))
+    return buffer.getvalue()
+
+
+def npy_chunks(array: np.ndarray) -> tuple[bytes, memoryview]:
+    """Returns the ``.npy`` header and a zero-copy view of the payload of an array."""
+    array = np.ascontiguousarray(array)
+    return npy_header(array), memoryview(array).cast("B")
+
+
+def arrow_schema(dtype: np.dtype, metadata: dict = None) -> "pyarrow.Schema":
+    """Schema of the record batches of frames of a given dtype."""
+    return pyarrow.schema(
+        [
+            ("captured_at", pyarrow.timestamp("ms", tz="UTC")),
+            ("element", pyarrow.string()),
+            ("rows", pyarrow.uint32()),
+            ("cols", pyarrow.uint32()),
+            ("frame", pyarrow.list_(pyarrow.from_numpy_dtype(dtype))),
+        ],
+        metadata=metadata,
+    )
+
+
+def arrow_batch(schema: "pyarrow.Schema", captured_at: datetime, element: str, frame: np.ndarray):
+    """A single row record batch holding a frame, whose values wrap the array buffer."""
+    frame = np.ascontiguousarray(frame)
+    rows, cols = frame.shape
+    values = pyarrow.ListArray.from_arrays(
+        pyarrow.array(np.array([0, frame.size], dtype=np.int32)), pyarrow.array(frame.reshape(-1))
+    )
+    return pyarrow.RecordBatch.from_arrays(
+        [
+            pyarrow.array(np.array([to_timestamp(captured_at)], dtype=np.int64), schema.field("captured_at").type),
+            pyarrow.array([element], pyarrow.string()),
+            pyarrow.array(np.array([rows], dtype=np.uint32)),
+            pyarrow.array(np.array([cols], dtype=np.uint32)),
+            values,
+        ],
+        schema=schema,
+    )
+
+
+async def arrow_stream(
+    frames: AsyncIterator[tuple[datetime, np.ndarray]], element: str, quantization: Quantization
+) -> AsyncIterator[bytes]:
+    """
+    Encodes frames as an Arrow IPC stream, sending each record batch as soon as its frame is decoded.
+    The quantization of the frames is kept in the ``scale``, ``offset`` and ``nodata`` schema metadata.
+    """
+    metadata = {key: str(value) for key, value in quantization._asdict().items() if key != "dtype"}
+    schema = arrow_schema(quantization.dtype, metadata)
+    yield schema.serialize().to_pybytes()
+
+    async for captured_at, frame in frames:
+        yield memoryview(arrow_batch(schema, captured_at, element, frame).serialize())
+    yield ARROW_END_OF_STREAM
+
+
+async def framed_stream(
+    frames: AsyncIterator[tuple[datetime, np.ndarray]], quantization: Quantization
+) -> AsyncIterator[bytes]:
+    """Encodes frames in the framed format of meteor.observation.stream."""
+    async for captured_at, frame in frames:
+        for chunk in frame_chunks(captured_at, frame, quantization.scale, quantization.offset):
+            yield chunk
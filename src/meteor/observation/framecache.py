@@ -0,0 +1,137 @@
+"""
+.. module: meteor.observation.framecache
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Decoded frames shared by the server processes of a host.
+
+Decoded frames are kept as ``.npy`` files in a shared memory file system, one
+directory per organization. Every process memory-maps them read-only on a hit, so
+a frame decoded by one worker is served by all of them from the same pages without
+being copied, whatever the window of it they are asked for. The modification time
+of a file is its last use: hits touch it, and the least recently used files of an
+organization are removed when its directory outgrows its byte budget. Processes
+still mapping a removed file keep reading it.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Iterable, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def _entries(directory: str, suffix: str):
+    """Yields the (last use, size, path) of the files of a directory."""
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(suffix):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        yield stat.st_mtime, stat.st_size, entry.path
+
+
+def evict(directory: str, budget: int, suffix: str = ".npy") -> None:
+    """
+    Removes the least recently used files of a directory until they fit a byte budget,
+    their modification time being their last use. Processes evicting the same directory
+    at the same time leave it to the first one.
+    """
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+
+        entries = list(_entries(directory, suffix))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, entry_path in sorted(entries):
+            if size <= budget:
+                break
+            try:
+                os.unlink(entry_path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
+class FrameCache:
+    """
+    Least recently used grids, keyed by tuples whose first item is the organization.
+    ``budgets`` overrides the byte ``budget`` of some organizations, a budget of 0 disables the cache.
+    """
+
+    def __init__(self, directory: str, budget: int, budgets: Optional[dict[str, int]] = None):
+        self.directory = directory
+        self.budget = budget
+        self.budgets = budgets or {}
+
+    def budget_of(self, organization: str) -> int:
+        return self.budgets.get(organization, self.budget)
+
+    def _path(self, key: tuple) -> tuple[str, str]:
+        directory = os.path.join(self.directory, key[0])
+        return directory, os.path.join(directory, f"{hashlib.sha1(repr(key).encode()).hexdigest()}.npy")
+
+    def locate(self, key: tuple) -> Optional[str]:
+        """Returns the path of a cached grid for other processes to map, None on a miss."""
+        if not self.budget_of(key[0]):
+            return None
+
+        _, path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        """Returns a read-only view of a cached grid, None on a miss."""
+        path = self.locate(key)
+        if path is None:
+            return None
+
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: tuple, array: np.ndarray) -> None:
+        """Caches a grid, then evicts the least recently used grids of its organization over budget."""
+        budget = self.budget_of(key[0])
+        if array.nbytes > budget:
+            return
+
+        directory, path = self._path(key)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # written aside and renamed, so that other processes never map a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            log.warning(f"Unable to cache frame {path}: {e}")
+            return
+
+        evict(directory, budget)
+
+
+def parse_budgets(budgets: Iterable[str]) -> dict[str, int]:
+    """Parses ``organization=bytes`` pairs."""
+    parsed = {}
+    for budget in budgets:
+        organization, _, size = budget.partition("=")
+        parsed[organization.strip()] = int(size)
+    return parsed
@@ -0,0 +1,159 @@
+"""
+.. module: meteor.observation.grid
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Bounding box subsetting, resampling and quantization of radar grids.
+
+Everything here works on whole arrays: the bounding box is mapped to grid
+indices once, cropping is plain slicing and resampling is done with fancy
+indexing or ``reduceat`` over precomputed bin edges.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .enums import RadarProduct, ResampleMethod, TransportDtype
+
+# how each product is reduced when building its pyramid, mean for anything not listed
+PYRAMID_METHODS = {
+    RadarProduct.reflectivity: ResampleMethod.max,
+    RadarProduct.velocity: ResampleMethod.mean,
+}
+
+# how a grid is sent, the physical value of a cell is value * scale + offset
+Quantization = namedtuple("Quantization", ("dtype", "scale", "offset", "nodata"))
+
+
+def crop(array: np.ndarray, rows: slice, cols: slice) -> np.ndarray:
+    """Returns a view of the window, without copying."""
+    return array[rows, cols]
+
+
+def _nearest_indices(size: int, resolution: int) -> np.ndarray:
+    """Index of the source cell under the center of each output cell."""
+    return ((np.arange(resolution) + 0.5) * (size / resolution)).astype(np.intp)
+
+
+def _bin_edges(size: int, resolution: int) -> np.ndarray:
+    """Start index of the source cells aggregated into each output cell."""
+    return (np.arange(resolution) * (size / resolution)).astype(np.intp)
+
+
+def _reduce_blocks(ufunc: np.ufunc, array: np.ndarray, row_edges: np.ndarray, col_edges: np.ndarray) -> np.ndarray:
+    return ufunc.reduceat(ufunc.reduceat(array, row_edges, axis=0), col_edges, axis=1)
+
+
+def resample(
+    array: np.ndarray, resolution: int, method: ResampleMethod = ResampleMethod.nearest, dtype=np.float32
+) -> np.ndarray:
+    """
+    Resamples a window to ``resolution`` x ``resolution`` cells.
+
+    Missing data is expected as NaN and is ignored by the aggregating methods,
+    an output cell without any valid source cell is NaN. The result is always
+    a new C-contiguous array, ready to be sent as is.
+    """
+    rows, cols = array.shape
+    if rows == 0 or cols == 0:
+        return np.full((resolution, resolution), np.nan, dtype=dtype)
+
+    if method == ResampleMethod.nearest or (rows, cols) == (resolution, resolution):
+        out = array[_nearest_indices(rows, resolution)[:, None], _nearest_indices(cols, resolution)]
+        return np.ascontiguousarray(out, dtype=dtype)
+
+    row_edges, col_edges = _bin_edges(rows, resolution), _bin_edges(cols, resolution)
+
+    if method == ResampleMethod.max:
+        # fmax skips NaN unless the whole block is NaN
+        out = _reduce_blocks(np.fmax, array, row_edges, col_edges)
+        return np.ascontiguousarray(out, dtype=dtype)
+
+    if method == ResampleMethod.mean:
+        valid = ~np.isnan(array)
+        sums = _reduce_blocks(np.add, np.where(valid, array, 0).astype(np.float64, copy=False), row_edges, col_edges)
+        counts = _reduce_blocks(np.add, valid.astype(np.uint32), row_edges, col_edges)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = sums / counts
+        return np.ascontiguousarray(out, dtype=dtype)
+
+    raise ValueError(f"Unsupported resampling method: {method}")
+
+
+def pyramid_method(element_name: str) -> ResampleMethod:
+    """Returns the reduction used to build the pyramid of an element."""
+    try:
+        return PYRAMID_METHODS.get(RadarProduct(element_name), ResampleMethod.mean)
+    except ValueError:
+        return ResampleMethod.mean
+
+
+def downsample(array: np.ndarray, method: ResampleMethod) -> np.ndarray:
+    """Halves both dimensions of a grid by reducing each 2x2 block, odd edges are padded with NaN."""
+    array = array.astype(np.float32, copy=False)
+    rows, cols = array.shape
+    if rows % 2 or cols % 2:
+        array = np.pad(array, ((0, rows % 2), (0, cols % 2)), constant_values=np.nan)
+
+    blocks = (array[0::2, 0::2], array[0::2, 1::2], array[1::2, 0::2], array[1::2, 1::2])
+
+    if method == ResampleMethod.max:
+        return np.fmax(np.fmax(blocks[0], blocks[1]), np.fmax(blocks[2], blocks[3]))
+
+    if method == ResampleMethod.mean:
+        sums = np.zeros(blocks[0].shape, dtype=np.float32)
+        counts = np.zeros(blocks[0].shape, dtype=np.uint8)
+        for block in blocks:
+            valid = ~np.isnan(block)
+            sums += np.where(valid, block, 0)
+            counts += valid
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    raise ValueError(f"Unsupported pyramid method: {method}")
+
+
+def build_pyramid(array: np.ndarray, method: ResampleMethod, min_size: int = 128) -> list[np.ndarray]:
+    """
+    Builds the 2x downsampled levels of a grid, finest first, stopping before
+    a level would be smaller than ``min_size`` along either axis.
+    """
+    levels = []
+    while min(array.shape) // 2 >= min_size:
+        array = downsample(array, method)
+        levels.append(array)
+    return levels
+
+
+def pyramid_level(cells: int, resolution: int) -> int:
+    """
+    Returns the coarsest pyramid level (0 being the base grid) that still has
+    at least ``resolution`` cells across a window of ``cells`` base cells.
+    """
+    return max((cells // resolution).bit_length() - 1, 0)
+
+
+def quantization(dtype: TransportDtype, scale: float = None, offset: float = None) -> Quantization:
+    """
+    Returns how grids are sent as ``dtype``. Integer types are scaled by the scale and offset
+    of the element and reserve their largest value for cells without data, floats are sent as is.
+    """
+    dtype = np.dtype(dtype.value)
+    if dtype.kind == "f":
+        return Quantization(dtype, 1.0, 0.0, np.nan)
+    return Quantization(dtype, float(scale or 1), float(offset or 0), np.iinfo(dtype).max)
+
+
+def quantize(array: np.ndarray, quantization: Quantization) -> np.ndarray:
+    """Converts a resampled grid to its transport type, clipping values to the representable range."""
+    if quantization.dtype.kind == "f":
+        return array.astype(quantization.dtype, copy=False)
+
+    steps = array - np.float32(quantization.offset)
+    steps /= np.float32(quantization.scale)
+    np.rint(steps, out=steps)
+    nodata = np.isnan(steps)
+    np.clip(steps, 0, quantization.nodata - 1, out=steps)
+    steps[nodata] = quantization.nodata
+    return steps.astype(quantization.dtype)
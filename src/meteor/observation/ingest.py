@@ -0,0 +1,192 @@
+"""
+.. module: meteor.observation.ingest
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Bulk ingest of radar frames. Frames are encoded by a pool of worker processes and
+written in a single binary ``COPY`` stream, bypassing the ORM.
+"""
+import asyncio
+import logging
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from meteor import config
+from meteor.database.core import refetch_db_session
+from meteor.database.manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+from meteor.database.partition import create_partition_statement, month_start
+
+from . import codec, grid
+from .accumulation import update_accumulations
+from .enums import RadarProduct, ResampleMethod
+from .reprojection import LutCache, Projection
+from .service import FRAME_CHANNEL, EncodedFrame, encode_chain, frame_notification, get_element_by_exact_name
+
+log = logging.getLogger(__name__)
+
+# a frame is either an array or the path to a ``.npy`` file, loaded by the worker that encodes it.
+# Frames with a projection are polar sweeps, reprojected onto the grid of the projection
+IngestFrame = namedtuple("IngestFrame", ("captured_at", "frame", "geometry", "projection"), defaults=(None,))
+
+# per process, workers share the tables through the files of the cache directory
+lut_cache = LutCache(
+    config.METEOR_OBSERVATION_REPROJECTION_CACHE_DIR, config.METEOR_OBSERVATION_REPROJECTION_CACHE_SIZE
+)
+
+COPY_COLUMNS = (
+    "observation_element_id",
+    "captured_at",
+    "keyframe_at",
+    "delta_scale",
+    "value",
+    "pyramid",
+    "content_hash",
+    "organization_id",
+    "created_at",
+    "updated_at",
+)
+
+
+def load_frame(frame: Union[np.ndarray, str], projection: Optional[Projection] = None) -> np.ndarray:
+    """Returns the grid of a frame, reading it from disk and reprojecting it if needed."""
+    if not isinstance(frame, np.ndarray):
+        frame = np.load(frame, allow_pickle=False)
+    if projection:
+        frame = lut_cache.reproject(frame, projection)
+    return frame
+
+
+def split_chains(frames: Sequence[IngestFrame], interval: int) -> List[List[IngestFrame]]:
+    """
+    Splits time ordered frames into the delta chains they will be stored as, of at most ``interval``
+    frames sharing the same geometry and capture month. Every frame is a chain of its own when delta
+    coding is disabled.
+    """
+    chains = []
+    for frame in frames:
+        chain = chains[-1] if chains else None
+        if (
+            chain
+            and len(chain) < interval
+            and chain[0].geometry == frame.geometry
+            and month_start(chain[0].captured_at) == month_start(frame.captured_at)
+        ):
+            chain.append(frame)
+        else:
+            chains.append([frame])
+    return chains
+
+
+def _encode(chain: List[IngestFrame], method: ResampleMethod, scale: float, interval: int) -> List[EncodedFrame]:
+    # runs in a worker process, a chain is encoded serially as each delta depends on the previous frame
+    return list(
+        encode_chain(
+            ((frame.captured_at, load_frame(frame.frame, frame.projection)) for frame in chain),
+            codec.GridGeometry(*chain[0].geometry),
+            method,
+            scale=scale,
+            interval=interval,
+        )
+    )
+
+
+async def encode_frames(
+    frames: Sequence[IngestFrame], *, method: ResampleMethod, scale: float, interval: int, workers: int = None
+) -> AsyncIterator[EncodedFrame]:
+    """
+    Encodes frames in parallel, one delta chain per task, and yields them in their original order.
+    At most two chains per worker are in flight, so memory stays bounded however many frames are ingested.
+    """
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = 2 * workers
+        pending = deque()
+        for chain in split_chains(frames, interval):
+            pending.append(loop.run_in_executor(pool, _encode, chain, method, scale, interval))
+            if len(pending) >= window:
+                for encoded in await pending.popleft():
+                    yield encoded
+        while pending:
+            for encoded in await pending.popleft():
+                yield encoded
+
+
+async def ingest_frames(
+    connection,
+    *,
+    schema: str,
+    element_id: int,
+    element_name: str,
+    organization_id: int,
+    frames: Sequence[IngestFrame],
+    scale: float = 1,
+    workers: int = None,
+) -> int:
+    """
+    Encodes and stores frames of one element with ``COPY ... FROM STDIN (FORMAT binary)``.
+
+    ``connection`` is a raw asyncpg connection, see ``meteor.database.core.create_raw_connection``.
+    Frames have to be in capture order, they are delta coded in steps of ``scale`` when
+    ``METEOR_OBSERVATION_KEYFRAME_INTERVAL`` is set. Everything is written in one transaction;
+    returns the number of stored frames.
+    """
+    if not frames:
+        return 0
+
+    method = grid.pyramid_method(element_name)
+    interval = config.METEOR_OBSERVATION_KEYFRAME_INTERVAL
+    now = datetime.utcnow()
+
+    async def records():
+        async for encoded in encode_frames(frames, method=method, scale=scale, interval=interval, workers=workers):
+            yield (element_id, *encoded, organization_id, now, now)
+
+    async with connection.transaction():
+        # rows are routed to the monthly partitions, which have to exist before the stream starts
+        for month in sorted({month_start(frame.captured_at) for frame in frames}):
+            await connection.execute(create_partition_statement(schema=schema, table="observation_value", month=month))
+
+        status = await connection.copy_records_to_table(
+            "observation_value",
+            schema_name=schema,
+            columns=COPY_COLUMNS,
+            records=records(),
+        )
+        # subscribers want the live picture, a backfill only announces its latest frame
+        latest = max(frame.captured_at for frame in frames)
+        await connection.execute(
+            "SELECT pg_notify($1, $2)", FRAME_CHANNEL, frame_notification(schema, element_id, latest)
+        )
+
+    log.info(f"Ingested {len(frames)} frames of {element_name} into {schema} ({status}).")
+
+    if element_name == RadarProduct.reflectivity.value:
+        await ingest_accumulations(
+            schema=schema, organization_id=organization_id, captured_at=[frame.captured_at for frame in frames]
+        )
+    return len(frames)
+
+
+async def ingest_accumulations(*, schema: str, organization_id: int, captured_at: List[datetime]) -> int:
+    """Brings the precipitation accumulations up to date with newly ingested reflectivity frames."""
+    db_session = refetch_db_session(schema.removeprefix(f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_"))
+    try:
+        reflectivity = await get_element_by_exact_name(
+            db_session=db_session, element_name=RadarProduct.reflectivity.value
+        )
+        count = await update_accumulations(
+            db_session=db_session, organization_id=organization_id, reflectivity=reflectivity, captured_at=captured_at
+        )
+    finally:
+        await db_session.close()
+
+    if count:
+        log.info(f"Stored {count} precipitation accumulations into {schema}.")
+    return count
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, String, LargeBinary, Integer, Float
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import Field, field_validator, model_validator
+from sqlalchemy import Column, DateTime, Index, String, LargeBinary, Integer, Float
 from sqlalchemy.sql.schema import ForeignKey
 
 from meteor.database.core import Base
 from meteor.models import IncrementalMixin, MeteorBase, TimeStampMixin
 from meteor.organization.models import Organization
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
+
+from .enums import RadarProduct, ResampleMethod, TransportDtype
+
 
 class ObservationElement(Base, IncrementalMixin):
     __table_args__ = {"schema": "meteor_core"}
@@ -13,17 +21,120 @@ class ObservationElement(Base, IncrementalMixin):
     abbreviation = Column(String, nullable=True)
     description = Column(String, nullable=True)
     unit = Column(String, nullable=False)
+    # physical value = stored value * scale + offset, used to quantize fetched grids
     scale = Column(Float, default=1)
+    offset = Column(Float, default=0)
 
 
 class ObservationValue(Base, IncrementalMixin, TimeStampMixin):
+    # range partitioned by month, see meteor.database.partition
+    __table_args__ = (
+        Index(
+            "observation_value_captured_at_idx",
+            "captured_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
+        {"postgresql_partition_by": "RANGE (captured_at)"},
+    )
+
     observation_element_id = Column(Integer, ForeignKey(ObservationElement.id))
-    value = Column(LargeBinary, nullable=False)
+    captured_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    # encoded with meteor.observation.codec, deferred so that listing frames never pulls the blobs
+    value = deferred(Column(LargeBinary, nullable=False))
+    # 2x downsampled levels of value, see meteor.observation.codec.encode_pyramid
+    pyramid = deferred(Column(LargeBinary, nullable=True))
+    # capture time of the keyframe of the delta chain, see meteor.observation.delta. Keyframes point
+    # to themselves and frames stored outside of any chain leave it empty
+    keyframe_at = Column(DateTime, nullable=True)
+    # quantization step of delta frames, empty for keyframes
+    delta_scale = Column(Float, nullable=True)
+    # MD5 of value and pyramid, see meteor.observation.service.content_hash
+    content_hash = Column(String(32), nullable=True)
     organization_id = Column(Integer, ForeignKey(Organization.id), primary_key=True)
     organization = relationship(Organization, backref="ObservationValue")
 
 
+# enough to address a frame, let Postgres prune the other partitions and find its delta chain
+FrameKey = namedtuple(
+    "FrameKey", ("id", "captured_at", "observation_element_id", "keyframe_at", "delta_scale", "content_hash")
+)
+
+
 class ObservationRead(MeteorBase):
     name: str
     unit: str
-    value: str
\ No newline at end of file
+    value: str
+
+
+class Coordinate(MeteorBase):
+    lat: float = Field(..., ge=-90, le=90)
+    long: float = Field(..., ge=-180, le=180)
+
+
+class AreaRequest(MeteorBase):
+    upperLeftCoordinate: Coordinate
+    lowerRightCoordinate: Coordinate
+    resolution: int = Field(256, gt=0, le=4096)
+    method: ResampleMethod = ResampleMethod.nearest
+    dtype: TransportDtype = TransportDtype.float32
+
+    @model_validator(mode="after")
+    def check_bounding_box(self):
+        if self.upperLeftCoordinate.lat <= self.lowerRightCoordinate.lat:
+            raise ValueError("upperLeftCoordinate must be north of lowerRightCoordinate")
+        if self.upperLeftCoordinate.long >= self.lowerRightCoordinate.long:
+            raise ValueError("upperLeftCoordinate must be west of lowerRightCoordinate")
+        return self
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """The bounding box as (north, west, south, east)."""
+        return (
+            self.upperLeftCoordinate.lat,
+            self.upperLeftCoordinate.long,
+            self.lowerRightCoordinate.lat,
+            self.lowerRightCoordinate.long,
+        )
+
+
+class FetchRequest(AreaRequest):
+    startDate: datetime
+    endDate: Optional[datetime] = None
+
+    @field_validator("startDate", "endDate")
+    def as_naive_utc(cls, v):
+        # frames are timestamped in naive UTC
+        if v and v.tzinfo:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.endDate and self.endDate < self.startDate:
+            raise ValueError("endDate must not be before startDate")
+        return self
+
+
+class SubscriptionRequest(AreaRequest):
+    product: RadarProduct
+
+
+class PointSeriesRequest(MeteorBase):
+    product: RadarProduct
+    coordinate: Coordinate
+    startDate: datetime
+    endDate: datetime
+
+    @field_validator("startDate", "endDate")
+    def as_naive_utc(cls, v):
+        # frames are timestamped in naive UTC
+        if v.tzinfo:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.endDate < self.startDate:
+            raise ValueError("endDate must not be before startDate")
+        return self
@@ -0,0 +1,143 @@
+"""
+.. module: meteor.observation.push
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Push of newly stored frames to WebSocket subscribers.
+
+Each server process listens on FRAME_CHANNEL through a single dedicated
+connection. Idle subscriptions only hold their socket: when a frame of their
+element is stored, it is decoded once per distinct area of interest and sent,
+in the framed format of meteor.observation.stream, to every subscriber of
+that area.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from starlette.websockets import WebSocket
+
+from meteor.database.core import create_raw_connection, refetch_db_session
+from meteor.database.manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+
+from . import stream
+from .grid import Quantization
+from .models import SubscriptionRequest
+from .service import FRAME_CHANNEL, fetch_grid, get_frame_at
+
+log = logging.getLogger(__name__)
+
+# a subscriber that does not take a frame within this many seconds is dropped
+SEND_TIMEOUT = 10
+
+
+class Subscription:
+    """A socket waiting for the frames of an element, cropped and quantized to its area."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        schema: str,
+        element_id: int,
+        request: SubscriptionRequest,
+        quantization: Quantization,
+    ):
+        self.websocket = websocket
+        self.schema = schema
+        self.element_id = element_id
+        self.request = request
+        self.quantization = quantization
+
+    @property
+    def area(self) -> tuple:
+        """Subscribers of the same area and dtype get the same bytes, the quantization follows the element."""
+        return (self.request.bounds, self.request.resolution, self.request.method, self.request.dtype)
+
+
+class FrameHub:
+    """Fans the notifications of stored frames out to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    async def _listen(self):
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                return
+            self._connection = await create_raw_connection()
+            self._connection.add_termination_listener(self._on_termination)
+            await self._connection.add_listener(FRAME_CHANNEL, self._on_notification)
+            log.info(f"Listening for stored frames on {FRAME_CHANNEL}.")
+
+    def _on_termination(self, connection):
+        log.warning("Lost the connection listening for stored frames, reconnecting.")
+        self._connection = None
+        if self._subscriptions:
+            self._spawn(self._listen())
+
+    def _spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            notification = json.loads(payload)
+            key = (notification["schema"], notification["element_id"])
+            captured_at = datetime.fromisoformat(notification["captured_at"])
+        except (ValueError, KeyError):
+            log.warning(f"Ignored malformed frame notification: {payload}")
+            return
+
+        subscriptions = self._subscriptions.get(key)
+        if subscriptions:
+            self._spawn(self._dispatch(*key, captured_at, list(subscriptions)))
+
+    async def subscribe(self, subscription: Subscription):
+        self._subscriptions[(subscription.schema, subscription.element_id)].add(subscription)
+        await self._listen()
+
+    def unsubscribe(self, subscription: Subscription):
+        key = (subscription.schema, subscription.element_id)
+        self._subscriptions[key].discard(subscription)
+        if not self._subscriptions[key]:
+            del self._subscriptions[key]
+
+    async def _send(self, subscription: Subscription, message: bytes):
+        try:
+            await asyncio.wait_for(subscription.websocket.send_bytes(message), SEND_TIMEOUT)
+        except Exception as e:
+            log.debug(f"Dropped a subscriber of {subscription.schema}: {e!r}")
+            self.unsubscribe(subscription)
+
+    async def _dispatch(self, schema: str, element_id: int, captured_at: datetime, subscriptions: list):
+        areas = defaultdict(list)
+        for subscription in subscriptions:
+            areas[subscription.area].append(subscription)
+
+        db_session = refetch_db_session(schema.removeprefix(f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_"))
+        try:
+            frame = await get_frame_at(db_session=db_session, element_id=element_id, captured_at=captured_at)
+            if not frame:
+                return
+
+            for group in areas.values():
+                request, quantization = group[0].request, group[0].quantization
+                data = await fetch_grid(db_session=db_session, frame=frame, fetch_in=request, quantization=quantization)
+                message = b"".join(
+                    stream.frame_chunks(frame.captured_at, data, quantization.scale, quantization.offset)
+                )
+                await asyncio.gather(*(self._send(subscription, message) for subscription in group))
+        except Exception as e:
+            log.exception(f"Unable to push the frame of {schema} captured at {captured_at}: {e}")
+        finally:
+            await db_session.close()
+
+
+hub = FrameHub()
@@ -0,0 +1,146 @@
+"""
+.. module: meteor.observation.reprojection
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Reprojection of polar radar sweeps onto lat/long grids.
+
+The geometry of a sweep only depends on the radar site, the elevation and the
+gates, so the polar bin under every grid cell is computed once into a lookup
+table of flat indices. Reprojecting a sweep is then a single gather. Tables are
+kept in memory and on disk as ``.npy`` files that are memory-mapped on load, so
+they are shared between processes through the page cache.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+import numpy as np
+
+from .codec import GridGeometry
+
+log = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6371008.8
+
+# standard atmospheric refraction bends the beam as if the earth was 4/3 larger
+EFFECTIVE_EARTH_RADIUS = EARTH_RADIUS * 4 / 3
+
+# bumped whenever build_lut changes, to invalidate the tables cached on disk
+LUT_VERSION = 1
+
+RadarSite = namedtuple("RadarSite", ("latitude", "longitude"))
+
+# azimuths are evenly spaced clockwise from north, distances are in meters
+SweepGeometry = namedtuple("SweepGeometry", ("elevation", "azimuths", "gates", "first_gate", "gate_length"))
+
+# a sweep of a site reprojected onto a grid of ``shape`` cells
+Projection = namedtuple("Projection", ("site", "sweep", "geometry", "shape"))
+
+
+def build_lut(projection: Projection) -> np.ndarray:
+    """
+    Computes the flat index of the polar bin under the center of every grid cell.
+    Cells out of reach of the radar point one past the last bin.
+    """
+    site, sweep, geometry = projection.site, projection.sweep, GridGeometry(*projection.geometry)
+    rows, cols = projection.shape
+
+    lat = np.radians(geometry.north - (np.arange(rows) + 0.5) * geometry.lat_step)[:, None]
+    delta_lon = np.radians(geometry.west + (np.arange(cols) + 0.5) * geometry.lon_step - site.longitude)[None, :]
+    site_lat = np.radians(site.latitude)
+
+    # great circle distance and initial bearing from the site
+    cos_lat, sin_lat = np.cos(lat), np.sin(lat)
+    a = np.sin((lat - site_lat) / 2) ** 2 + np.cos(site_lat) * cos_lat * np.sin(delta_lon / 2) ** 2
+    distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    bearing = np.degrees(
+        np.arctan2(
+            np.sin(delta_lon) * cos_lat,
+            np.cos(site_lat) * sin_lat - np.sin(site_lat) * cos_lat * np.cos(delta_lon),
+        )
+    )
+
+    # slant range of the beam above that ground distance
+    angle = distance / EFFECTIVE_EARTH_RADIUS
+    elevation = np.radians(sweep.elevation)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slant_range = EFFECTIVE_EARTH_RADIUS * np.sin(angle) / np.cos(elevation + angle)
+
+    gate = np.floor((slant_range - sweep.first_gate) / sweep.gate_length)
+    azimuth = np.floor(np.mod(bearing, 360) / (360 / sweep.azimuths)).astype(np.int64) % sweep.azimuths
+
+    outside = ~((gate >= 0) & (gate < sweep.gates))
+    lut = azimuth * sweep.gates + np.where(outside, 0, gate).astype(np.int64)
+    lut[outside] = sweep.azimuths * sweep.gates
+    return lut.astype(np.int32)
+
+
+def apply_lut(sweep: np.ndarray, lut: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """Reprojects an (azimuths, gates) sweep, cells out of reach of the radar are NaN."""
+    bins = np.empty(sweep.size + 1, dtype=dtype)
+    bins[:-1] = sweep.reshape(-1)
+    bins[-1] = np.nan
+    return bins[lut]
+
+
+def lut_key(projection: Projection) -> str:
+    """A stable name for the table of a projection."""
+    return hashlib.sha1(repr((LUT_VERSION, *projection)).encode()).hexdigest()
+
+
+class LutCache:
+    """
+    Least recently used lookup tables, backed by ``.npy`` files in ``directory`` when given.
+    """
+
+    def __init__(self, directory: Optional[str] = None, size: int = 32):
+        self.directory = directory
+        self.size = size
+        self._tables = OrderedDict()
+
+    def _load(self, path: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, path: str, lut: np.ndarray) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # written aside and renamed, so that concurrent workers never map a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, lut)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning(f"Unable to cache reprojection table {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def get(self, projection: Projection) -> np.ndarray:
+        """Returns the lookup table of a projection, building it on first use."""
+        key = lut_key(projection)
+        lut = self._tables.pop(key, None)
+
+        if lut is None and self.directory:
+            path = os.path.join(self.directory, f"{key}.npy")
+            lut = self._load(path)
+            if lut is None:
+                lut = build_lut(projection)
+                self._store(path, lut)
+        elif lut is None:
+            lut = build_lut(projection)
+
+        self._tables[key] = lut
+        while len(self._tables) > self.size:
+            self._tables.popitem(last=False)
+        return lut
+
+    def reproject(self, sweep: np.ndarray, projection: Projection) -> np.ndarray:
+        """Reprojects a sweep onto the grid of a projection."""
+        return apply_lut(sweep, self.get(projection))
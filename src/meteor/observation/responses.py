@@ -0,0 +1,138 @@
+from typing import Optional
+
+import numpy as np
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .formats import NPY, npy_chunks
+from .grid import Quantization
+
+
+def quantization_headers(quantization: Quantization) -> dict:
+    """Headers telling clients how to get physical values back from a quantized grid."""
+    return {
+        "X-Meteor-Scale": repr(quantization.scale),
+        "X-Meteor-Offset": repr(quantization.offset),
+        "X-Meteor-Nodata": str(quantization.nodata),
+    }
+
+
+def dtype_header(dtype: np.dtype) -> str:
+    """The numpy type string of a dtype, as ``name:type`` pairs for records."""
+    if dtype.names:
+        return ",".join(f"{name}:{dtype.fields[name][0].str}" for name in dtype.names)
+    return dtype.str
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Returns the (start, stop) bytes of a single ``bytes=`` range, None to send the whole body
+    (no range, or several of them). Raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            stop = min(int(last) + 1, size) if last else size
+        else:
+            start, stop = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    if start >= stop:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes.")
+    return start, stop
+
+
+def slice_chunks(chunks: list, start: int, stop: int) -> list:
+    """Views of the bytes from ``start`` to ``stop`` of consecutive chunks, without copying them."""
+    sliced, position = [], 0
+    for chunk in chunks:
+        chunk = memoryview(chunk).cast("B")
+        if position < stop and position + len(chunk) > start:
+            sliced.append(chunk[max(start - position, 0) : stop - position])
+        position += len(chunk)
+    return sliced
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header with an entity tag."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+class GridResponse(Response):
+    """
+    Sends a grid as raw bytes straight from the array buffer. A ``Range`` header is served
+    with a 206 from views of the buffer.
+    """
+
+    media_type = "application/octet-stream"
+
+    def __init__(
+        self,
+        content: np.ndarray,
+        status_code: int = 200,
+        headers: dict = None,
+        media_type: str = None,
+        background: BackgroundTask = None,
+        range: Optional[str] = None,
+    ) -> None:
+        headers = dict(headers or {})
+        headers.setdefault("X-Meteor-Shape", ",".join(str(dim) for dim in content.shape))
+        headers.setdefault("X-Meteor-Dtype", dtype_header(content.dtype))
+        headers["Accept-Ranges"] = "bytes"
+
+        self.chunks = self.render_chunks(content)
+        size = sum(len(chunk) for chunk in self.chunks)
+        try:
+            byte_range = parse_range(range, size)
+        except ValueError:
+            byte_range, status_code, self.chunks = None, 416, []
+            headers["Content-Range"] = f"bytes */{size}"
+        if byte_range:
+            start, stop = byte_range
+            status_code, self.chunks = 206, slice_chunks(self.chunks, start, stop)
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        headers["Content-Length"] = str(sum(len(chunk) for chunk in self.chunks))
+
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render_chunks(self, content: np.ndarray) -> list:
+        # a flat byte view of the contiguous array, no copy
+        return [memoryview(np.ascontiguousarray(content)).cast("B")]
+
+    def render(self, content: np.ndarray) -> bytes:
+        # the body is sent from the chunks
+        return b""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        for index, chunk in enumerate(self.chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(self.chunks) - 1})
+        if not self.chunks:
+            await send({"type": "http.response.body", "body": b""})
+
+        if self.background is not None:
+            await self.background()
+
+
+class NpyResponse(GridResponse):
+    """
+    Sends a grid as a ``.npy`` file. The header and the array buffer are sent as two body
+    messages so that the payload is never copied to prepend the header.
+    """
+
+    media_type = NPY
+
+    def render_chunks(self, content: np.ndarray) -> list:
+        return list(npy_chunks(content))
@@ -1,17 +1,100 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Optional
-from pydantic.errors import PydanticErrorMixin
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import insert, select
+from sqlalchemy import DateTime, Integer, and_, case, column, delete, func, or_, select, values
 
-from meteor.database.manage import init_schema
-from meteor.enums import UserRoles
-from meteor.exceptions import NotFoundError
+import anyio
+import numpy as np
 
-from .models import ObservationElement, ObservationRead, ObservationValue
+from meteor import config
+from meteor.database.core import refetch_db_session
+from meteor.database.partition import ensure_partition, get_connection_schema, month_start
+from meteor.exceptions import GridFormatError
+from meteor.metrics import provider as metrics_provider
+from meteor.singleflight import SingleFlight
+
+from . import codec, delta, diskcache, grid, stream, tiles, workers
+from .enums import ResampleMethod
+from .framecache import FrameCache, parse_budgets
+from .models import (
+    AreaRequest,
+    FetchRequest,
+    FrameKey,
+    ObservationElement,
+    ObservationRead,
+    ObservationValue,
+    PointSeriesRequest,
+)
 
 log = logging.getLogger(__name__)
 
+# enough to hold the header and the offset table of grids up to ~500 chunks in the first read
+HEADER_PREFETCH = 4096
+
+# frames fetched per round trip by the server-side cursor of time-range streams
+STREAM_BATCH_SIZE = 16
+
+# chains of a time-range stream being rendered ahead of the client
+STREAM_PREFETCH = 2
+
+# PNG tiles of this server process, panning a map mostly hits the tiles already rendered
+tile_cache = tiles.TileCache(config.METEOR_OBSERVATION_TILE_CACHE_SIZE)
+
+# decoded frames shared by the server processes of this host
+frame_cache = FrameCache(
+    config.METEOR_OBSERVATION_FRAME_CACHE_DIR,
+    config.METEOR_OBSERVATION_FRAME_CACHE_BUDGET,
+    parse_budgets(config.METEOR_OBSERVATION_FRAME_CACHE_BUDGETS),
+)
+
+# encoded frames on local disk, event reviews read the same older frames over and over
+disk_cache = diskcache.DiskCache(config.METEOR_OBSERVATION_DISK_CACHE_DIR, config.METEOR_OBSERVATION_DISK_CACHE_SIZE)
+
+# right after a frame is stored, its subscribers and map viewers all ask for the same windows at once
+grid_flights = SingleFlight("observation.fetch")
+frame_flights = SingleFlight("observation.frame")
+tile_flights = SingleFlight("observation.tile")
+
+# frame cache entry describing the base grid and the pyramid of a frame, see describe_frame
+FRAME_DESCRIPTION = "description"
+
+FRAME_COLUMNS = (
+    ObservationValue.id,
+    ObservationValue.captured_at,
+    ObservationValue.observation_element_id,
+    ObservationValue.keyframe_at,
+    ObservationValue.delta_scale,
+    ObservationValue.content_hash,
+)
+
+# state of a delta chain being written, levels hold the reconstruction of its latest frame
+DeltaChain = namedtuple("DeltaChain", ("keyframe_at", "length", "levels"))
+
+# a chain this process appended to, valid as long as the frame captured at captured_at with
+# content_hash is the latest of its element
+OpenChain = namedtuple("OpenChain", ("captured_at", "content_hash", "geometry", "chain"))
+
+# open chains by (schema, element id), least recently used first
+open_chains: "OrderedDict[tuple[str, int], OpenChain]" = OrderedDict()
+
+# notified with frame_notification payloads, see meteor.observation.push
+FRAME_CHANNEL = "meteor_observation_frame"
+
+# the chunks of a window of a stored grid, read but not decoded yet
+WindowChunks = namedtuple("WindowChunks", ("header", "table", "rows", "cols", "plan", "payloads"))
+
+# a frame of a chain to render, frames only read to reconstruct the following deltas are not emitted
+ChainMember = namedtuple("ChainMember", ("delta_scale", "chunks", "emit"))
+
+EncodedFrame = namedtuple(
+    "EncodedFrame", ("captured_at", "keyframe_at", "delta_scale", "value", "pyramid", "content_hash")
+)
+
 
 async def get_observation_elements(*, db_session: Session) -> List[Optional[ObservationElement]]:
     """
@@ -27,18 +110,1102 @@ async def get_element_by_id(*, db_session: Session, element_id) -> Optional[Obse
 
 async def get_element_by_exact_name(*, db_session: Session, element_name) -> Optional[ObservationElement]:
     """
-    Gets all elements in the database.
+    Gets an element by its exact name.
     """
-    return await db_session.execute(select(ObservationElement).where(ObservationElement.name == element_name))
+    return await db_session.scalar(select(ObservationElement).where(ObservationElement.name == element_name))
 
 
 async def get_observation_value(*, db_session: Session, element_id, organization_id) -> Optional[ObservationRead]:
     """
     Gets all elements in the database.
     """
-    data = await db_session.execute(
+    return await db_session.scalar(
         select(ObservationValue).where(
-            ObservationValue.organization_id == organization_id
-            and ObservationValue.observation_element_id == element_id
-        ).
+            ObservationValue.organization_id == organization_id,
+            ObservationValue.observation_element_id == element_id,
+        )
+    )
+
+
+def frame_levels(frame: np.ndarray, method: ResampleMethod) -> List[np.ndarray]:
+    """Returns a radar grid followed by its downsampled pyramid levels."""
+    return [frame, *grid.build_pyramid(frame, method, min_size=config.METEOR_OBSERVATION_PYRAMID_MIN_SIZE)]
+
+
+def encode_levels(levels: List[np.ndarray], geometry: codec.GridGeometry) -> tuple[bytes, bytes]:
+    """Encodes a grid and its pyramid levels into the chunked storage format."""
+    chunk_size = config.METEOR_OBSERVATION_CHUNK_SIZE
+    options = dict(
+        chunk_shape=(chunk_size, chunk_size),
+        codec=codec.CODECS.get(config.METEOR_OBSERVATION_CODEC),
+        level=config.METEOR_OBSERVATION_COMPRESSION_LEVEL,
+    )
+
+    pyramid = codec.encode_pyramid(
+        [
+            codec.encode_grid(level, codec.scale_geometry(geometry, 2**index), **options)
+            for index, level in enumerate(levels[1:], 1)
+        ]
+    )
+    return codec.encode_grid(levels[0], geometry, **options), pyramid
+
+
+def content_hash(value: bytes, pyramid: Optional[bytes]) -> str:
+    """
+    Hex MD5 of the stored bytes of a frame, the same as ``md5(value || pyramid)`` in Postgres.
+    Frames never change once stored, it identifies their content in ETags.
+    """
+    digest = hashlib.md5(value)
+    digest.update(pyramid or b"")
+    return digest.hexdigest()
+
+
+def encode_frame(frame: np.ndarray, geometry: codec.GridGeometry, method: ResampleMethod) -> tuple[bytes, bytes]:
+    """Encodes a radar grid and its downsampled pyramid into the chunked storage format."""
+    return encode_levels(frame_levels(frame, method), geometry)
+
+
+def in_chain_month(chain: DeltaChain, captured_at: datetime) -> bool:
+    """Whether a frame is captured in the month of the keyframe of a chain, and can continue it."""
+    return month_start(captured_at) == month_start(chain.keyframe_at)
+
+
+def encode_chain_frame(
+    captured_at: datetime,
+    levels: List[np.ndarray],
+    geometry: codec.GridGeometry,
+    *,
+    scale: float,
+    interval: int,
+    chain: Optional[DeltaChain],
+) -> tuple[bytes, bytes, Optional[datetime], Optional[float], Optional[DeltaChain]]:
+    """
+    Encodes the levels of a frame following ``chain``, see ``encode_chain``. Returns the value and the
+    pyramid, the keyframe and delta scale they are stored with and the chain the frame continues.
+    """
+    deltas = None
+    if interval > 1 and chain and chain.length < interval and in_chain_month(chain, captured_at):
+        if [level.shape for level in levels] == [level.shape for level in chain.levels]:
+            deltas = [delta.quantize(level, reference, scale) for level, reference in zip(levels, chain.levels)]
+            if any(level is None for level in deltas):
+                deltas = None
+
+    if deltas is not None:
+        chain = DeltaChain(
+            keyframe_at=chain.keyframe_at,
+            length=chain.length + 1,
+            levels=[delta.reconstruct(*level, scale) for level in zip(chain.levels, deltas)],
+        )
+        keyframe_at, delta_scale, stored = chain.keyframe_at, scale, deltas
+    elif interval > 1:
+        chain = DeltaChain(keyframe_at=captured_at, length=1, levels=levels)
+        keyframe_at, delta_scale, stored = captured_at, None, levels
+    else:
+        chain, keyframe_at, delta_scale, stored = None, None, None, levels
+
+    value, pyramid = encode_levels(stored, geometry)
+    return value, pyramid, keyframe_at, delta_scale, chain
+
+
+def encode_chain(
+    frames: Iterable[tuple[datetime, np.ndarray]],
+    geometry: codec.GridGeometry,
+    method: ResampleMethod,
+    *,
+    scale: float,
+    interval: int,
+    chain: Optional[DeltaChain] = None,
+) -> Iterator[EncodedFrame]:
+    """
+    Encodes consecutive frames of an element, storing a keyframe every ``interval`` frames and
+    quantized deltas against the previous reconstructed frame in between. Frames whose delta
+    overflows are stored as keyframes, as are the first frames of a month: chains never span two
+    partitions, so that detaching a month never leaves deltas without their keyframe. Pass ``chain``
+    to continue a stored chain.
+    """
+    for captured_at, frame in frames:
+        value, pyramid, keyframe_at, delta_scale, chain = encode_chain_frame(
+            captured_at, frame_levels(frame, method), geometry, scale=scale, interval=interval, chain=chain
+        )
+        yield EncodedFrame(captured_at, keyframe_at, delta_scale, value, pyramid, content_hash(value, pyramid))
+
+
+async def get_chain(*, db_session: Session, frame: FrameKey) -> List[FrameKey]:
+    """
+    Returns the keys of the frames needed to reconstruct a delta frame, from its keyframe to itself.
+    """
+    members = (
+        await db_session.execute(
+            select(*FRAME_COLUMNS)
+            .where(
+                ObservationValue.observation_element_id == frame.observation_element_id,
+                ObservationValue.keyframe_at == frame.keyframe_at,
+                ObservationValue.captured_at >= frame.keyframe_at,
+                ObservationValue.captured_at <= frame.captured_at,
+            )
+            .order_by(ObservationValue.captured_at)
+        )
+    ).all()
+    if not members or members[0].delta_scale is not None:
+        raise GridFormatError(f"The keyframe of the frame captured at {frame.captured_at} is missing.")
+    return members
+
+
+async def read_frame_levels(*, db_session: Session, frame: FrameKey) -> tuple[codec.GridGeometry, List[np.ndarray]]:
+    """Decodes a stored frame and all of its pyramid levels."""
+    value, pyramid = (
+        await db_session.execute(
+            select(ObservationValue.value, ObservationValue.pyramid).where(
+                ObservationValue.id == frame.id, ObservationValue.captured_at == frame.captured_at
+            )
+        )
+    ).one()
+
+    levels = [codec.decode_grid(value)]
+    if pyramid:
+        levels.extend(codec.decode_grid(pyramid[start:stop]) for start, stop in codec.read_pyramid_directory(pyramid))
+    return codec.read_header(value).geometry, levels
+
+
+def remember_chain(key: tuple[str, int], captured_at: datetime, content_hash: str, geometry, chain) -> None:
+    """Keeps the state of a chain a frame was just appended to, for the next frame of the element."""
+    size = config.METEOR_OBSERVATION_OPEN_CHAIN_CACHE_SIZE
+    if chain is None or size <= 0:
+        open_chains.pop(key, None)
+        return
+
+    open_chains[key] = OpenChain(captured_at, content_hash, geometry, chain)
+    open_chains.move_to_end(key)
+    while len(open_chains) > size:
+        open_chains.popitem(last=False)
+
+
+async def rebuild_chain(
+    *, db_session: Session, members: List[FrameKey], geometry: codec.GridGeometry, cached: Optional[OpenChain]
+) -> Optional[DeltaChain]:
+    """
+    Reconstructs the latest frame of a chain from its keyframe, or from a cached state of the chain
+    when it is one of its members, None when the chain is of another geometry.
+    """
+    start = 0
+    if cached:
+        tip = (cached.captured_at, cached.content_hash)
+        tips = [index for index, member in enumerate(members) if (member.captured_at, member.content_hash) == tip]
+        start = tips[0] + 1 if tips else 0
+    if start:
+        reference_geometry, levels = cached.geometry, cached.chain.levels
+    else:
+        reference_geometry, levels = await read_frame_levels(db_session=db_session, frame=members[0])
+        start = 1
+    if reference_geometry != geometry:
+        return None
+
+    for member in members[start:]:
+        _, deltas = await read_frame_levels(db_session=db_session, frame=member)
+        levels = [delta.reconstruct(*level, member.delta_scale) for level in zip(levels, deltas)]
+    return DeltaChain(keyframe_at=members[0].keyframe_at, length=len(members), levels=levels)
+
+
+async def get_open_chain(
+    *, db_session: Session, element_id: int, captured_at: datetime, geometry: codec.GridGeometry, interval: int
+) -> Optional[DeltaChain]:
+    """
+    Returns the chain a new frame can be appended to as a delta: the chain of the latest frame of the
+    element, if it is older than the new frame, of the same month, has the same geometry and still has room.
+    The chains this process appended to are taken from ``open_chains``, only the frames other processes
+    appended since are decoded.
+    """
+    latest = await get_frame(db_session=db_session, element_id=element_id, at=datetime.max)
+    if not latest or latest.keyframe_at is None or latest.captured_at >= captured_at:
+        return None
+    if month_start(latest.keyframe_at) != month_start(captured_at):
+        return None
+
+    key = (get_connection_schema(await db_session.connection()), element_id)
+    cached = open_chains.get(key)
+    if cached and (cached.captured_at, cached.content_hash) == (latest.captured_at, latest.content_hash):
+        open_chains.move_to_end(key)
+        if cached.chain.length >= interval or cached.geometry != geometry:
+            return None
+        return cached.chain
+
+    members = await get_chain(db_session=db_session, frame=latest)
+    if len(members) >= interval:
+        return None
+    return await rebuild_chain(db_session=db_session, members=members, geometry=geometry, cached=cached)
+
+
+def frame_notification(schema: str, element_id: int, captured_at: datetime) -> str:
+    """Payload of the notification sent on FRAME_CHANNEL when a frame is stored."""
+    return json.dumps({"schema": schema, "element_id": element_id, "captured_at": captured_at.isoformat()})
+
+
+async def create_observation_value(
+    *,
+    db_session: Session,
+    element: ObservationElement,
+    organization_id: int,
+    frame: np.ndarray,
+    geometry: codec.GridGeometry,
+    captured_at: datetime,
+) -> ObservationValue:
+    """Encodes a radar grid with its pyramid and stores it, as a delta when it continues a chain."""
+    interval = config.METEOR_OBSERVATION_KEYFRAME_INTERVAL
+    chain = None
+    if interval > 1:
+        chain = await get_open_chain(
+            db_session=db_session,
+            element_id=element.id,
+            captured_at=captured_at,
+            geometry=geometry,
+            interval=interval,
+        )
+
+    value, pyramid, keyframe_at, delta_scale, chain = encode_chain_frame(
+        captured_at,
+        frame_levels(frame, grid.pyramid_method(element.name)),
+        geometry,
+        scale=element.scale or 1,
+        interval=interval,
+        chain=chain,
+    )
+    digest = content_hash(value, pyramid)
+    await ensure_partition(db_session, captured_at)
+    connection = await db_session.connection()
+
+    observation_value = ObservationValue(
+        observation_element_id=element.id,
+        organization_id=organization_id,
+        captured_at=captured_at,
+        keyframe_at=keyframe_at,
+        delta_scale=delta_scale,
+        value=value,
+        pyramid=pyramid,
+        content_hash=digest,
+    )
+    db_session.add(observation_value)
+    # delivered to the listeners when the transaction commits
+    await db_session.execute(
+        select(
+            func.pg_notify(
+                FRAME_CHANNEL, frame_notification(get_connection_schema(connection), element.id, captured_at)
+            )
+        )
+    )
+    await db_session.commit()
+    remember_chain((get_connection_schema(connection), element.id), captured_at, digest, geometry, chain)
+    return observation_value
+
+
+async def get_cached_frame(*, db_session: Session, frame: FrameKey) -> Optional[diskcache.CachedFrame]:
+    """
+    Returns a frame from the disk cache, reading its whole value and pyramid into it on a miss.
+    None when the cache is disabled, when the frame has no content hash to be cached under or
+    when it cannot be cached, its byte ranges being read from the database then.
+    """
+    content_hash = getattr(frame, "content_hash", None)
+    if not content_hash or not disk_cache.enabled:
+        return None
+
+    cached = disk_cache.get(content_hash)
+    if cached is not None:
+        metrics_provider.counter("observation.disk_cache.hits")
+        return cached
+
+    metrics_provider.counter("observation.disk_cache.misses")
+    if disk_cache.rejected(content_hash):
+        return None
+
+    # the blobs are only sent when they fit the cache, octet_length does not detoast them
+    size = func.octet_length(ObservationValue.value) + func.coalesce(func.octet_length(ObservationValue.pyramid), 0)
+    fits = size <= disk_cache.size - diskcache.HEADER.size
+    value, pyramid = (
+        await db_session.execute(
+            select(case((fits, ObservationValue.value)), case((fits, ObservationValue.pyramid))).where(
+                ObservationValue.id == frame.id, ObservationValue.captured_at == frame.captured_at
+            )
+        )
+    ).one()
+
+    # writing a file of several megabytes and scanning the directory for eviction would stall the event loop
+    cached = None
+    if value is not None and await anyio.to_thread.run_sync(disk_cache.write, content_hash, value, pyramid):
+        cached = disk_cache.get(content_hash)
+    if cached is None:
+        disk_cache.reject(content_hash)
+    return cached
+
+
+async def read_value_ranges(
+    *, db_session: Session, frame: FrameKey, ranges: List[tuple[int, int]], column=ObservationValue.value
+) -> List[bytes]:
+    """
+    Reads byte ranges of a stored value in a single round trip, without loading the whole blob,
+    or from the disk cache once the frame is in it.
+    """
+    if not ranges:
+        return []
+
+    cached = await get_cached_frame(db_session=db_session, frame=frame)
+    if cached is not None:
+        return cached.read_ranges(column.key, ranges)
+
+    columns = [func.substring(column, start + 1, stop - start) for start, stop in ranges]
+    row = (
+        await db_session.execute(
+            select(*columns).where(ObservationValue.id == frame.id, ObservationValue.captured_at == frame.captured_at)
+        )
+    ).one()
+    return list(row)
+
+
+async def read_frames_ranges(*, db_session: Session, ranges: List[tuple[FrameKey, int, int]]) -> List[bytes]:
+    """
+    Reads one byte range of the values of many frames in a single round trip, the ranges
+    being joined to the frames as an inline VALUES list. Ranges of frames already in the
+    disk cache are read from it, the others are not worth caching whole frames for.
+    """
+    if not ranges:
+        return []
+
+    payloads = [b""] * len(ranges)
+    missing = list(range(len(ranges)))
+    if disk_cache.enabled:
+        missing = []
+        for position, (frame, start, stop) in enumerate(ranges):
+            cached = disk_cache.get(frame.content_hash) if getattr(frame, "content_hash", None) else None
+            if cached is None:
+                missing.append(position)
+            else:
+                (payloads[position],) = cached.read_ranges("value", [(start, stop)])
+        metrics_provider.counter("observation.disk_cache.hits", len(ranges) - len(missing))
+        metrics_provider.counter("observation.disk_cache.misses", len(missing))
+    if not missing:
+        return payloads
+
+    reads = [(position, *ranges[position]) for position in missing]
+    batch = values(
+        column("position", Integer),
+        column("id", Integer),
+        column("captured_at", DateTime),
+        column("start", Integer),
+        column("length", Integer),
+        name="batch",
+    ).data([(position, frame.id, frame.captured_at, start + 1, stop - start) for position, frame, start, stop in reads])
+    captured_at = [frame.captured_at for _, frame, _, _ in reads]
+    rows = await db_session.execute(
+        select(batch.c.position, func.substring(ObservationValue.value, batch.c.start, batch.c.length)).join_from(
+            batch,
+            ObservationValue,
+            and_(ObservationValue.id == batch.c.id, ObservationValue.captured_at == batch.c.captured_at),
+        )
+        # lets Postgres prune the partitions outside of the batch
+        .where(ObservationValue.captured_at.between(min(captured_at), max(captured_at)))
+    )
+
+    for position, payload in rows:
+        payloads[position] = payload
+    return payloads
+
+
+async def read_value_header(
+    *, db_session: Session, frame: FrameKey, column=ObservationValue.value, offset: int = 0
+) -> tuple[codec.GridHeader, np.ndarray]:
+    """
+    Reads the header and the chunk offset table of a grid stored at ``offset`` in a column.
+    """
+    (prefix,) = await read_value_ranges(
+        db_session=db_session, frame=frame, ranges=[(offset, offset + HEADER_PREFETCH)], column=column
+    )
+    header = codec.read_header(prefix)
+    if len(prefix) < header.data_offset:
+        (prefix,) = await read_value_ranges(
+            db_session=db_session, frame=frame, ranges=[(offset, offset + header.data_offset)], column=column
+        )
+    return header, codec.read_chunk_table(prefix, header)
+
+
+async def read_window_chunks(
+    *,
+    db_session: Session,
+    frame: FrameKey,
+    header: codec.GridHeader,
+    table: np.ndarray,
+    rows: slice,
+    cols: slice,
+    column=ObservationValue.value,
+    offset: int = 0,
+) -> WindowChunks:
+    """
+    Reads the chunks of a stored grid overlapping a window, to be decoded with ``codec.decode_window``.
+    """
+    plan = codec.plan_reads(header, table, codec.window_chunks(header, rows, cols))
+    payloads = await read_value_ranges(
+        db_session=db_session,
+        frame=frame,
+        ranges=[(offset + start, offset + stop) for start, stop, _ in plan],
+        column=column,
+    )
+    return WindowChunks(header, table, rows, cols, plan, payloads)
+
+
+async def read_value_chunks(
+    *,
+    db_session: Session,
+    frame: FrameKey,
+    header: codec.GridHeader,
+    table: np.ndarray,
+    rows: slice,
+    cols: slice,
+    column=ObservationValue.value,
+    offset: int = 0,
+) -> np.ndarray:
+    """
+    Decodes a window of a stored grid, reading only the chunks overlapping it.
+    """
+    chunks = await read_window_chunks(
+        db_session=db_session,
+        frame=frame,
+        header=header,
+        table=table,
+        rows=rows,
+        cols=cols,
+        column=column,
+        offset=offset,
+    )
+    return codec.decode_window(*chunks)
+
+
+async def read_value_window(
+    *, db_session: Session, frame: FrameKey, north: float, west: float, south: float, east: float
+) -> np.ndarray:
+    """
+    Decodes the part of a stored grid covered by a lat/long bounding box, reading only the overlapping chunks.
+    """
+    header, table = await read_value_header(db_session=db_session, frame=frame)
+    rows, cols = header.window(north, west, south, east)
+    return await read_value_chunks(db_session=db_session, frame=frame, header=header, table=table, rows=rows, cols=cols)
+
+
+async def read_pyramid_directory(*, db_session: Session, frame: FrameKey) -> Optional[np.ndarray]:
+    """
+    Reads the level directory of a stored pyramid, None for frames stored without one.
+    """
+    (prefix,) = await read_value_ranges(
+        db_session=db_session, frame=frame, ranges=[(0, HEADER_PREFETCH)], column=ObservationValue.pyramid
+    )
+    if not prefix:
+        return None
+    return codec.read_pyramid_directory(prefix)
+
+
+async def get_frame(*, db_session: Session, element_id: int, at: datetime) -> Optional[FrameKey]:
+    """
+    Returns the key of the latest frame of an element captured at or before the given time.
+    """
+    return (
+        await db_session.execute(
+            select(*FRAME_COLUMNS)
+            .where(ObservationValue.observation_element_id == element_id, ObservationValue.captured_at <= at)
+            .order_by(ObservationValue.captured_at.desc())
+            .limit(1)
+        )
+    ).first()
+
+
+async def get_frame_at(*, db_session: Session, element_id: int, captured_at: datetime) -> Optional[FrameKey]:
+    """Returns the key of the frame of an element captured at exactly the given time."""
+    return (
+        await db_session.execute(
+            select(*FRAME_COLUMNS).where(
+                ObservationValue.observation_element_id == element_id, ObservationValue.captured_at == captured_at
+            )
+        )
+    ).first()
+
+
+async def get_frames(*, db_session: Session, element_id: int, start: datetime, end: datetime) -> List[FrameKey]:
+    """Returns the keys of the frames of an element captured after ``start``, up to ``end``, in capture order."""
+    return (
+        await db_session.execute(
+            select(*FRAME_COLUMNS)
+            .where(
+                ObservationValue.observation_element_id == element_id,
+                ObservationValue.captured_at > start,
+                ObservationValue.captured_at <= end,
+            )
+            .order_by(ObservationValue.captured_at)
+        )
+    ).all()
+
+
+async def delete_frames(*, db_session: Session, element_id: int, start: datetime, end: datetime) -> List[datetime]:
+    """
+    Deletes the frames of an element captured after ``start``, up to ``end``, with the later frames of
+    their delta chains, which cannot be reconstructed without them. Returns the capture times of the
+    deleted frames.
+    """
+    return (
+        (
+            await db_session.execute(
+                delete(ObservationValue)
+                .where(
+                    ObservationValue.observation_element_id == element_id,
+                    ObservationValue.captured_at > start,
+                    or_(ObservationValue.captured_at <= end, ObservationValue.keyframe_at <= end),
+                )
+                .returning(ObservationValue.captured_at)
+            )
+        )
+        .scalars()
+        .all()
     )
+
+
+async def get_series_frames(*, db_session: Session, element_id: int, start: datetime, end: datetime) -> list:
+    """
+    Returns the keys and the first bytes of the values of the frames of an element captured in a
+    time range, preceded by the earlier frames of the delta chain the range starts in.
+    """
+    query = select(*FRAME_COLUMNS, func.substring(ObservationValue.value, 1, HEADER_PREFETCH).label("prefix")).where(
+        ObservationValue.observation_element_id == element_id
+    )
+    frames = (
+        await db_session.execute(
+            query.where(ObservationValue.captured_at.between(start, end)).order_by(ObservationValue.captured_at)
+        )
+    ).all()
+
+    chains = {frame.keyframe_at for frame in frames if frame.delta_scale is not None and frame.keyframe_at < start}
+    if chains:
+        earlier = (
+            await db_session.execute(
+                query.where(
+                    ObservationValue.keyframe_at.in_(chains),
+                    ObservationValue.captured_at >= min(chains),
+                    ObservationValue.captured_at < start,
+                ).order_by(ObservationValue.captured_at)
+            )
+        ).all()
+        frames = earlier + frames
+    return frames
+
+
+async def fetch_point_series(*, db_session: Session, element_id: int, series_in: PointSeriesRequest) -> np.ndarray:
+    """
+    Returns the (timestamp, value) records of an element at a point over a time range.
+
+    Only the chunk holding the point is read from each frame: the headers come with the frame
+    keys, and the chunks of all frames are then read in a single round trip.
+    """
+    frames = await get_series_frames(
+        db_session=db_session, element_id=element_id, start=series_in.startDate, end=series_in.endDate
+    )
+    entry_size = codec.OFFSET_DTYPE.itemsize
+
+    # locate the point and its chunk offsets, from the prefix when the offset table fits in it
+    located, offsets, overflow = [], {}, []
+    for position, frame in enumerate(frames):
+        header = codec.read_header(frame.prefix)
+        cell = header.cell(series_in.coordinate.lat, series_in.coordinate.long)
+        index = header.chunk_index(*cell) if cell else None
+        located.append((header, cell, index))
+
+        if cell is None:
+            continue
+        entry = codec.HEADER_SIZE + index * entry_size
+        if entry + 2 * entry_size <= len(frame.prefix):
+            offsets[position] = np.frombuffer(frame.prefix, dtype=codec.OFFSET_DTYPE, count=2, offset=entry)
+        else:
+            overflow.append((position, entry))
+
+    entries = await read_frames_ranges(
+        db_session=db_session,
+        ranges=[(frames[position], entry, entry + 2 * entry_size) for position, entry in overflow],
+    )
+    for (position, _), entry in zip(overflow, entries):
+        offsets[position] = np.frombuffer(entry, dtype=codec.OFFSET_DTYPE, count=2)
+
+    positions = sorted(offsets)
+    chunks = await read_frames_ranges(
+        db_session=db_session,
+        ranges=[
+            (
+                frames[position],
+                located[position][0].data_offset + int(offsets[position][0]),
+                located[position][0].data_offset + int(offsets[position][1]),
+            )
+            for position in positions
+        ],
+    )
+
+    raw = np.full(len(frames), np.nan)
+    for position, chunk in zip(positions, chunks):
+        header, (row, col), index = located[position]
+        rows, cols = header.chunk_bounds(index)
+        raw[position] = codec.decode_chunk(header, index, chunk)[row - rows.start, col - cols.start]
+
+    # delta frames hold the difference to the previous frame of their chain
+    series = np.full(len(frames), np.nan, dtype=stream.POINT_DTYPE.fields["value"][0])
+    chains = {}
+    for position, frame in enumerate(frames):
+        if frame.delta_scale is None:
+            series[position] = raw[position]
+        elif frame.keyframe_at in chains and not np.isnan(raw[position]):
+            reference = np.array([chains[frame.keyframe_at]], dtype=series.dtype)
+            steps = np.array([raw[position]], dtype=delta.DELTA_DTYPE)
+            series[position] = delta.reconstruct(reference, steps, frame.delta_scale)[0]
+        if frame.keyframe_at is not None:
+            chains[frame.keyframe_at] = series[position]
+
+    records = np.empty(len(frames), dtype=stream.POINT_DTYPE)
+    records["timestamp"] = [stream.to_timestamp(frame.captured_at) for frame in frames]
+    records["value"] = series
+    return records[[frame.captured_at >= series_in.startDate for frame in frames]]
+
+
+async def read_frame_chunks(*, db_session: Session, frame: FrameKey, fetch_in: AreaRequest) -> WindowChunks:
+    """
+    Reads the chunks of a stored grid covered by the requested bounding box, from the coarsest
+    pyramid level that still meets the resolution. Delta frames decode to their raw deltas.
+    """
+    header, table = await read_value_header(db_session=db_session, frame=frame)
+    rows, cols = header.window(*fetch_in.bounds)
+    column, offset = ObservationValue.value, 0
+
+    level = grid.pyramid_level(min(rows.stop - rows.start, cols.stop - cols.start), fetch_in.resolution)
+    if level:
+        directory = await read_pyramid_directory(db_session=db_session, frame=frame)
+        if directory is not None and len(directory):
+            column, offset = ObservationValue.pyramid, int(directory[min(level, len(directory)) - 1][0])
+            header, table = await read_value_header(db_session=db_session, frame=frame, column=column, offset=offset)
+            rows, cols = header.window(*fetch_in.bounds)
+
+    return await read_window_chunks(
+        db_session=db_session,
+        frame=frame,
+        header=header,
+        table=table,
+        rows=rows,
+        cols=cols,
+        column=column,
+        offset=offset,
+    )
+
+
+async def read_chain_members(
+    *, db_session: Session, frames: List[FrameKey], fetch_in: AreaRequest
+) -> List[ChainMember]:
+    """
+    Reads the chunks of consecutive frames of a chain. When the first one is a delta frame,
+    the chain is read from its keyframe to reconstruct it.
+    """
+    prefix = []
+    if frames[0].delta_scale is not None:
+        prefix = (await get_chain(db_session=db_session, frame=frames[0]))[:-1]
+
+    members = []
+    for frame in [*prefix, *frames]:
+        chunks = await read_frame_chunks(db_session=db_session, frame=frame, fetch_in=fetch_in)
+        members.append(ChainMember(frame.delta_scale, chunks, emit=len(members) >= len(prefix)))
+    return members
+
+
+def decode_chain(members: List[ChainMember]) -> Iterator[tuple[ChainMember, np.ndarray]]:
+    """Decodes the members of a chain in order, applying each delta to the previous window."""
+    reference = None
+    for member in members:
+        window = codec.decode_window(*member.chunks)
+        if member.delta_scale is not None:
+            window = delta.reconstruct(reference, window, member.delta_scale)
+        reference = window
+
+        if member.emit:
+            yield member, window
+
+
+def render_frames(
+    members: List[ChainMember],
+    resolution: int,
+    method: ResampleMethod,
+    quantization: Optional[grid.Quantization] = None,
+) -> List[np.ndarray]:
+    """
+    Returns the emitted frames of a chain resampled to the requested resolution and quantized.
+    Runs in the processes of meteor.observation.workers.
+    """
+    frames = []
+    for _, window in decode_chain(members):
+        data = grid.resample(window, resolution, method)
+        frames.append(grid.quantize(data, quantization) if quantization else data)
+    return frames
+
+
+def render_tile(members: List[ChainMember], z: int, x: int, y: int, colormap: tiles.Colormap) -> List[np.ndarray]:
+    """
+    Returns the PNG tile of the last member of a chain, as an array of bytes.
+    Runs in the processes of meteor.observation.workers.
+    """
+    for member, window in decode_chain(members):
+        header, _, rows, cols, _, _ = member.chunks
+        values = tiles.project_tile(window, header.geometry, rows, cols, z, x, y)
+    return [np.frombuffer(tiles.encode_png(tiles.colorize(values, colormap)), dtype=np.uint8)]
+
+
+def frame_etag(
+    *, frame: FrameKey, fetch_in: FetchRequest, quantization: grid.Quantization, media_type: str
+) -> Optional[str]:
+    """
+    Returns the strong ETag of a fetched frame: the hash of the stored frame and of everything
+    shaping the response, None for frames stored without a content hash.
+    """
+    if not frame.content_hash:
+        return None
+    digest = hashlib.md5(frame.content_hash.encode())
+    digest.update(fetch_in.model_dump_json(exclude={"startDate", "endDate"}).encode())
+    digest.update(repr((tuple(quantization), media_type)).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def grid_key(*, organization: str, frame: FrameKey, fetch_in: AreaRequest, quantization: Optional[grid.Quantization]):
+    """Identifies a fetched grid by the frame it was resolved to and everything shaping it."""
+    return (
+        organization,
+        frame.observation_element_id,
+        frame.captured_at,
+        frame.content_hash,
+        fetch_in.bounds,
+        fetch_in.resolution,
+        fetch_in.method,
+        # nodata is NaN for float types, which never compares equal
+        (quantization.dtype.str, quantization.scale, quantization.offset) if quantization else None,
+    )
+
+
+async def fetch_shared_grid(
+    *, organization: str, frame: FrameKey, fetch_in: AreaRequest, quantization: Optional[grid.Quantization] = None
+) -> np.ndarray:
+    """
+    Same as fetch_grid, except that frames are decoded once per host: the pyramid level a fetch needs
+    is decoded whole into the frame cache shared by the server processes, and every fetch of the
+    frame, whatever its window and resolution, is cropped and resampled from its memory map. Frames
+    that do not fit the cache are fetched as fetch_grid does, concurrent requests for the same frame
+    and window sharing a single read and decoding, run with a session of its own.
+    """
+    if frame_cache.budget_of(organization):
+        data = await render_shared_grid(
+            organization=organization, frame=frame, fetch_in=fetch_in, quantization=quantization
+        )
+        if data is not None:
+            return data
+
+    async def fetch():
+        db_session = refetch_db_session(organization)
+        try:
+            data = await fetch_grid(db_session=db_session, frame=frame, fetch_in=fetch_in, quantization=quantization)
+        finally:
+            await db_session.close()
+        data.flags.writeable = False
+        return data
+
+    key = grid_key(organization=organization, frame=frame, fetch_in=fetch_in, quantization=quantization)
+    return await grid_flights.do(key, fetch)
+
+
+async def group_chains(frames: AsyncIterator[FrameKey]) -> AsyncIterator[List[FrameKey]]:
+    """Groups time ordered frames into runs of the same delta chain, frames stored whole are runs of their own."""
+    chain = []
+    async for frame in frames:
+        if chain and (frame.keyframe_at is None or frame.keyframe_at != chain[-1].keyframe_at):
+            yield chain
+            chain = []
+        chain.append(frame)
+    if chain:
+        yield chain
+
+
+async def fetch_grid(
+    *, db_session: Session, frame: FrameKey, fetch_in: AreaRequest, quantization: Optional[grid.Quantization] = None
+) -> np.ndarray:
+    """
+    Crops a frame to the requested bounding box and resamples it to the requested resolution,
+    reading from the coarsest pyramid level that still meets the resolution. The float32 result
+    is converted to the transport type when a quantization is given. Decoding runs in the
+    process pool of meteor.observation.workers.
+    """
+    members = await read_chain_members(db_session=db_session, frames=[frame], fetch_in=fetch_in)
+    (data,) = await workers.run(render_frames, members, fetch_in.resolution, fetch_in.method, quantization)
+    return data
+
+
+def render_cached(
+    path: str,
+    rows: slice,
+    cols: slice,
+    resolution: int,
+    method: ResampleMethod,
+    quantization: Optional[grid.Quantization] = None,
+) -> List[np.ndarray]:
+    """
+    Returns a window of a decoded frame of the frame cache, memory-mapped from ``path``, resampled to
+    the requested resolution and quantized. Runs in the processes of meteor.observation.workers.
+    """
+    data = grid.resample(grid.crop(np.load(path, mmap_mode="r"), rows, cols), resolution, method)
+    return [grid.quantize(data, quantization) if quantization else data]
+
+
+def decode_level(members: List[ChainMember]) -> List[np.ndarray]:
+    """
+    Returns the last member of a chain decoded whole as float32, to be kept in the frame cache.
+    Runs in the processes of meteor.observation.workers.
+    """
+    windows = [window for _, window in decode_chain(members)]
+    return [windows[-1].astype(np.float32, copy=False)]
+
+
+def frame_cache_key(organization: str, frame: FrameKey, level) -> tuple:
+    """Identifies a decoded pyramid level of a frame in the frame cache, or its FRAME_DESCRIPTION."""
+    return (organization, frame.observation_element_id, frame.captured_at, frame.content_hash, level)
+
+
+def level_header(description: np.ndarray, level: int) -> codec.GridHeader:
+    """
+    Returns the header of a pyramid level of a frame as it is kept in the frame cache, whole as a
+    single uncompressed chunk, from the description of the frame.
+    """
+    north, west, lat_step, lon_step, rows, cols, _ = description
+    rows, cols = int(rows), int(cols)
+    for _ in range(level):
+        # odd edges are padded, see grid.downsample
+        rows, cols = (rows + 1) // 2, (cols + 1) // 2
+    geometry = codec.scale_geometry(codec.GridGeometry(north, west, lat_step, lon_step), 2**level)
+    return codec.GridHeader(codec.VERSION, np.dtype(np.float32), codec.CODEC_NONE, 0, rows, cols, rows, cols, geometry)
+
+
+def level_window(description: np.ndarray, fetch_in: AreaRequest) -> tuple[int, slice, slice]:
+    """
+    Returns the coarsest pyramid level of a frame that still meets the requested resolution, as
+    read_frame_chunks picks it, with the window of the level covered by the requested bounding box.
+    """
+    rows, cols = level_header(description, 0).window(*fetch_in.bounds)
+    level = min(
+        grid.pyramid_level(min(rows.stop - rows.start, cols.stop - cols.start), fetch_in.resolution),
+        int(description[-1]),
+    )
+    if level:
+        rows, cols = level_header(description, level).window(*fetch_in.bounds)
+    return level, rows, cols
+
+
+async def describe_frame(*, db_session: Session, frame: FrameKey) -> np.ndarray:
+    """
+    Returns the base grid and the pyramid of a stored frame as the frame cache describes them:
+    north, west, lat step, lon step, rows, cols and the number of pyramid levels.
+    """
+    header, _ = await read_value_header(db_session=db_session, frame=frame)
+    directory = await read_pyramid_directory(db_session=db_session, frame=frame)
+    levels = 0 if directory is None else len(directory)
+    return np.array([*header.geometry, header.rows, header.cols, levels], dtype=np.float64)
+
+
+async def read_level_members(*, db_session: Session, frame: FrameKey, level: int) -> List[ChainMember]:
+    """
+    Reads every chunk of a pyramid level of a frame, 0 being the base grid, and of the frames of its
+    chain its reconstruction starts from.
+    """
+    frames = [frame] if frame.delta_scale is None else await get_chain(db_session=db_session, frame=frame)
+
+    members = []
+    for member in frames:
+        column, offset = ObservationValue.value, 0
+        if level:
+            directory = await read_pyramid_directory(db_session=db_session, frame=member)
+            column, offset = ObservationValue.pyramid, int(directory[level - 1][0])
+        header, table = await read_value_header(db_session=db_session, frame=member, column=column, offset=offset)
+        chunks = await read_window_chunks(
+            db_session=db_session,
+            frame=member,
+            header=header,
+            table=table,
+            rows=slice(0, header.rows),
+            cols=slice(0, header.cols),
+            column=column,
+            offset=offset,
+        )
+        members.append(ChainMember(member.delta_scale, chunks, emit=member is frames[-1]))
+    return members
+
+
+async def cache_frame(*, organization: str, frame: FrameKey, level) -> Optional[str]:
+    """
+    Puts a decoded pyramid level of a frame, or its description with FRAME_DESCRIPTION, into the
+    frame cache with a session of its own. Returns the path of the cached entry, None when it does
+    not fit the cache.
+    """
+    db_session = refetch_db_session(organization)
+    try:
+        if level == FRAME_DESCRIPTION:
+            data = await describe_frame(db_session=db_session, frame=frame)
+        else:
+            members = await read_level_members(db_session=db_session, frame=frame, level=level)
+            (data,) = await workers.run(decode_level, members)
+    finally:
+        await db_session.close()
+
+    key = frame_cache_key(organization, frame, level)
+    # writing the file and evicting older ones take too long for the event loop
+    await anyio.to_thread.run_sync(frame_cache.put, key, data)
+    return frame_cache.locate(key)
+
+
+async def locate_frame(*, organization: str, frame: FrameKey, level) -> Optional[str]:
+    """
+    Returns the path of an entry of a frame in the frame cache, caching it on a miss. Concurrent
+    misses of this server process share a single read and decoding.
+    """
+    key = frame_cache_key(organization, frame, level)
+    path = frame_cache.locate(key)
+    if path is not None:
+        metrics_provider.counter("observation.frame_cache.hits")
+        return path
+
+    metrics_provider.counter("observation.frame_cache.misses")
+    return await frame_flights.do(key, lambda: cache_frame(organization=organization, frame=frame, level=level))
+
+
+async def render_shared_grid(
+    *, organization: str, frame: FrameKey, fetch_in: AreaRequest, quantization: Optional[grid.Quantization] = None
+) -> Optional[np.ndarray]:
+    """
+    Renders a fetch from the decoded pyramid level of the frame cache it needs. None when the level
+    does not fit the cache, or when it is evicted by another process before it is mapped.
+    """
+    path = await locate_frame(organization=organization, frame=frame, level=FRAME_DESCRIPTION)
+    if path is None:
+        return None
+    try:
+        description = np.load(path)
+    except (OSError, ValueError):
+        return None
+
+    level, rows, cols = level_window(description, fetch_in)
+    header = level_header(description, level)
+    if header.rows * header.cols * header.dtype.itemsize > frame_cache.budget_of(organization):
+        # decoding it whole would be for nothing, its windows are read as fetch_grid does
+        return None
+
+    path = await locate_frame(organization=organization, frame=frame, level=level)
+    if path is None:
+        return None
+    try:
+        (data,) = await workers.run(render_cached, path, rows, cols, fetch_in.resolution, fetch_in.method, quantization)
+    except FileNotFoundError:
+        return None
+    return data
+
+
+def tile_etag(*, frame: FrameKey, z: int, x: int, y: int) -> Optional[str]:
+    """Returns the strong ETag of a tile, None for frames stored without a content hash."""
+    if not frame.content_hash:
+        return None
+    return f'"{frame.content_hash}-{z}-{x}-{y}"'
+
+
+async def render_frame_tile(
+    *, organization: str, element: ObservationElement, frame: FrameKey, z: int, x: int, y: int
+) -> bytes:
+    """Renders the PNG tile of a frame in the process pool, with a session of its own."""
+    north, west, south, east = tiles.tile_bounds(z, x, y)
+    fetch_in = AreaRequest(
+        upperLeftCoordinate={"lat": north, "long": west},
+        lowerRightCoordinate={"lat": south, "long": east},
+        resolution=tiles.TILE_SIZE,
+    )
+    db_session = refetch_db_session(organization)
+    try:
+        members = await read_chain_members(db_session=db_session, frames=[frame], fetch_in=fetch_in)
+    finally:
+        await db_session.close()
+    (data,) = await workers.run(render_tile, members, z, x, y, tiles.COLORMAPS[element.name])
+    return data.tobytes()
+
+
+async def fetch_tile(
+    *, organization: str, element: ObservationElement, frame: FrameKey, z: int, x: int, y: int
+) -> bytes:
+    """
+    Returns the PNG tile of a frame, rendered from the coarsest pyramid level that still has a
+    cell per pixel and kept in the tile cache of this server process. Concurrent requests for a
+    tile missing from the cache share a single rendering.
+    """
+    key = (organization, element.id, frame.captured_at, frame.content_hash, z, x, y)
+    tile = tile_cache.get(key)
+    if tile is not None:
+        return tile
+
+    tile = await tile_flights.do(
+        key,
+        lambda: render_frame_tile(organization=organization, element=element, frame=frame, z=z, x=x, y=y),
+    )
+    tile_cache.put(key, tile)
+    return tile
+
+
+async def stream_frames(
+    *,
+    organization: str,
+    element_id: int,
+    fetch_in: FetchRequest,
+    quantization: Optional[grid.Quantization] = None,
+) -> AsyncIterator[tuple[datetime, np.ndarray]]:
+    """
+    Yields the capture time and the resampled grid of the frames captured between startDate and
+    endDate one at a time, to be encoded by one of the formats of meteor.observation.formats.
+
+    The frame keys are read through a server-side cursor. Consecutive frames of a delta chain are
+    rendered by one task of the process pool, so a chain is only reconstructed from its keyframe
+    once, while the chunks of the next chains are read. At most STREAM_PREFETCH tasks are ahead of
+    the client, so memory stays flat whatever the length of the time range, and the tasks left are
+    cancelled when the client goes away. The generator owns its session as it outlives the request
+    dependencies.
+    """
+    db_session = refetch_db_session(organization)
+    pending = deque()
+
+    async def submit(frames: List[FrameKey]):
+        members = await read_chain_members(db_session=db_session, frames=frames, fetch_in=fetch_in)
+        task = asyncio.ensure_future(
+            workers.run(render_frames, members, fetch_in.resolution, fetch_in.method, quantization)
+        )
+        pending.append(([frame.captured_at for frame in frames], task))
+
+    async def ready() -> AsyncIterator[tuple[datetime, np.ndarray]]:
+        captured_at, task = pending[0]
+        frames = await task
+        pending.popleft()
+        for item in zip(captured_at, frames):
+            yield item
+
+    try:
+        result = await db_session.stream(
+            select(*FRAME_COLUMNS)
+            .where(
+                ObservationValue.observation_element_id == element_id,
+                ObservationValue.captured_at >= fetch_in.startDate,
+                ObservationValue.captured_at <= fetch_in.endDate,
+            )
+            .order_by(ObservationValue.captured_at)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        async for frames in group_chains(result):
+            await submit(frames)
+            if len(pending) >= STREAM_PREFETCH:
+                async for item in ready():
+                    yield item
+        while pending:
+            async for item in ready():
+                yield item
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await db_session.close()
@@ -0,0 +1,57 @@
+"""
+.. module: meteor.observation.stream
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Framed binary format for time-range responses.
+
+Every frame is sent as a fixed size header followed by its raw array bytes::
+
+    | magic | timestamp | rows | cols | dtype | scale | offset | nbytes | payload |
+
+``timestamp`` is the capture time in milliseconds since the epoch (UTC),
+``dtype`` is a numpy type string (e.g. ``<f4``) and the physical value of a
+cell is ``payload * scale + offset``.
+
+Point series are sent as packed ``(timestamp, value)`` records of POINT_DTYPE.
+"""
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+MEDIA_TYPE = "application/x-meteor-frames"
+
+FRAME_MAGIC = b"MTRF"
+
+# magic, timestamp (ms), rows, cols, dtype, scale, offset, payload size
+FRAME_HEADER = struct.Struct("<4sqII4sddQ")
+
+POINT_DTYPE = np.dtype([("timestamp", "<i8"), ("value", "<f4")])
+
+
+def to_timestamp(captured_at: datetime) -> int:
+    """Milliseconds since the epoch of a naive UTC datetime."""
+    return int(captured_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def pack_frame_header(captured_at: datetime, frame: np.ndarray, scale: float = 1.0, offset: float = 0.0) -> bytes:
+    """Packs the header sent in front of a frame."""
+    rows, cols = frame.shape
+    return FRAME_HEADER.pack(
+        FRAME_MAGIC,
+        to_timestamp(captured_at),
+        rows,
+        cols,
+        frame.dtype.str.encode(),
+        scale,
+        offset,
+        frame.nbytes,
+    )
+
+
+def frame_chunks(captured_at: datetime, frame: np.ndarray, scale: float = 1.0, offset: float = 0.0):
+    """Returns the header and a zero-copy view of the payload of a frame."""
+    frame = np.ascontiguousarray(frame)
+    return pack_frame_header(captured_at, frame, scale, offset), memoryview(frame).cast("B")
@@ -0,0 +1,211 @@
+"""
+.. module: meteor.observation.tiles
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Rendering of frames as XYZ slippy-map tiles, 256 x 256 PNG images in Web Mercator.
+
+Frames are stored on regular lat/long grids, so the grid cell under every pixel of
+a tile is a row index that only depends on the latitude of the pixel row and a
+column index that only depends on the longitude of the pixel column. Both index
+maps are cached, a tile is then a single gather from the decoded window. Values are
+mapped onto a 256 entry RGBA colormap, the last entry being the transparent color of
+cells without data, and the image is encoded without any imaging library.
+"""
+import struct
+import zlib
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from .codec import GridGeometry
+
+TILE_SIZE = 256
+
+MAX_ZOOM = 22
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COMPRESSION_LEVEL = 6
+
+# values between vmin and vmax are spread over the 255 first entries of the lut
+Colormap = namedtuple("Colormap", ("vmin", "vmax", "lut"))
+
+TRANSPARENT = 255
+
+
+def build_lut(stops: list[tuple[float, tuple[int, int, int, int]]]) -> np.ndarray:
+    """
+    Interpolates (position, RGBA) color stops, positions going from 0 to 1, into a lut
+    of 255 colors followed by the transparent entry.
+    """
+    positions = np.array([position for position, _ in stops])
+    colors = np.array([color for _, color in stops], dtype=np.float64)
+    samples = np.linspace(0, 1, TRANSPARENT)
+
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for channel in range(4):
+        lut[:TRANSPARENT, channel] = np.rint(np.interp(samples, positions, colors[:, channel]))
+    return lut
+
+
+# mm, from traces to flooding rain
+PRECIPITATION_LUT = build_lut(
+    [
+        (0.0, (200, 200, 200, 0)),
+        (0.02, (170, 220, 255, 150)),
+        (0.15, (60, 140, 240, 200)),
+        (0.3, (20, 180, 60, 220)),
+        (0.5, (250, 230, 0, 240)),
+        (0.7, (250, 120, 0, 255)),
+        (0.85, (210, 0, 0, 255)),
+        (1.0, (160, 0, 190, 255)),
+    ]
+)
+
+COLORMAPS = {
+    # dBZ, from light echoes to hail
+    "reflectivity": Colormap(
+        -10,
+        75,
+        build_lut(
+            [
+                (0.0, (100, 100, 100, 0)),
+                (0.18, (4, 233, 231, 160)),
+                (0.3, (1, 159, 244, 200)),
+                (0.41, (2, 253, 2, 220)),
+                (0.53, (0, 142, 0, 230)),
+                (0.6, (253, 248, 2, 240)),
+                (0.68, (253, 149, 0, 255)),
+                (0.76, (212, 0, 0, 255)),
+                (0.85, (192, 0, 0, 255)),
+                (0.91, (248, 0, 253, 255)),
+                (1.0, (152, 84, 198, 255)),
+            ]
+        ),
+    ),
+    # m/s, towards the radar in green and away in red
+    "velocity": Colormap(
+        -40,
+        40,
+        build_lut(
+            [
+                (0.0, (0, 80, 0, 255)),
+                (0.45, (150, 240, 150, 255)),
+                (0.5, (120, 120, 120, 120)),
+                (0.55, (240, 150, 150, 255)),
+                (1.0, (110, 0, 0, 255)),
+            ]
+        ),
+    ),
+    # m/s
+    "spectrum-width": Colormap(
+        0,
+        20,
+        build_lut(
+            [(0.0, (40, 40, 40, 0)), (0.25, (60, 60, 200, 200)), (0.6, (240, 240, 0, 255)), (1.0, (255, 0, 0, 255))]
+        ),
+    ),
+    # mm, the range growing with the accumulation period
+    "precipitation-1h": Colormap(0, 50, PRECIPITATION_LUT),
+    "precipitation-3h": Colormap(0, 100, PRECIPITATION_LUT),
+    "precipitation-24h": Colormap(0, 200, PRECIPITATION_LUT),
+}
+
+
+def tile_exists(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def _latitude(z: int, y: float) -> np.ndarray:
+    return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y, dtype=np.float64) / 2**z))))
+
+
+def _longitude(z: int, x: float) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64) / 2**z * 360 - 180
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """The bounding box of a tile as (north, west, south, east)."""
+    return float(_latitude(z, y)), float(_longitude(z, x)), float(_latitude(z, y + 1)), float(_longitude(z, x + 1))
+
+
+@lru_cache(maxsize=4096)
+def tile_rows(z: int, y: int, north: float, lat_step: float, start: int, stop: int) -> np.ndarray:
+    """
+    Rows of a window of a grid under the pixel rows of a tile, rows outside of the window
+    point one past its last row.
+    """
+    latitudes = _latitude(z, y + (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE)
+    rows = np.floor((north - latitudes) / lat_step).astype(np.int64) - start
+    rows[(rows < 0) | (rows >= stop - start)] = stop - start
+    return rows
+
+
+@lru_cache(maxsize=4096)
+def tile_cols(z: int, x: int, west: float, lon_step: float, start: int, stop: int) -> np.ndarray:
+    """Columns of a window of a grid under the pixel columns of a tile, see tile_rows."""
+    longitudes = _longitude(z, x + (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE)
+    cols = np.floor((longitudes - west) / lon_step).astype(np.int64) - start
+    cols[(cols < 0) | (cols >= stop - start)] = stop - start
+    return cols
+
+
+def project_tile(window: np.ndarray, geometry: GridGeometry, rows: slice, cols: slice, z: int, x: int, y: int):
+    """Samples the window of a grid at the pixels of a tile, pixels off the window are NaN."""
+    padded = np.full((window.shape[0] + 1, window.shape[1] + 1), np.nan, dtype=np.float32)
+    padded[:-1, :-1] = window
+    return padded[
+        tile_rows(z, y, geometry.north, geometry.lat_step, rows.start, rows.stop)[:, None],
+        tile_cols(z, x, geometry.west, geometry.lon_step, cols.start, cols.stop),
+    ]
+
+
+def colorize(values: np.ndarray, colormap: Colormap) -> np.ndarray:
+    """Maps values onto the RGBA colors of a colormap, NaN being transparent."""
+    scaled = (values - colormap.vmin) * (TRANSPARENT / (colormap.vmax - colormap.vmin))
+    indices = np.clip(np.nan_to_num(scaled), 0, TRANSPARENT - 1).astype(np.uint8)
+    indices[np.isnan(values)] = TRANSPARENT
+    return colormap.lut.take(indices, axis=0)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(image: np.ndarray, level: int = PNG_COMPRESSION_LEVEL) -> bytes:
+    """Encodes a (height, width, 4) uint8 RGBA image as a PNG, without row filters."""
+    height, width, _ = image.shape
+    # every scanline starts with its filter type, 0 for none
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * 4)
+    return b"".join(
+        (
+            PNG_SIGNATURE,
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+            _png_chunk(b"IDAT", zlib.compress(scanlines, level)),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+class TileCache:
+    """Least recently used encoded tiles, keyed by (organization, element, frame, z, x, y)."""
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._tiles = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def put(self, key: tuple, tile: bytes) -> None:
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.size:
+            self._tiles.popitem(last=False)
@@ -0,0 +1,310 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.datastructures import Headers
+
+from meteor.database.core import OrganizationDbSession, refetch_db_session
+from meteor.database.manage import METEOR_ORGANIZATION_SCHEMA_PREFIX
+
+from . import formats, grid, stream
+from .enums import AccumulationPeriod, RadarProduct
+from .models import FetchRequest, PointSeriesRequest, SubscriptionRequest
+from .push import Subscription, hub
+from .responses import GridResponse, NpyResponse, etag_matches, quantization_headers
+from .service import (
+    fetch_shared_grid,
+    fetch_point_series,
+    fetch_tile,
+    frame_etag,
+    get_element_by_exact_name,
+    get_frame,
+    stream_frames,
+    tile_etag,
+)
+from .tiles import tile_exists
+
+
+router = APIRouter()
+
+
+def negotiate(headers: Headers, offered: list[str], what: str) -> str:
+    """Returns the media type negotiated from the Accept header, or raises a 406."""
+    media_type = formats.negotiate(headers.get("accept"), offered)
+    if not media_type:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=[{"msg": f"The {what} are available as {', '.join(offered)}."}],
+        )
+    return media_type
+
+
+def frame_response(
+    data, *, captured_at, element_name: str, media_type: str, quantization, headers: Headers, response_headers: dict
+):
+    """Sends a single fetched frame in the negotiated format."""
+    if media_type == formats.ARROW_STREAM:
+
+        async def frames():
+            yield captured_at, data
+
+        return StreamingResponse(
+            formats.arrow_stream(frames(), element_name, quantization), headers=response_headers, media_type=media_type
+        )
+
+    # a range of another version of the frame would corrupt the resumed download
+    byte_range = headers.get("range")
+    if_range = headers.get("if-range")
+    if if_range and if_range != response_headers.get("ETag"):
+        byte_range = None
+
+    if media_type == formats.NPY:
+        return NpyResponse(data, headers=response_headers, range=byte_range)
+    return GridResponse(data, headers=response_headers, range=byte_range)
+
+
+async def fetch_product(
+    *,
+    db_session: OrganizationDbSession,
+    organization: str,
+    product: RadarProduct,
+    fetch_in: FetchRequest,
+    headers: Headers,
+):
+    """
+    Crops and resamples the frame of a product captured at the requested date,
+    or streams every frame of the range when an end date is given, in the format
+    negotiated from the Accept header.
+
+    Single frames are tagged with a strong ETag, answer ``If-None-Match`` without being
+    decoded, and serve ``Range`` requests so that interrupted downloads can resume.
+    """
+    if fetch_in.endDate:
+        offered = formats.available([stream.MEDIA_TYPE, formats.ARROW_STREAM])
+    else:
+        offered = formats.available([formats.OCTET_STREAM, formats.ARROW_STREAM, formats.NPY])
+    media_type = negotiate(headers, offered, f"{product.value} frames")
+
+    element = await get_element_by_exact_name(db_session=db_session, element_name=product.value)
+    if not element:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"The {product.value} element does not exist."}],
+        )
+
+    quantization = grid.quantization(fetch_in.dtype, element.scale, element.offset)
+    response_headers = quantization_headers(quantization)
+
+    if fetch_in.endDate:
+        frames = stream_frames(
+            organization=organization, element_id=element.id, fetch_in=fetch_in, quantization=quantization
+        )
+        if media_type == formats.ARROW_STREAM:
+            body = formats.arrow_stream(frames, element.name, quantization)
+        else:
+            body = formats.framed_stream(frames, quantization)
+        return StreamingResponse(body, headers=response_headers, media_type=media_type)
+
+    frame = await get_frame(db_session=db_session, element_id=element.id, at=fetch_in.startDate)
+    if not frame:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"No {product.value} frame was captured at or before the requested date."}],
+        )
+
+    etag = frame_etag(frame=frame, fetch_in=fetch_in, quantization=quantization, media_type=media_type)
+    if etag:
+        response_headers["ETag"] = etag
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    data = await fetch_shared_grid(organization=organization, frame=frame, fetch_in=fetch_in, quantization=quantization)
+    return frame_response(
+        data,
+        captured_at=frame.captured_at,
+        element_name=element.name,
+        media_type=media_type,
+        quantization=quantization,
+        headers=headers,
+        response_headers=response_headers,
+    )
+
+
+@router.get("/reflectivity", response_class=GridResponse)
+async def get_reflectivity(
+    db_session: OrganizationDbSession,
+    organization: str,
+    fetch_in: FetchRequest,
+    request: Request,
+):
+    """Get captured equivalent reflectivity factor."""
+    return await fetch_product(
+        db_session=db_session,
+        organization=organization,
+        product=RadarProduct.reflectivity,
+        fetch_in=fetch_in,
+        headers=request.headers,
+    )
+
+
+@router.get("/velocity", response_class=GridResponse)
+async def get_velocity(
+    db_session: OrganizationDbSession,
+    organization: str,
+    fetch_in: FetchRequest,
+    request: Request,
+):
+    """Get captured radial velocity of scatterers away from instrument."""
+    return await fetch_product(
+        db_session=db_session,
+        organization=organization,
+        product=RadarProduct.velocity,
+        fetch_in=fetch_in,
+        headers=request.headers,
+    )
+
+
+@router.get("/spectrum-width", response_class=GridResponse)
+async def get_spectrum_width(
+    db_session: OrganizationDbSession,
+    organization: str,
+    fetch_in: FetchRequest,
+    request: Request,
+):
+    """Get captured Doppler spectrum width."""
+    return await fetch_product(
+        db_session=db_session,
+        organization=organization,
+        product=RadarProduct.spectrum_width,
+        fetch_in=fetch_in,
+        headers=request.headers,
+    )
+
+
+@router.get("/precipitation-{period}", response_class=GridResponse)
+async def get_precipitation(
+    db_session: OrganizationDbSession,
+    organization: str,
+    period: AccumulationPeriod,
+    fetch_in: FetchRequest,
+    request: Request,
+):
+    """Get rainfall accumulated over the period ending at each reflectivity frame."""
+    return await fetch_product(
+        db_session=db_session,
+        organization=organization,
+        product=RadarProduct(f"precipitation-{period.value}"),
+        fetch_in=fetch_in,
+        headers=request.headers,
+    )
+
+
+@router.get("/point-series", response_class=GridResponse)
+async def get_point_series(
+    db_session: OrganizationDbSession,
+    series_in: PointSeriesRequest,
+    request: Request,
+):
+    """Get the (timestamp, value) series of a product at a point."""
+    media_type = negotiate(request.headers, [formats.OCTET_STREAM, formats.NPY], "point series")
+
+    element = await get_element_by_exact_name(db_session=db_session, element_name=series_in.product.value)
+    if not element:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"The {series_in.product.value} element does not exist."}],
+        )
+
+    series = await fetch_point_series(db_session=db_session, element_id=element.id, series_in=series_in)
+    if media_type == formats.NPY:
+        return NpyResponse(series)
+    return GridResponse(series)
+
+
+@router.get("/tiles/{product}/{z}/{x}/{y}.png", response_class=Response)
+async def get_tile(
+    db_session: OrganizationDbSession,
+    organization: str,
+    product: RadarProduct,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    at: Optional[datetime] = None,
+):
+    """Get an XYZ map tile of the frame of a product captured at or before ``at``, the latest by default."""
+    if not tile_exists(z, x, y):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": "The tile does not exist."}])
+
+    element = await get_element_by_exact_name(db_session=db_session, element_name=product.value)
+    if not element:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"The {product.value} element does not exist."}],
+        )
+
+    # frames are timestamped in naive UTC
+    at = at.astimezone(timezone.utc).replace(tzinfo=None) if at and at.tzinfo else at
+    frame = await get_frame(db_session=db_session, element_id=element.id, at=at or datetime.utcnow())
+    if not frame:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"No {product.value} frame was captured at or before the requested date."}],
+        )
+
+    headers = {}
+    etag = tile_etag(frame=frame, z=z, x=x, y=y)
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    tile = await fetch_tile(organization=organization, element=element, frame=frame, z=z, x=x, y=y)
+    return Response(tile, headers=headers, media_type="image/png")
+
+
+@router.websocket("/subscribe")
+async def subscribe(websocket: WebSocket, organization: str):
+    """
+    Push every new frame of a product to the client, cropped, resampled and quantized
+    to the area of the first message, in the framed format of the range fetches.
+    """
+    await websocket.accept()
+    try:
+        subscription_in = SubscriptionRequest.model_validate_json(await websocket.receive_text())
+    except WebSocketDisconnect:
+        return
+    except ValidationError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid subscription request.")
+        return
+
+    # idle subscribers must not hold a pooled connection, the session only lives for the lookup
+    db_session = refetch_db_session(organization)
+    try:
+        element = await get_element_by_exact_name(db_session=db_session, element_name=subscription_in.product.value)
+    finally:
+        await db_session.close()
+    if not element:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason=f"The {subscription_in.product.value} element does not exist."
+        )
+        return
+
+    subscription = Subscription(
+        websocket,
+        f"{METEOR_ORGANIZATION_SCHEMA_PREFIX}_{organization}",
+        element.id,
+        subscription_in,
+        grid.quantization(subscription_in.dtype, element.scale, element.offset),
+    )
+    try:
+        await hub.subscribe(subscription)
+        # frames are only pushed, anything the client sends is ignored until it leaves
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,99 @@
+"""
+.. module: meteor.observation.workers
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Bounded process pool for the CPU-bound part of fetches: decompression, delta
+reconstruction, resampling and quantization of frames.
+
+Tasks return arrays. Instead of being pickled through the result pipe, they are
+written by the worker into a single shared memory block that the server process
+copies out of and unlinks. At most twice as many tasks as workers are in flight
+per server process, further fetches wait for a slot without blocking the loop.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from meteor import config
+
+log = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the pool of this server process, started on first use. None when decoding inline."""
+    global _pool, _slots
+    if _pool is None and config.METEOR_OBSERVATION_DECODE_WORKERS > 0:
+        # workers register their blocks with the tracker of the server, which reclaims them if it dies
+        resource_tracker.ensure_running()
+        _pool = ProcessPoolExecutor(
+            max_workers=config.METEOR_OBSERVATION_DECODE_WORKERS,
+            # forking a process running an event loop and its threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _slots = asyncio.Semaphore(2 * config.METEOR_OBSERVATION_DECODE_WORKERS)
+    return _pool
+
+
+def _pack(arrays: List[np.ndarray]) -> tuple[str, list]:
+    """Copies arrays into a new shared memory block, returns its name and their layout."""
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    block = shared_memory.SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays), 1))
+    layout, offset = [], 0
+    for array in arrays:
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)[...] = array
+        layout.append((array.shape, array.dtype, offset))
+        offset += array.nbytes
+    block.close()
+    return block.name, layout
+
+
+def _unpack(result: tuple[str, list], copy: bool = True) -> List[np.ndarray]:
+    """Copies the arrays out of a shared memory block and unlinks it."""
+    name, layout = result
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        if not copy:
+            return []
+        return [np.ndarray(shape, dtype, buffer=block.buf, offset=offset).copy() for shape, dtype, offset in layout]
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _discard(future: Future) -> None:
+    # a task of a cancelled fetch still has to release its block when it completes
+    if not future.cancelled() and future.exception() is None:
+        _unpack(future.result(), copy=False)
+
+
+def _run(fn: Callable[..., List[np.ndarray]], *args) -> tuple[str, list]:
+    return _pack(fn(*args))
+
+
+async def run(fn: Callable[..., List[np.ndarray]], *args) -> List[np.ndarray]:
+    """
+    Runs ``fn(*args)``, a picklable function returning a list of arrays, in the pool and returns its arrays.
+    Cancelling the call cancels the task when it has not started yet and discards its result otherwise.
+    """
+    pool = get_pool()
+    if pool is None:
+        return fn(*args)
+
+    async with _slots:
+        future = pool.submit(_run, fn, *args)
+        try:
+            return _unpack(await asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            if not future.cancel():
+                future.add_done_callback(_discard)
+            raise
@@ -4,7 +4,7 @@ from pydantic.errors import PydanticErrorMixin
 from sqlalchemy.sql.expression import true
 
 from meteor.auth.models import MeteorUser, MeteorUserOrganization
-from meteor.database.core import engine
+from meteor.database.core import engine, tenant_sessions
 from meteor.database.manage import init_schema
 from meteor.enums import UserRoles
 from meteor.exceptions import NotFoundError
@@ -134,6 +134,7 @@ def delete(*, db_session, organization_id: int):
     organization = db_session.query(Organization).filter(Organization.id == organization_id).first()
     db_session.delete(organization)
     db_session.commit()
+    tenant_sessions.invalidate(organization.slug)
 
 
 def add_user(
@@ -27,9 +27,9 @@ router = APIRouter()
 
 
 @router.get("", response_model=OrganizationPagination)
-def get_organizations(common: CommonParameters):
+async def get_organizations(common: CommonParameters):
     """Get all organizations."""
-    return search_filter_sort_paginate(model="Organization", **common)
+    return await search_filter_sort_paginate(model="Organization", concurrent=True, **common)
 
 
 @router.post(
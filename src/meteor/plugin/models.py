@@ -15,7 +15,7 @@ from sqlalchemy_utils.types.encrypted.encrypted_type import AesEngine
 
 from meteor.database.core import Base
 from meteor.config import METEOR_ENCRYPTION_KEY
-from meteor.models import MeteorBase, Pagination
+from meteor.models import MeteorBase, Pagination, PrimaryKey
 from meteor.plugins.base import plugins
 
 logger = logging.getLogger(__name__)
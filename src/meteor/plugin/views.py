@@ -19,18 +19,18 @@ router = APIRouter()
 
 
 @router.get("", response_model=PluginPagination)
-def get_plugins(common: CommonParameters):
+async def get_plugins(common: CommonParameters):
     """Get all plugins."""
-    return search_filter_sort_paginate(model="Plugin", **common)
+    return await search_filter_sort_paginate(model="Plugin", concurrent=True, **common)
 
 
 @router.get(
     "/instances",
     response_model=PluginInstancePagination,
 )
-def get_plugin_instances(common: CommonParameters):
+async def get_plugin_instances(common: CommonParameters):
     """Get all plugin instances."""
-    return search_filter_sort_paginate(model="PluginInstance", **common)
+    return await search_filter_sort_paginate(model="PluginInstance", concurrent=True, **common)
 
 
 @router.get(
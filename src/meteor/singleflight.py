@@ -0,0 +1,58 @@
+"""
+.. module: meteor.singleflight
+    :platform: Unix
+    :copyright: (c) 2024 by MeteorFlow, see AUTHORS for more
+    :license: Apache, see LICENSE for more details.
+
+Coalescing of concurrent identical computations: while a computation is in
+flight, callers asking for the same key wait for its result instead of starting
+their own.
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from meteor.metrics import provider as metrics_provider
+
+T = TypeVar("T")
+
+
+class Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time. The computation does not belong to any
+    caller, it goes on when the caller that started it goes away and is cancelled once nobody
+    waits for it anymore. Calls are counted as ``<name>.calls`` and ``<name>.coalesced``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: dict[Hashable, Flight] = {}
+
+    def _land(self, key: Hashable, flight: Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        metrics_provider.counter(f"{self.name}.calls")
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+            self._flights[key] = flight
+        else:
+            metrics_provider.counter(f"{self.name}.coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # callers arriving while the computation winds down start a new one
+                self._land(key, flight)
+                flight.task.cancel()
@@ -0,0 +1,6 @@
+import os
+
+# meteor.config reads these at import time, the tests never connect to a database
+os.environ.setdefault("DATABASE_HOSTNAME", "localhost")
+os.environ.setdefault("DATABASE_CREDENTIALS", "meteor:meteor")
+os.environ.setdefault("METEOR_ENCRYPTION_KEY", "meteor")
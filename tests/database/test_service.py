@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy_filters.exceptions import BadFilterFormat, BadSortFormat
+
+from meteor.database import service
+from meteor.enums import CountMode
+from meteor.observation.models import ObservationElement
+
+MODELS = {"ObservationElement": ObservationElement}
+
+
+def compile_sql(statement) -> str:
+    return " ".join(
+        str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})).split()
+    )
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return FakeResult([row[0] for row in self.rows])
+
+
+class FakeSession:
+    """Records the statements it is given, answering them with canned rows and scalars."""
+
+    def __init__(self, rows=(), scalar=None):
+        self.rows = list(rows)
+        self.scalar_value = scalar
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(compile_sql(statement))
+        return FakeResult(self.rows)
+
+    async def scalar(self, statement):
+        self.statements.append(compile_sql(statement))
+        return self.scalar_value
+
+    async def rollback(self):
+        pass
+
+
+def test_apply_filters():
+    statement = service.apply_filters(
+        select(ObservationElement),
+        [{"or": [{"field": "name", "op": "==", "value": "reflectivity"}, {"field": "scale", "op": "is_null"}]}],
+        dict(MODELS),
+        ObservationElement,
+    )
+    sql = compile_sql(statement)
+    assert "FROM meteor_core.observation_element WHERE" in sql
+    assert "observation_element.name = 'reflectivity' OR meteor_core.observation_element.scale IS NULL" in sql
+
+
+def test_apply_filters_rejects_unknown_operators():
+    with pytest.raises(BadFilterFormat):
+        service.apply_filters(
+            select(ObservationElement), [{"field": "name", "op": "~", "value": "x"}], dict(MODELS), ObservationElement
+        )
+
+
+def test_apply_sort():
+    sort_spec = service.create_sort_spec("ObservationElement", ["name", "id"], [True, False])
+    statement = service.apply_sort(select(ObservationElement), sort_spec, dict(MODELS), ObservationElement)
+    sql = compile_sql(statement)
+    assert sql.endswith("ORDER BY meteor_core.observation_element.name DESC, meteor_core.observation_element.id ASC")
+
+
+def test_apply_sort_rejects_unknown_directions():
+    with pytest.raises(BadSortFormat):
+        service.apply_sort(
+            select(ObservationElement), [{"field": "name", "direction": "up"}], dict(MODELS), ObservationElement
+        )
+
+
+def test_count_results_drops_the_order():
+    db_session = FakeSession(scalar=3)
+    statement = select(ObservationElement).order_by(ObservationElement.name)
+    assert asyncio.run(service.count_results(db_session, statement)) == 3
+    (sql,) = db_session.statements
+    assert sql.startswith("SELECT count(*) AS count_1 FROM (SELECT")
+    assert "ORDER BY" not in sql
+
+
+def test_search_filter_sort_paginate():
+    db_session = FakeSession(rows=[("element",)], scalar=11)
+    results = asyncio.run(
+        service.search_filter_sort_paginate(
+            db_session,
+            "ObservationElement",
+            filter_spec=[{"field": "unit", "op": "==", "value": "dBZ"}],
+            page=2,
+            items_per_page=10,
+            sort_by=["name"],
+            descending=[False],
+        )
+    )
+    assert results["items"] == ["element"]
+    assert results["total"] == 11
+    assert results["countMode"] == CountMode.exact
+
+    page, count = db_session.statements
+    assert "WHERE meteor_core.observation_element.unit = 'dBZ'" in page
+    assert page.endswith("ORDER BY meteor_core.observation_element.name ASC LIMIT 10 OFFSET 10")
+    assert count.startswith("SELECT count(*)")
+    assert "unit = 'dBZ'" in count
+
+
+@pytest.mark.parametrize(
+    "filter_spec, error",
+    [
+        ([{"field": "name", "op": "~", "value": "x"}], "invalid.filter"),
+        ([{"field": "missing", "op": "==", "value": "x"}], "not_found.field"),
+    ],
+)
+def test_invalid_filters_are_validation_errors(filter_spec, error):
+    with pytest.raises(RequestValidationError) as info:
+        asyncio.run(service.search_filter_sort_paginate(FakeSession(), "ObservationElement", filter_spec=filter_spec))
+    (detail,) = info.value.errors()
+    assert detail["loc"] == ("filter",)
+    assert detail["type"] == error
+
+
+def test_unknown_models_are_validation_errors():
+    with pytest.raises(RequestValidationError):
+        asyncio.run(service.search_filter_sort_paginate(FakeSession(), "missing"))
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "item"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    rank = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+
+
+START = datetime(2026, 10, 18)
+# ties on every sort field and NULLs in the nullable ones
+ITEMS = [
+    {
+        "id": id,
+        "name": "abc"[id % 3],
+        "rank": None if id % 4 == 0 else id % 3,
+        "created_at": None if id % 5 == 0 else START + timedelta(hours=id % 2),
+    }
+    for id in range(1, 15)
+]
+
+
+@pytest.fixture(scope="module")
+def db_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db_session:
+        db_session.add_all(Item(**item) for item in ITEMS)
+        db_session.commit()
+        yield db_session
+
+
+def postgres_order(columns):
+    """The ORDER BY of the keyset columns with the NULL placement of Postgres, SQLite puts NULLs first."""
+    return [
+        field.asc().nulls_last() if direction == "asc" else field.desc().nulls_first() for field, direction in columns
+    ]
+
+
+def expected_ids(columns):
+    items = list(ITEMS)
+    for field, direction in reversed(columns):
+        # NULLs sort as the largest values
+        items.sort(key=lambda item: (item[field.key] is None, item[field.key] or 0), reverse=direction == "desc")
+    return [item["id"] for item in items]
+
+
+def keyset_ids(db_session, columns, page_size=4):
+    ids, cursor = [], None
+    while True:
+        statement = select(Item).order_by(*postgres_order(columns)).limit(page_size)
+        if cursor is not None:
+            statement = statement.where(service.seek_predicate(columns, service.decode_cursor(cursor, columns)))
+        page = db_session.execute(statement).scalars().all()
+        ids.extend(item.id for item in page)
+        if len(page) < page_size:
+            return ids
+        cursor = service.encode_cursor(columns, [getattr(page[-1], field.key) for field, _ in columns])
+
+
+@pytest.mark.parametrize(
+    "sort_spec",
+    [
+        [],
+        [("name", "asc")],
+        [("name", "desc")],
+        [("rank", "asc")],
+        [("rank", "desc")],
+        [("created_at", "desc"), ("name", "asc")],
+        [("name", "desc"), ("rank", "asc"), ("created_at", "asc")],
+    ],
+)
+def test_keyset_pages_follow_the_order(db_session, sort_spec):
+    sort_spec = [{"field": field, "direction": direction} for field, direction in sort_spec]
+    columns = service.keyset_columns(Item, sort_spec, {"Item": Item})
+    assert columns[-1] == (Item.id, "asc")
+    assert keyset_ids(db_session, columns) == expected_ids(columns)
+
+
+def test_seek_predicate_compares_row_values():
+    columns = [(Item.name, "desc"), (Item.id, "desc")]
+    sql = compile_sql(select(Item.id).where(service.seek_predicate(columns, ["b", 3])))
+    assert sql.endswith("WHERE (item.name, item.id) < ('b', 3)")
+
+
+def test_seek_predicate_keeps_nulls_after_values():
+    columns = [(Item.rank, "asc"), (Item.id, "asc")]
+    sql = compile_sql(select(Item.id).where(service.seek_predicate(columns, [1, 3])))
+    assert sql.endswith("WHERE item.rank > 1 OR item.rank IS NULL OR item.rank = 1 AND item.id > 3")
+
+
+def test_cursor_round_trip():
+    columns = [(Item.created_at, "desc"), (Item.rank, "asc"), (Item.id, "asc")]
+    values = [START, None, 7]
+    assert service.decode_cursor(service.encode_cursor(columns, values), columns) == values
+
+
+def tampered_cursor(keys, values):
+    payload = json.dumps({"k": keys, "v": values}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        tampered_cursor(["Item.name:asc", "Item.id:asc"], ["a", 1]),
+        tampered_cursor(["Item.rank:asc", "Item.id:asc"], [1]),
+        tampered_cursor(["Item.rank:asc", "Item.id:asc"], [1, "1; DROP TABLE item"]),
+        tampered_cursor(["Item.rank:asc", "Item.id:asc"], [True, 1]),
+        tampered_cursor(["Item.rank:asc", "Item.id:asc"], [{"a": 1}, 1]),
+    ],
+)
+def test_invalid_cursors_are_validation_errors(cursor):
+    columns = [(Item.rank, "asc"), (Item.id, "asc")]
+    with pytest.raises(RequestValidationError) as info:
+        service.decode_cursor(cursor, columns)
+    (detail,) = info.value.errors()
+    assert detail["loc"] == ("cursor",)
+    assert detail["type"] == "invalid.cursor"
+
+
+def test_invalid_datetimes_are_validation_errors():
+    columns = [(Item.created_at, "asc"), (Item.id, "asc")]
+    with pytest.raises(RequestValidationError):
+        service.decode_cursor(tampered_cursor(["Item.created_at:asc", "Item.id:asc"], ["yesterday", 1]), columns)
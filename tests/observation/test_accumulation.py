@@ -0,0 +1,202 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+from meteor.observation import accumulation, codec, grid
+from meteor.observation.enums import RadarProduct, TransportDtype
+from meteor.observation.models import FrameKey
+
+GEOMETRY = codec.GridGeometry(north=12.0, west=104.0, lat_step=0.01, lon_step=0.01)
+START = datetime(2026, 10, 18, 6, 0, tzinfo=timezone.utc)
+
+# reflectivity sent as uint8 steps of 0.5 dBZ from -32 dBZ, rainfall as uint16 steps of 0.1 mm
+REFLECTIVITY = SimpleNamespace(id=1, name=RadarProduct.reflectivity.value, scale=0.5, offset=-32.0)
+PRECIPITATION = SimpleNamespace(id=2, name=RadarProduct.precipitation_1h.value, scale=0.1, offset=0.0)
+
+
+class FakeStore:
+    """
+    Stored grids of the elements, in capture order. Accumulations are chained every ``interval`` frames,
+    their deltas rounded to the scale of the element like stored deltas, the values held reconstructed.
+    """
+
+    def __init__(self, interval: int = 1):
+        self.interval = interval
+        self.frames = {}
+        self.values = {}
+
+    def open_chain(self, element_id, captured_at):
+        frames = self.frames_of(element_id)
+        if self.interval <= 1 or not frames or frames[-1].captured_at >= captured_at:
+            return None
+        chain = [frame for frame in frames if frame.keyframe_at == frames[-1].keyframe_at]
+        return chain if len(chain) < self.interval else None
+
+    def put(self, element, captured_at, array):
+        array, keyframe_at = np.asarray(array, dtype=np.float32), captured_at
+        chain = self.open_chain(element.id, captured_at) if element is PRECIPITATION else None
+        if chain:
+            reference = codec.decode_grid(self.values[chain[-1].id])
+            array = reference + np.rint((array - reference) / element.scale).astype(np.float32) * element.scale
+            keyframe_at = chain[0].keyframe_at
+        frame = FrameKey(len(self.values) + 1, captured_at, element.id, keyframe_at, None, None)
+        self.values[frame.id] = codec.encode_grid(array, GEOMETRY)
+        self.frames.setdefault(element.id, []).append(frame)
+        self.frames[element.id].sort(key=lambda frame: frame.captured_at)
+        return frame
+
+    def frames_of(self, element_id):
+        return self.frames.get(element_id, [])
+
+    def accumulation(self, at):
+        (frame,) = [frame for frame in self.frames_of(PRECIPITATION.id) if frame.captured_at == at]
+        return codec.decode_grid(self.values[frame.id])
+
+    def ingest(self, batch):
+        for at, dbz in batch:
+            self.put(REFLECTIVITY, at, dbz)
+        return asyncio.run(
+            accumulation.update_accumulations(
+                db_session=None, organization_id=1, reflectivity=REFLECTIVITY, captured_at=[at for at, _ in batch]
+            )
+        )
+
+    def fetch(self, element, captured_at, dtype):
+        (frame,) = [frame for frame in self.frames_of(element.id) if frame.captured_at == captured_at]
+        array = codec.decode_grid(self.values[frame.id])
+        return grid.quantize(array, grid.quantization(dtype, element.scale, element.offset))
+
+    def install(self, monkeypatch):
+        async def get_element_by_exact_name(*, db_session, element_name):
+            return {element.name: element for element in (REFLECTIVITY, PRECIPITATION)}.get(element_name)
+
+        async def get_frame_at(*, db_session, element_id, captured_at):
+            return next((frame for frame in self.frames_of(element_id) if frame.captured_at == captured_at), None)
+
+        async def get_frame(*, db_session, element_id, at):
+            frames = [frame for frame in self.frames_of(element_id) if frame.captured_at <= at]
+            return frames[-1] if frames else None
+
+        async def get_frames(*, db_session, element_id, start, end):
+            return [frame for frame in self.frames_of(element_id) if start < frame.captured_at <= end]
+
+        async def create_observation_value(*, db_session, element, organization_id, frame, geometry, captured_at):
+            assert geometry == GEOMETRY
+            return self.put(element, captured_at, frame)
+
+        async def delete_frames(*, db_session, element_id, start, end):
+            deleted = [
+                frame
+                for frame in self.frames_of(element_id)
+                if frame.captured_at > start and (frame.captured_at <= end or frame.keyframe_at <= end)
+            ]
+            self.frames[element_id] = [frame for frame in self.frames_of(element_id) if frame not in deleted]
+            return [frame.captured_at for frame in deleted]
+
+        async def get_open_chain(*, db_session, element_id, captured_at, geometry, interval):
+            assert interval == self.interval
+            return self.open_chain(element_id, captured_at)
+
+        async def decode(reader, frame):
+            value = self.values[frame.id]
+            return codec.read_header(value).geometry, codec.decode_grid(value)
+
+        monkeypatch.setattr(accumulation, "get_element_by_exact_name", get_element_by_exact_name)
+        monkeypatch.setattr(accumulation, "get_frame_at", get_frame_at)
+        monkeypatch.setattr(accumulation, "get_frame", get_frame)
+        monkeypatch.setattr(accumulation, "get_frames", get_frames)
+        monkeypatch.setattr(accumulation, "create_observation_value", create_observation_value)
+        monkeypatch.setattr(accumulation, "delete_frames", delete_frames)
+        monkeypatch.setattr(accumulation, "get_open_chain", get_open_chain)
+        monkeypatch.setattr(accumulation.config, "METEOR_OBSERVATION_KEYFRAME_INTERVAL", self.interval)
+        monkeypatch.setattr(accumulation.FrameReader, "_decode", decode)
+
+
+def test_precipitation_round_trip(monkeypatch):
+    store = FakeStore()
+    store.install(monkeypatch)
+
+    dbz = np.array([[np.nan, 5.0, 20.0, 30.0], [40.0, 45.0, 50.0, 60.0]], dtype=np.float32)
+    captured_at = [START, START + timedelta(minutes=5)]
+    for at in captured_at:
+        store.put(REFLECTIVITY, at, dbz)
+
+    stored = asyncio.run(
+        accumulation.update_accumulations(
+            db_session=None, organization_id=1, reflectivity=REFLECTIVITY, captured_at=captured_at
+        )
+    )
+    assert stored == 2
+
+    # the first frame stands for MAX_FRAME_INTERVAL, the second for the 5 minutes since the first
+    hours = (accumulation.MAX_FRAME_INTERVAL + timedelta(minutes=5)) / timedelta(hours=1)
+    expected = accumulation.rain_rate(dbz) * hours
+    assert expected[1, 3] > 10 * PRECIPITATION.scale
+
+    physical = store.fetch(PRECIPITATION, captured_at[-1], TransportDtype.float32)
+    assert physical.dtype == np.float32
+    np.testing.assert_allclose(physical, expected, rtol=1e-5, atol=1e-6)
+
+    steps = store.fetch(PRECIPITATION, captured_at[-1], TransportDtype.uint16)
+    assert steps.dtype == np.uint16
+    np.testing.assert_array_equal(steps, np.rint(expected / PRECIPITATION.scale).astype(np.uint16))
+    np.testing.assert_allclose(
+        steps * PRECIPITATION.scale + PRECIPITATION.offset, physical, atol=PRECIPITATION.scale / 2
+    )
+
+
+def window_rainfall(batch, at, period):
+    """The rainfall of the reflectivity frames of a window, summed from scratch."""
+    total, previous_at = 0, None
+    for captured_at, dbz in sorted(batch, key=lambda frame: frame[0]):
+        if captured_at > at:
+            break
+        if captured_at > at - period:
+            total = total + accumulation.rain_rate(dbz) * accumulation.frame_hours(captured_at, previous_at)
+        previous_at = captured_at
+    return total
+
+
+def reflectivity_frames(count):
+    rng = np.random.default_rng(0)
+    return [
+        (START + timedelta(minutes=5 * index), rng.uniform(10, 50, (2, 4)).astype(np.float32)) for index in range(count)
+    ]
+
+
+def test_accumulations_stay_within_one_chain_of_the_window(monkeypatch):
+    interval = 4
+    store = FakeStore(interval)
+    store.install(monkeypatch)
+
+    # ingested one frame at a time over more than the period, frames leave the window from the 13th on
+    batch = reflectivity_frames(30)
+    for frame in batch:
+        assert store.ingest([frame]) == 1
+
+    period = accumulation.PERIODS[RadarProduct.precipitation_1h]
+    for index, (at, _) in enumerate(batch):
+        expected = window_rainfall(batch, at, period)
+        # keyframes are rebuilt from the window, deltas read back from the store round by half a step each
+        atol = 1e-3 if index % interval == 0 else (index % interval) * PRECIPITATION.scale / 2 + 1e-3
+        np.testing.assert_allclose(store.accumulation(at), expected, rtol=1e-5, atol=atol)
+
+
+def test_frames_ingested_out_of_order_replace_later_accumulations(monkeypatch):
+    store = FakeStore(interval=4)
+    store.install(monkeypatch)
+
+    batch = reflectivity_frames(24)
+    late = batch.pop(10)
+    for frame in batch:
+        store.ingest([frame])
+    # every accumulation from the late frame on is stored again, with its own chains
+    assert store.ingest([late]) == 24 - 10
+
+    period = accumulation.PERIODS[RadarProduct.precipitation_1h]
+    batch.insert(10, late)
+    for index, (at, _) in enumerate(batch):
+        expected = window_rainfall(batch, at, period)
+        np.testing.assert_allclose(store.accumulation(at), expected, rtol=1e-5, atol=2 * PRECIPITATION.scale)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from meteor.exceptions import GridFormatError
+from meteor.observation import codec
+
+GEOMETRY = codec.GridGeometry(north=12.0, west=104.0, lat_step=0.01, lon_step=0.01)
+
+
+def grid(dtype, shape=(70, 45)):
+    rng = np.random.default_rng(0)
+    array = rng.uniform(0, 100, shape).astype(dtype)
+    if np.issubdtype(dtype, np.floating):
+        array[rng.random(shape) < 0.2] = np.nan
+    return array
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64, np.uint8, np.int16, np.uint16])
+@pytest.mark.parametrize("compression", [codec.CODEC_NONE, codec.CODEC_ZLIB, codec.CODEC_ZSTD])
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_grids_round_trip(dtype, compression, shuffle):
+    # chunks do not divide the grid, the last row and column of chunks are partial
+    array = grid(dtype)
+    encoded = codec.encode_grid(array, GEOMETRY, chunk_shape=(32, 16), codec=compression, shuffle=shuffle)
+
+    header = codec.read_header(encoded)
+    assert header.shape == array.shape
+    assert header.chunk_grid == (3, 3)
+    assert header.geometry == GEOMETRY
+    assert header.dtype == np.dtype(dtype).newbyteorder("<")
+    np.testing.assert_array_equal(codec.decode_grid(encoded), array)
+
+
+@pytest.mark.parametrize(
+    "rows, cols", [(slice(0, 70), slice(0, 45)), (slice(10, 40), slice(5, 20)), (slice(33, 34), slice(44, 45))]
+)
+def test_windows_decode_from_the_planned_ranges(rows, cols):
+    array = grid(np.float32)
+    encoded = codec.encode_grid(array, GEOMETRY, chunk_shape=(32, 16))
+    header = codec.read_header(encoded)
+    table = codec.read_chunk_table(encoded, header)
+
+    plan = codec.plan_reads(header, table, codec.window_chunks(header, rows, cols))
+    window = codec.decode_window(header, table, rows, cols, plan, [encoded[start:stop] for start, stop, _ in plan])
+    np.testing.assert_array_equal(window, array[rows, cols])
+    np.testing.assert_array_equal(codec.decode_grid(encoded, rows, cols), array[rows, cols])
+
+
+def test_plan_reads_merges_adjacent_chunks():
+    encoded = codec.encode_grid(grid(np.float32), GEOMETRY, chunk_shape=(32, 16))
+    header = codec.read_header(encoded)
+    table = codec.read_chunk_table(encoded, header)
+
+    # the chunks of a row are stored one after the other, those of a column are not
+    ((start, stop, indices),) = codec.plan_reads(header, table, codec.window_chunks(header, slice(0, 10), slice(0, 45)))
+    assert indices == [0, 1, 2]
+    assert (start, stop) == (header.data_offset, header.data_offset + int(table[3]))
+    plan = codec.plan_reads(header, table, codec.window_chunks(header, slice(0, 70), slice(0, 10)))
+    assert [indices for _, _, indices in plan] == [[0], [3], [6]]
+
+
+def test_empty_windows_read_nothing():
+    header = codec.read_header(codec.encode_grid(grid(np.float32), GEOMETRY, chunk_shape=(32, 16)))
+    assert codec.window_chunks(header, slice(10, 10), slice(0, 45)) == []
+
+
+def test_windows_and_cells_of_coordinates():
+    header = codec.read_header(codec.encode_grid(grid(np.float32), GEOMETRY))
+    assert header.window(north=11.905, west=104.105, south=11.505, east=104.295) == (slice(9, 50), slice(10, 30))
+    # clipped to the grid
+    assert header.window(north=13, west=103, south=11, east=105) == (slice(0, 70), slice(0, 45))
+    rows, _ = header.window(north=10, west=104, south=9, east=105)
+    assert rows.start == rows.stop
+    assert header.cell(11.995, 104.005) == (0, 0)
+    assert header.cell(12.5, 104.0) is None
+
+
+def test_pyramids_round_trip():
+    levels = [codec.encode_grid(grid(np.float32, (size, size)), GEOMETRY) for size in (32, 16, 8)]
+    pyramid = codec.encode_pyramid(levels)
+    directory = codec.read_pyramid_directory(pyramid)
+    assert directory.shape == (3, 2)
+    for (start, stop), level in zip(directory, levels):
+        assert pyramid[start:stop] == level
+
+
+@pytest.mark.parametrize(
+    "buffer",
+    [b"", b"MTRG", b"XXXX" + codec.encode_grid(grid(np.float32), GEOMETRY)[4:]],
+)
+def test_invalid_grids_are_rejected(buffer):
+    with pytest.raises(GridFormatError):
+        codec.read_header(buffer)
+
+
+def test_unsupported_dtypes_are_rejected():
+    with pytest.raises(GridFormatError):
+        codec.encode_grid(np.zeros((4, 4), dtype=np.complex64), GEOMETRY)
+    with pytest.raises(GridFormatError):
+        codec.encode_grid(np.zeros(4, dtype=np.float32), GEOMETRY)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from meteor.observation import delta
+
+SCALE = 0.5
+
+
+def test_deltas_round_to_half_a_step():
+    rng = np.random.default_rng(0)
+    reference = rng.uniform(-30, 70, (32, 32)).astype(np.float32)
+    frame = reference + rng.normal(0, 5, reference.shape).astype(np.float32)
+
+    steps = delta.quantize(frame, reference, SCALE)
+    assert steps.dtype == delta.DELTA_DTYPE
+    np.testing.assert_allclose(delta.reconstruct(reference, steps, SCALE), frame, atol=SCALE / 2 + 1e-5)
+
+
+def test_cells_without_data():
+    reference = np.array([[np.nan, 1.0], [2.0, np.nan]], dtype=np.float32)
+    frame = np.array([[3.0, np.nan], [2.5, np.nan]], dtype=np.float32)
+
+    steps = delta.quantize(frame, reference, SCALE)
+    # cells without data in the reference are taken as zero
+    assert steps[0, 0] == 6
+    assert steps[0, 1] == delta.NODATA
+    np.testing.assert_array_equal(delta.reconstruct(reference, steps, SCALE), frame)
+
+
+def test_frames_without_data():
+    reference = np.ones((2, 2), dtype=np.float32)
+    steps = delta.quantize(np.full((2, 2), np.nan, dtype=np.float32), reference, SCALE)
+    assert (steps == delta.NODATA).all()
+    assert np.isnan(delta.reconstruct(reference, steps, SCALE)).all()
+
+
+def test_overflowing_deltas_need_a_keyframe():
+    reference = np.zeros((2, 2), dtype=np.float32)
+    frame = reference.copy()
+    frame[0, 0] = (delta.LIMIT + 1) * SCALE
+    assert delta.quantize(frame, reference, SCALE) is None
+    frame[0, 0] = -delta.LIMIT * SCALE
+    assert delta.quantize(frame, reference, SCALE) is not None
+
+
+def test_chains_do_not_accumulate_rounding():
+    rng = np.random.default_rng(0)
+    frame = rng.uniform(0, 60, (16, 16)).astype(np.float32)
+    reconstructed = frame
+    for _ in range(100):
+        frame = frame + rng.normal(0, 1, frame.shape).astype(np.float32)
+        reconstructed = delta.reconstruct(reconstructed, delta.quantize(frame, reconstructed, SCALE), SCALE)
+        np.testing.assert_allclose(reconstructed, frame, atol=SCALE / 2 + 1e-4)
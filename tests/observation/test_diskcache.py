@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from meteor.observation import diskcache
+from meteor.observation.diskcache import DiskCache
+
+
+def test_frames_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path), 1 << 20)
+    cached = cache.put("hash", b"value", b"pyramid")
+    assert cached.read_ranges("value", [(0, 2), (3, 5)]) == [b"va", b"ue"]
+    # clipped to the end of the column like substring
+    assert cached.read_ranges("pyramid", [(4, 100), (100, 200)]) == [b"mid", b""]
+    assert cache.get("hash") is cached
+    assert cache.get("missing") is None
+
+
+def test_frames_without_pyramid(tmp_path):
+    cache = DiskCache(str(tmp_path), 1 << 20)
+    cache.put("hash", b"value", None)
+    # a new process maps the file
+    cached = DiskCache(str(tmp_path), 1 << 20).get("hash")
+    assert cached.read_ranges("value", [(0, 5)]) == [b"value"]
+    assert cached.read_ranges("pyramid", [(0, 5)]) == [b""]
+
+
+def test_frames_over_the_size_are_not_cached(tmp_path):
+    cache = DiskCache(str(tmp_path), diskcache.HEADER.size + 10)
+    assert cache.fits(10)
+    assert not cache.fits(11)
+    assert cache.put("hash", b"value", b"pyramid") is None
+    assert cache.put("hash", b"value", b"pyra") is not None
+
+
+@pytest.mark.parametrize("size, directory", [(0, "cache"), (1 << 20, "file/cache")])
+def test_unusable_caches_are_disabled(tmp_path, size, directory):
+    (tmp_path / "file").write_bytes(b"")
+    cache = DiskCache(str(tmp_path / directory), size)
+    assert not cache.enabled
+    assert cache.put("hash", b"value", None) is None
+    assert cache.get("hash") is None
+
+
+def test_least_recently_used_frames_are_evicted(tmp_path):
+    value = b"x" * 1000
+    cache = DiskCache(str(tmp_path), 2 * (diskcache.HEADER.size + 1000) + 500)
+    for index, content_hash in enumerate(("a", "b")):
+        cache.put(content_hash, value, None)
+        path = tmp_path / f"{content_hash}{diskcache.SUFFIX}"
+        os.utime(path, (path.stat().st_atime - 100 + index, path.stat().st_mtime - 100 + index))
+
+    cache.put("c", value, None)
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(diskcache.SUFFIX)) == ["b.frame", "c.frame"]
+
+
+def test_frames_evicted_by_other_processes_miss(tmp_path):
+    cache = DiskCache(str(tmp_path), 1 << 20)
+    cached = cache.put("hash", b"value", None)
+    os.unlink(tmp_path / f"hash{diskcache.SUFFIX}")
+    # the file is only checked when the frame is touched again
+    assert cache.get("hash") is cached
+    cached.touched_at -= diskcache.TOUCH_INTERVAL
+    assert cache.get("hash") is None
+    assert cache.get("hash") is None
+
+
+def test_invalid_files_miss(tmp_path):
+    (tmp_path / f"hash{diskcache.SUFFIX}").write_bytes(b"x" * 64)
+    assert DiskCache(str(tmp_path), 1 << 20).get("hash") is None
+
+
+def test_open_and_rejected_frames_are_bounded(tmp_path):
+    cache = DiskCache(str(tmp_path), 1 << 20, open_frames=2, rejected_frames=2)
+    for content_hash in "abc":
+        cache.put(content_hash, b"value", None)
+        cache.reject(content_hash)
+    assert list(cache._frames) == ["b", "c"]
+    assert not cache.rejected("a")
+    assert cache.rejected("b") and cache.rejected("c")
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow
+
+from meteor.observation import formats, grid
+from meteor.observation.enums import TransportDtype
+
+
+def test_arrow_is_offered():
+    assert formats.available([formats.OCTET_STREAM, formats.ARROW_STREAM]) == [
+        formats.OCTET_STREAM,
+        formats.ARROW_STREAM,
+    ]
+    assert formats.negotiate(formats.ARROW_STREAM, [formats.OCTET_STREAM, formats.ARROW_STREAM]) == (
+        formats.ARROW_STREAM
+    )
+
+
+def test_negotiate_follows_qualities():
+    offered = [formats.OCTET_STREAM, formats.NPY]
+    assert formats.negotiate(None, offered) == formats.OCTET_STREAM
+    assert formats.negotiate("application/x-npy;q=0.9, */*;q=0.1", offered) == formats.NPY
+    assert formats.negotiate("text/html", offered) is None
+
+
+def test_arrow_stream_round_trip():
+    quantization = grid.quantization(TransportDtype.uint8, 0.5, -32)
+    captured_at = datetime(2026, 10, 18, 6, tzinfo=timezone.utc)
+    frames = [np.arange(12, dtype=np.uint8).reshape(3, 4), np.full((2, 5), 7, dtype=np.uint8)]
+
+    async def source():
+        for index, frame in enumerate(frames):
+            yield captured_at.replace(minute=5 * index), frame
+
+    async def collect():
+        return b"".join([bytes(chunk) async for chunk in formats.arrow_stream(source(), "reflectivity", quantization)])
+
+    table = pyarrow.ipc.open_stream(asyncio.run(collect())).read_all()
+    assert table.schema.metadata[b"offset"] == b"-32.0"
+    assert table.column("element").to_pylist() == ["reflectivity"] * 2
+    for row, frame in enumerate(frames):
+        rows, cols = table.column("rows")[row].as_py(), table.column("cols")[row].as_py()
+        values = np.array(table.column("frame")[row].as_py(), dtype=np.uint8).reshape(rows, cols)
+        np.testing.assert_array_equal(values, frame)
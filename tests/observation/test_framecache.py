@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from meteor.observation.framecache import FrameCache, evict, parse_budgets
+
+
+def age(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_grids_round_trip_read_only(tmp_path):
+    cache = FrameCache(str(tmp_path), 1 << 20)
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    cache.put(("default", 1, 0), array)
+
+    cached = cache.get(("default", 1, 0))
+    np.testing.assert_array_equal(cached, array)
+    assert not cached.flags.writeable
+    assert cache.locate(("default", 1, 0)).startswith(str(tmp_path / "default"))
+    assert cache.get(("default", 1, 1)) is None
+    assert cache.locate(("default", 1, 1)) is None
+
+
+def test_budgets_of_organizations(tmp_path):
+    cache = FrameCache(str(tmp_path), 1 << 20, parse_budgets(["small = 300", "off=0"]))
+    assert cache.budget_of("small") == 300
+    assert cache.budget_of("other") == 1 << 20
+
+    cache.put(("small", 1), np.zeros(100, dtype=np.uint8))
+    cache.put(("small", 2), np.zeros(301, dtype=np.uint8))
+    cache.put(("off", 1), np.zeros(1, dtype=np.uint8))
+    assert cache.get(("small", 1)) is not None
+    assert cache.get(("small", 2)) is None
+    assert cache.get(("off", 1)) is None
+    assert not (tmp_path / "off").exists()
+
+
+def test_least_recently_used_grids_are_evicted(tmp_path):
+    array = np.zeros(1000, dtype=np.uint8)
+    cache = FrameCache(str(tmp_path), 2500)
+    for index in range(2):
+        cache.put(("default", index), array)
+        age(cache.locate(("default", index)), 100 - index)
+
+    # reading a grid makes it the most recently used
+    cache.get(("default", 0))
+    cache.put(("default", 2), array)
+    assert cache.get(("default", 0)) is not None
+    assert cache.get(("default", 1)) is None
+    assert cache.get(("default", 2)) is not None
+
+
+def test_evict_only_counts_its_suffix(tmp_path):
+    for name in ("a.npy", "b.npy", "c.frame"):
+        (tmp_path / name).write_bytes(b"x" * 10)
+    age(tmp_path / "a.npy", 10)
+    evict(str(tmp_path), 10)
+    assert sorted(os.listdir(tmp_path)) == [".lock", "b.npy", "c.frame"]
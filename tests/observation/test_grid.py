@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from meteor.observation import grid
+from meteor.observation.enums import TransportDtype
+
+
+@pytest.mark.parametrize(
+    "dtype, scale, offset, values",
+    [
+        # reflectivity and velocity as seeded for their elements
+        (TransportDtype.uint8, 0.5, -32, [-32, -10.5, 0, 47.5, 95]),
+        (TransportDtype.uint8, 0.5, -63.5, [-63.5, -20, 0, 20, 63.5]),
+        (TransportDtype.uint16, 0.1, 0, [0, 0.1, 12.3, 250]),
+    ],
+)
+def test_quantize_round_trip(dtype, scale, offset, values):
+    quantization = grid.quantization(dtype, scale, offset)
+    array = np.array(values + [np.nan], dtype=np.float32)
+    steps = grid.quantize(array.copy(), quantization)
+    assert steps.dtype == np.dtype(dtype.value)
+    assert steps[-1] == quantization.nodata
+    np.testing.assert_allclose(steps[:-1] * scale + offset, values, atol=scale / 2)
+
+
+def test_quantize_clips_to_the_range():
+    quantization = grid.quantization(TransportDtype.uint8, 0.5, -32)
+    steps = grid.quantize(np.array([-50, 200], dtype=np.float32), quantization)
+    assert steps.tolist() == [0, quantization.nodata - 1]
+
+
+def test_floats_are_sent_as_is():
+    quantization = grid.quantization(TransportDtype.float32, 0.5, -32)
+    array = np.array([-12.25, np.nan], dtype=np.float32)
+    np.testing.assert_array_equal(grid.quantize(array, quantization), array)
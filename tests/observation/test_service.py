@@ -0,0 +1,183 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from meteor.observation import codec, service
+from meteor.observation.enums import ResampleMethod
+from meteor.observation.ingest import IngestFrame, split_chains
+from meteor.observation.framecache import FrameCache
+from meteor.observation.models import AreaRequest, FrameKey
+from meteor.observation.service import encode_chain
+
+GEOMETRY = codec.GridGeometry(north=12.0, west=104.0, lat_step=0.01, lon_step=0.01)
+
+
+def frames(start: datetime, count: int):
+    rng = np.random.default_rng(0)
+    return [
+        (start + timedelta(minutes=5 * index), rng.uniform(0, 60, (64, 64)).astype(np.float32))
+        for index in range(count)
+    ]
+
+
+def test_encode_chain_stores_deltas_between_keyframes():
+    start = datetime(2026, 10, 18)
+    encoded = list(encode_chain(frames(start, 5), GEOMETRY, ResampleMethod.max, scale=0.5, interval=3))
+    assert [frame.delta_scale for frame in encoded] == [None, 0.5, 0.5, None, 0.5]
+    assert [frame.keyframe_at for frame in encoded] == [start] * 3 + [start + timedelta(minutes=15)] * 2
+
+
+def test_encode_chain_starts_a_keyframe_each_month():
+    start = datetime(2026, 10, 31, 23, 50)
+    encoded = list(encode_chain(frames(start, 4), GEOMETRY, ResampleMethod.max, scale=0.5, interval=12))
+    november = datetime(2026, 11, 1)
+    assert [frame.delta_scale for frame in encoded] == [None, 0.5, None, 0.5]
+    assert [frame.keyframe_at for frame in encoded] == [start, start, november, november]
+
+
+def test_split_chains_never_spans_two_months():
+    start = datetime(2026, 10, 31, 23, 50)
+    ingested = [IngestFrame(captured_at, frame, GEOMETRY) for captured_at, frame in frames(start, 4)]
+    assert [len(chain) for chain in split_chains(ingested, 12)] == [2, 2]
+
+
+class FakeChainStore:
+    """Frames of one element encoded as create_observation_value does, counting the frames decoded."""
+
+    def __init__(self, monkeypatch, interval: int):
+        self.interval = interval
+        self.frames = []
+        self.decoded = 0
+        monkeypatch.setattr(service.config, "METEOR_OBSERVATION_OPEN_CHAIN_CACHE_SIZE", 4)
+        monkeypatch.setattr(service, "open_chains", service.OrderedDict())
+        monkeypatch.setattr(service, "get_connection_schema", lambda connection: "meteor_organization_default")
+        monkeypatch.setattr(service, "get_frame", self.get_frame)
+        monkeypatch.setattr(service, "get_chain", self.get_chain)
+        monkeypatch.setattr(service, "read_frame_levels", self.read_frame_levels)
+
+    async def connection(self):
+        return None
+
+    async def get_frame(self, *, db_session, element_id, at):
+        return self.frames[-1][0] if self.frames else None
+
+    async def get_chain(self, *, db_session, frame):
+        return [key for key, _ in self.frames if key.keyframe_at == frame.keyframe_at]
+
+    async def read_frame_levels(self, *, db_session, frame):
+        self.decoded += 1
+        (value, pyramid) = [stored for key, stored in self.frames if key == frame][0]
+        levels = [codec.decode_grid(value)]
+        levels.extend(codec.decode_grid(pyramid[start:stop]) for start, stop in codec.read_pyramid_directory(pyramid))
+        return GEOMETRY, levels
+
+    def open_chain(self, captured_at):
+        return asyncio.run(
+            service.get_open_chain(
+                db_session=self, element_id=1, captured_at=captured_at, geometry=GEOMETRY, interval=self.interval
+            )
+        )
+
+    def append(self, captured_at, frame, remember: bool = True):
+        chain = self.open_chain(captured_at)
+        value, pyramid, keyframe_at, delta_scale, chain = service.encode_chain_frame(
+            captured_at,
+            service.frame_levels(frame, ResampleMethod.max),
+            GEOMETRY,
+            scale=0.5,
+            interval=self.interval,
+            chain=chain,
+        )
+        digest = service.content_hash(value, pyramid)
+        key = FrameKey(len(self.frames) + 1, captured_at, 1, keyframe_at, delta_scale, digest)
+        self.frames.append((key, (value, pyramid)))
+        if remember:
+            service.remember_chain(("meteor_organization_default", 1), captured_at, digest, GEOMETRY, chain)
+
+
+def test_open_chains_are_not_decoded_again(monkeypatch):
+    store = FakeChainStore(monkeypatch, interval=6)
+    for captured_at, frame in frames(datetime(2026, 10, 18), 5):
+        store.append(captured_at, frame)
+    assert store.decoded == 0
+    assert [key.delta_scale for key, _ in store.frames] == [None, 0.5, 0.5, 0.5, 0.5]
+
+
+def test_open_chains_decode_the_frames_appended_elsewhere(monkeypatch):
+    store = FakeChainStore(monkeypatch, interval=6)
+    batch = frames(datetime(2026, 10, 18), 5)
+    for captured_at, frame in batch[:2]:
+        store.append(captured_at, frame)
+    # appended by another server process
+    for captured_at, frame in batch[2:4]:
+        store.append(captured_at, frame, remember=False)
+
+    store.decoded = 0
+    chain = store.open_chain(batch[4][0])
+    assert store.decoded == 2
+    assert chain.length == 4
+
+    service.open_chains.clear()
+    rebuilt = store.open_chain(batch[4][0])
+    assert store.decoded == 2 + 4
+    for level, reference in zip(chain.levels, rebuilt.levels):
+        np.testing.assert_array_equal(level, reference)
+
+
+@pytest.mark.parametrize("captured_at", [datetime(2026, 10, 18, 1), datetime(2026, 10, 17)])
+def test_open_chains_end_at_the_interval_and_with_newer_frames(monkeypatch, captured_at):
+    store = FakeChainStore(monkeypatch, interval=3)
+    for at, frame in frames(datetime(2026, 10, 18), 3 if captured_at.day == 18 else 1):
+        store.append(at, frame)
+    assert store.open_chain(captured_at) is None
+
+
+@pytest.mark.parametrize("budget, levels", [(1000 * 1000 * 4 - 1, []), (1000 * 1000 * 4, [0])])
+def test_shared_grids_skip_levels_over_the_budget(monkeypatch, tmp_path, budget, levels):
+    # a 1000x1000 frame without pyramid, its base grid is decoded whole for any fetch
+    path = tmp_path / "description.npy"
+    np.save(path, np.array([12.0, 104.0, 0.01, 0.01, 1000, 1000, 0]))
+    requested = []
+
+    async def locate_frame(*, organization, frame, level):
+        requested.append(level)
+        return str(path) if level == service.FRAME_DESCRIPTION else None
+
+    monkeypatch.setattr(service, "locate_frame", locate_frame)
+    monkeypatch.setattr(service, "frame_cache", FrameCache(str(tmp_path), budget))
+    fetch_in = AreaRequest(
+        upperLeftCoordinate={"lat": 12, "long": 104}, lowerRightCoordinate={"lat": 2, "long": 114}, resolution=1000
+    )
+    assert asyncio.run(service.render_shared_grid(organization="default", frame=None, fetch_in=fetch_in)) is None
+    assert requested == [service.FRAME_DESCRIPTION, *levels]
+
+
+class FakeValueSession:
+    def __init__(self, value, pyramid):
+        self.row = (value, pyramid)
+
+    async def execute(self, statement):
+        return self
+
+    def one(self):
+        return self.row
+
+
+def test_cached_frames_are_written_off_the_event_loop(monkeypatch, tmp_path):
+    cache = service.diskcache.DiskCache(str(tmp_path), 1 << 20)
+    written = []
+
+    async def run_sync(fn, *args):
+        written.append(fn)
+        return fn(*args)
+
+    monkeypatch.setattr(service, "disk_cache", cache)
+    monkeypatch.setattr(service.anyio.to_thread, "run_sync", run_sync)
+    frame = FrameKey(1, datetime(2026, 10, 18), 1, None, None, "hash")
+    cached = asyncio.run(service.get_cached_frame(db_session=FakeValueSession(b"value", b"pyramid"), frame=frame))
+    assert written == [cache.write]
+    assert cached.read_ranges("value", [(0, 5)]) == [b"value"]
+    assert cached.read_ranges("pyramid", [(3, 100)]) == [b"amid"]
+    assert cache.get("hash") is cached
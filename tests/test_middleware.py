@@ -0,0 +1,100 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+import zstandard
+
+from meteor import middleware
+from meteor.middleware import CompressionMiddleware, parse_accept_encoding, select_encoding
+
+
+def test_parse_accept_encoding():
+    qualities = parse_accept_encoding("gzip;q=0.5, BR, zstd; q=0 ,, *;q=0.1, deflate;q=high")
+    assert qualities == {"gzip": 0.5, "br": 1.0, "zstd": 0.0, "*": 0.1, "deflate": 0.0}
+    assert parse_accept_encoding(None) == {}
+
+
+@pytest.mark.parametrize(
+    "header, preferences, encoding",
+    [
+        ("gzip, br, zstd", middleware.BINARY_ENCODINGS, "zstd"),
+        ("gzip, br, zstd", middleware.TEXT_ENCODINGS, "gzip"),
+        ("gzip, zstd;q=0.5", middleware.BINARY_ENCODINGS, "gzip"),
+        ("zstd;q=0, *", middleware.BINARY_ENCODINGS, "br"),
+        ("identity", middleware.BINARY_ENCODINGS, None),
+        ("gzip;q=0", middleware.TEXT_ENCODINGS, None),
+    ],
+)
+def test_select_encoding(header, preferences, encoding):
+    assert select_encoding(parse_accept_encoding(header), preferences) == encoding
+
+
+def app(chunks, media_type="application/json", headers=()):
+    async def respond(scope, receive, send):
+        raw = [(b"content-type", media_type.encode()), *[(name.encode(), value.encode()) for name, value in headers]]
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    return respond
+
+
+def request(chunks, accept_encoding="gzip, zstd", minimum_size=100, request_headers=(), **kwargs):
+    """Returns the response start message and the body messages of a request through the middleware."""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"accept-encoding", accept_encoding.encode()), *request_headers]
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    asyncio.run(CompressionMiddleware(app(chunks, **kwargs), minimum_size)(scope, None, send))
+    start, *bodies = messages
+    return {name.decode(): value.decode() for name, value in start["headers"]}, bodies
+
+
+BODY = b'{"values": [' + b", ".join(b"%d" % index for index in range(1000)) + b"]}"
+
+
+def test_json_is_gzipped():
+    headers, (body,) = request([BODY], headers=[("content-length", str(len(BODY))), ("etag", '"tag"')])
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"tag"'
+    assert "content-length" not in headers
+    assert gzip.decompress(body["body"]) == BODY
+
+
+def test_binary_frames_prefer_zstd():
+    headers, (body,) = request([BODY], media_type="application/x-meteor-frames")
+    assert headers["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(body["body"]) == BODY
+
+
+def test_streamed_bodies_are_flushed_message_by_message():
+    chunks = [BODY[:1000], BODY[1000:3000], BODY[3000:]]
+    headers, bodies = request(chunks)
+    assert headers["content-encoding"] == "gzip"
+    assert [body["more_body"] for body in bodies] == [True, True, False]
+
+    decompressor = zlib.decompressobj(wbits=31)
+    # every message decodes on arrival, nothing is held back for the next one
+    for chunk, body in zip(chunks, bodies):
+        assert decompressor.decompress(body["body"]) == chunk
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"chunks": [b"{}"]},
+        {"chunks": [BODY], "accept_encoding": "identity"},
+        {"chunks": [BODY], "media_type": "image/png"},
+        {"chunks": [BODY], "headers": [("content-encoding", "br")]},
+        {"chunks": [BODY], "request_headers": [(b"range", b"bytes=0-10")]},
+    ],
+)
+def test_responses_sent_as_is(kwargs):
+    headers, bodies = request(**kwargs)
+    assert headers.get("content-encoding") in (None, "br")
+    assert b"".join(body["body"] for body in bodies) == b"".join(kwargs["chunks"])
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from meteor.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def fn():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(*(flights.do("key", fn) for _ in range(5)))
+        assert results == [1] * 5
+        # the flight landed, the next call computes again
+        assert await flights.do("key", fn) == 2
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def main():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(*(flights.do("key", fn) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(main())
+
+
+def test_computation_outlives_the_caller_that_started_it():
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        flights = SingleFlight("test")
+        first = asyncio.create_task(flights.do("key", fn))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("key", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+def test_callers_after_the_last_one_left_start_a_new_computation():
+    async def main():
+        stopped = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                # cleaning up, like closing a database session, takes a while
+                stopped.set()
+                await asyncio.sleep(0.02)
+                raise
+
+        async def fast():
+            return "fresh"
+
+        flights = SingleFlight("test")
+        first = asyncio.create_task(flights.do("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await stopped.wait()
+        assert await flights.do("key", fast) == "fresh"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())